@@ -0,0 +1,259 @@
+"""
+Command line batch processing for the Haikumator application.
+
+Runs the batch processor without prompts so that large jobs can be resumed
+and split across machines:
+  python batch.py run haiku.txt thesaurus.txt out.jsonl --shard 0/4 --workers 8
+  python batch.py merge index.json out.jsonl.shard*-of-4*.json
+
+A killed run picks up from its checkpoint when the same command is run
+again. Otherwise a target that already holds haikus is refused unless
+--overwrite or --append is given. Each shard writes a manifest of the permutation range it produced;
+'merge' combines them into one index and reports any missing ranges.
+
+With --syllables 5-7-5 only haikus of that form are generated; branches of
+the permutation space are pruned as soon as a line goes over or can no
+longer reach its syllable count.
+
+Output is written by --writers background threads (0 writes inline) fed
+through a bounded queue, so a slow disk holds the generator back instead
+of filling memory. --sync fsync/atomic makes finished output durable;
+--progress reports throughput and ETA once a second.
+
+--dry-run only reports how big the job is: the exact number of
+permutations, and output size and run time extrapolated from a sample.
+--top K writes just the K best haikus under --score (shortest, longest,
+syllables, season), searching best-first instead of generating them all:
+  python batch.py run haiku.txt thesaurus.txt best.jsonl --top 20 --score syllables
+"""
+
+import argparse
+import json
+import sys
+from helpers.checkpoint import merge_manifests
+from helpers.compiled_thesaurus import open_thesaurus
+from helpers.dedup import DEFAULT_ERROR_RATE
+from helpers.haiku import Haiku
+from helpers.instrumentation import Instrumentation, NO_STAGE
+from helpers.progress import format_duration
+from helpers.sinks import target_problem, DEFAULT_QUEUE_BATCHES, SYNC_POLICIES
+from helpers.syllables import SyllableCounter
+from processors.batchProcessor import BatchProcessor, HAIKU_FORM
+from processors.scores import SCORES, create_score
+from processors.seasonDetector import SeasonDetector
+
+
+def parse_shard(value):
+  """Parse 'i/n' into (i, n), with 0 <= i < n"""
+  try:
+    shard, shards = (int(part) for part in value.split('/'))
+  except ValueError:
+    raise argparse.ArgumentTypeError("shard must look like i/n, e.g. 0/4")
+  if shards < 1 or not 0 <= shard < shards:
+    raise argparse.ArgumentTypeError("shard i/n needs 0 <= i < n")
+  return shard, shards
+
+
+def parse_form(value):
+  """Parse syllables per line such as '5-7-5' into (5, 7, 5)"""
+  try:
+    form = tuple(int(part) for part in value.split('-'))
+  except ValueError:
+    raise argparse.ArgumentTypeError("syllables must look like 5-7-5")
+  if len(form) != 3 or min(form) < 0:
+    raise argparse.ArgumentTypeError("syllables needs three counts, e.g. 5-7-5")
+  return form
+
+
+def run_constrained(args, processor, instrumentation):
+  """Generate only the permutations with args.syllables syllables per line"""
+  if args.shard != (0, 1) or args.workers > 1 or args.checkpoint:
+    print("--syllables cannot be combined with --shard, --workers or --checkpoint")
+    return 1
+  counter = SyllableCounter(args.pronunciations)
+  words, synonym_lists = processor.get_replaceable_words()
+  with processor.open_sink(args.target) as sink:
+    with instrumentation.stage('generate') if instrumentation else NO_STAGE:
+      count = processor.generate_constrained(sink, words, synonym_lists, args.syllables,
+                                             counter)
+  stats = processor.search.stats()
+  print(f"{count} haikus with {'-'.join(map(str, args.syllables))} syllables "
+        f"out of {stats['total']} permutations")
+  print(f"Pruning skipped {stats['pruned']} permutations ({stats['skipped_fraction']:.1%}) "
+        f"after trying {stats['visited']} partial choices")
+  if args.dedup:
+    print(f"{processor.duplicates} duplicate haikus were skipped")
+  return 0
+
+
+def run_dry(args, processor):
+  """Report the size of the job without generating it"""
+  words, synonym_lists = processor.get_replaceable_words()
+  estimate = processor.estimate(words, synonym_lists, args.target)
+  shard, shards = args.shard
+  print(f"{estimate.permutations:,} permutations of {len(words)} replaceable words")
+  if estimate.sample:
+    print(f"Estimated output: {estimate.bytes:,} bytes "
+          f"(from {estimate.sample:,} sample haikus)")
+    parallel = shards * max(1, args.workers)
+    print(f"Estimated time: {format_duration(estimate.seconds)} in one process"
+          + (f", about {format_duration(estimate.seconds / parallel)} over {parallel}"
+             if parallel > 1 else ""))
+  return 0
+
+
+def run_top(args, processor, instrumentation):
+  """Write only the args.top best haikus under args.score"""
+  if args.shard != (0, 1) or args.workers > 1 or args.checkpoint:
+    print("--top cannot be combined with --shard, --workers or --checkpoint")
+    return 1
+  options = {}
+  if args.score == 'syllables':
+    options = {'form': args.syllables or HAIKU_FORM,
+               'counter': SyllableCounter(args.pronunciations)}
+  elif args.score == 'season':
+    options = {'season': args.season}
+  score = create_score(args.score, **options)
+  words, synonym_lists = processor.get_replaceable_words()
+  with instrumentation.stage('search') if instrumentation else NO_STAGE:
+    variants = processor.top_k(words, synonym_lists, args.top, score)
+  with processor.open_sink(args.target) as sink:
+    for variant in variants:
+      sink.write(variant.number, variant.text)
+  stats = processor.search.stats()
+  print(f"{len(variants)} best haikus by {args.score} out of {stats['total']} permutations")
+  for variant in variants:
+    print(f"  v{variant.number}: {variant.score:g}")
+  print(f"Search expanded {stats['expanded']} partial choices")
+  if args.dedup:
+    print(f"{processor.duplicates} duplicate haikus were skipped")
+  return 0
+
+
+def run(args):
+  problem = target_problem(args.target)
+  if problem:
+    print(problem)
+    return 1
+  instrumentation = None
+  if args.profile:
+    instrumentation = Instrumentation(memory=args.profile_memory)
+
+  with instrumentation.stage('load') if instrumentation else NO_STAGE:
+    haiku = Haiku.from_file(args.haiku)
+    thesaurus = open_thesaurus(args.thesaurus)
+
+  processor = BatchProcessor(haiku, thesaurus, workers=args.workers, dedup=args.dedup,
+                             error_rate=args.error_rate, writers=args.writers,
+                             sync=args.sync, queue_batches=args.queue_size,
+                             existing=args.existing)
+  if instrumentation:
+    processor.enable_instrumentation(instrumentation)
+  try:
+    return run_processor(args, processor, instrumentation)
+  except FileExistsError as e:
+    print(f"{e} with --overwrite or --append.")
+    return 1
+
+
+def run_processor(args, processor, instrumentation):
+  """Run the job of the 'run' command with a configured processor"""
+  if args.dry_run:
+    status = run_dry(args, processor)
+    if instrumentation:
+      instrumentation.close()
+    return status
+  if args.top is not None or args.syllables:
+    search = run_top if args.top is not None else run_constrained
+    status = search(args, processor, instrumentation)
+    if instrumentation:
+      instrumentation.dump(args.profile)
+      instrumentation.close()
+    return status
+  shard, shards = args.shard
+  count, manifests = processor.run_job(args.target, shard, shards, args.workers,
+                                       args.checkpoint, args.progress)
+  print(f"Shard {shard}/{shards} completed with {count} permutations")
+  if args.dedup:
+    print(f"{processor.duplicates} duplicate haikus were skipped")
+  for manifest in manifests:
+    print(f"Manifest: {manifest}")
+  if instrumentation:
+    instrumentation.dump(args.profile)
+    instrumentation.close()
+    print(instrumentation.format())
+    print(f"Profile: {args.profile}")
+  return 0
+
+
+def merge(args):
+  index = merge_manifests(args.manifests)
+  with open(args.index, 'w') as f:
+    json.dump(index, f, indent=2)
+  print(f"Merged {len(args.manifests)} manifests: {index['count']} of {index['total']} permutations")
+  for start, stop in index['missing']:
+    print(f"Missing permutations {start + 1} to {stop}")
+  return 0 if index['complete'] else 1
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Haikumator batch processing")
+  commands = parser.add_subparsers(dest='command', required=True)
+
+  run_parser = commands.add_parser('run', help="generate all permutations of a haiku")
+  run_parser.add_argument('haiku', help="haiku file")
+  run_parser.add_argument('thesaurus', help="synonym thesaurus file")
+  run_parser.add_argument('target', help="output folder or .jsonl/.zip/.tar/.db file")
+  run_parser.add_argument('--shard', type=parse_shard, default=(0, 1),
+                          help="process only shard i of n (0-based), e.g. 2/8")
+  run_parser.add_argument('--workers', type=int, default=1, help="number of processes")
+  run_parser.add_argument('--checkpoint', help="checkpoint/manifest file")
+  run_parser.add_argument('--dedup', choices=['exact', 'bloom', 'auto'],
+                          help="skip haikus identical to one already written")
+  run_parser.add_argument('--error-rate', type=float, default=DEFAULT_ERROR_RATE,
+                          help="false positive rate of the bloom filter")
+  run_parser.add_argument('--writers', type=int, default=1,
+                          help="background writer threads per output (0 writes inline)")
+  run_parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_BATCHES,
+                          help="batches that may wait for the writers before generation pauses")
+  run_parser.add_argument('--sync', choices=SYNC_POLICIES, default='none',
+                          help="fsync output as it is flushed; 'atomic' also writes "
+                               "folder files through a temporary name")
+  run_parser.add_argument('--progress', action='store_true',
+                          help="report throughput and ETA (single process only)")
+  run_parser.add_argument('--syllables', type=parse_form,
+                          help="only write haikus with these syllables per line, e.g. 5-7-5")
+  existing = run_parser.add_mutually_exclusive_group()
+  existing.add_argument('--overwrite', dest='existing', action='store_const',
+                        const='overwrite', default='refuse',
+                        help="replace haikus already in the target")
+  existing.add_argument('--append', dest='existing', action='store_const', const='append',
+                        help="add to haikus already in the target")
+  run_parser.add_argument('--dry-run', action='store_true',
+                          help="only report the number of permutations and estimated "
+                               "output size and time")
+  run_parser.add_argument('--top', type=int, metavar='K',
+                          help="only write the K best haikus under --score")
+  run_parser.add_argument('--score', choices=sorted(SCORES), default='syllables',
+                          help="what --top ranks by (default: syllables, the fit to "
+                               "--syllables or 5-7-5)")
+  run_parser.add_argument('--season', choices=SeasonDetector.SEASONS,
+                          help="season for --score season (default: the strongest)")
+  run_parser.add_argument('--pronunciations',
+                          help="CMUdict-style pronunciation file for counting syllables")
+  run_parser.add_argument('--profile', help="write per-stage timings to this JSON file")
+  run_parser.add_argument('--profile-memory', action='store_true',
+                          help="also track the peak memory of each stage (slower)")
+  run_parser.set_defaults(func=run)
+
+  merge_parser = commands.add_parser('merge', help="merge shard manifests into one index")
+  merge_parser.add_argument('index', help="index file to write")
+  merge_parser.add_argument('manifests', nargs='+', help="manifest files")
+  merge_parser.set_defaults(func=merge)
+
+  args = parser.parse_args(argv)
+  return args.func(args)
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Seeded generators for benchmark data.
+
+Everything is derived from a random.Random(seed), so the same arguments
+always produce the same files and haikus.
+"""
+
+import random
+
+FILLER = ['the', 'a', 'of', 'in', 'on', 'my', 'all', 'under', 'over', 'into']
+
+
+def make_vocabulary(size, seed=1507):
+  """`size` distinct pronounceable lowercase words"""
+  rng = random.Random(seed)
+  consonants = 'bcdfghjklmnprstvwz'
+  vowels = 'aeiou'
+  words = set()
+  while len(words) < size:
+    syllables = rng.randint(1, 4)
+    words.add(''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(syllables))
+              + rng.choice(['', '', 'n', 's', 't']))
+  return sorted(words)
+
+
+def generate_thesaurus(path, entries, fanout, seed=1507, vocabulary=None):
+  """Write a thesaurus of `entries` headwords with `fanout` synonyms each
+
+  Synonyms are drawn from a shared vocabulary, so words repeat across
+  entries the way they do in real thesauri. Returns the headwords.
+  """
+  rng = random.Random(seed)
+  vocabulary = vocabulary or make_vocabulary(max(entries * 2, fanout * 4), seed)
+  headwords = rng.sample(vocabulary, entries)
+  with open(path, 'w') as f:
+    for head in headwords:
+      synonyms = rng.sample(vocabulary, fanout)
+      f.write(f"{head}: {', '.join(synonyms)}\n")
+  return headwords
+
+
+def generate_haiku_lines(rng, words, syllable_lines=(5, 7, 5)):
+  """Three lines mixing thesaurus words with filler words"""
+  lines = []
+  for length in syllable_lines:
+    count = max(2, length // 2)
+    line = ' '.join(rng.choice(words) if rng.random() < 0.6 else rng.choice(FILLER)
+                    for _ in range(count))
+    lines.append(line.capitalize() + rng.choice(['', '.', ',', '!']))
+  return lines
+
+
+def generate_corpus(count, words, seed=1507):
+  """List of `count` haikus, each a list of three lines"""
+  rng = random.Random(seed)
+  return [generate_haiku_lines(rng, words) for _ in range(count)]
+
+
+def write_corpus(path, corpus):
+  """Write haikus as blank-line separated text"""
+  with open(path, 'w') as f:
+    f.write('\n\n'.join('\n'.join(lines) for lines in corpus) + '\n')
+
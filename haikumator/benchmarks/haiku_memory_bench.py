@@ -0,0 +1,115 @@
+"""
+Benchmark for the memory used by haiku variants.
+
+Generates variants of one haiku the way the processors used to (a full
+clone per variant, re-tokenized when replacements are applied, on a
+Haiku with a __dict__) and with copy-on-write Haiku.replaced(), keeps
+them all, and reports peak memory (RSS growth, each method in its own
+process), memory blocks still allocated afterwards and time.
+Run from the haikumator folder:
+  python -m benchmarks.haiku_memory_bench [number of variants]
+"""
+
+import gc
+import json
+import resource
+import subprocess
+import sys
+import time
+from itertools import cycle, islice
+from helpers.haiku import Haiku
+from helpers.permutations import iter_choices
+
+HAIKU = ("An old silent pond", "A frog jumps into the pond", "Splash! Silence again")
+THESAURUS = {
+  'old': ['ancient', 'aged', 'timeworn'],
+  'silent': ['quiet', 'still', 'hushed'],
+  'frog': ['toad', 'peeper'],
+  'jumps': ['leaps', 'hops', 'springs'],
+  'splash': ['plop', 'splosh'],
+  'again': ['once more', 'anew'],
+}
+
+
+class DictHaiku(Haiku):
+  """Haiku with an instance __dict__, like before __slots__"""
+
+
+def clone_variants(parent, mappings):
+  """The old way: clone, then replace in the clone"""
+  variants = []
+  for mapping in mappings:
+    variant = DictHaiku(*parent.lines)
+    variant.apply_replacements(mapping)
+    variant.capitalize_lines()
+    variants.append(variant)
+  return variants
+
+
+def cow_variants(parent, mappings):
+  """Copy-on-write: share unchanged lines and spans with the parent"""
+  variants = []
+  for mapping in mappings:
+    variant = parent.replaced(mapping)
+    variant.capitalize_lines()
+    variants.append(variant)
+  return variants
+
+
+def mappings(count):
+  """`count` replacement mappings, cycling over every synonym combination"""
+  # Leaving a word unchanged is one of the choices, so some lines stay shared
+  words = sorted(THESAURUS)
+  choices = [[None] + THESAURUS[word] for word in words]
+  combos = iter_choices([len(c) for c in choices])
+  for choice in islice(cycle(list(combos)), count):
+    yield {word: options[i] for word, options, i in zip(words, choices, choice) if i}
+
+
+def measure(method, count):
+  """Generate the variants in this process; returns its measurements"""
+  generate, parent = METHODS[method]
+  parent = parent(*HAIKU)
+  all_mappings = list(mappings(count))
+  gc.collect()
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  blocks = sys.getallocatedblocks()
+  start = time.perf_counter()
+  variants = generate(parent, all_mappings)
+  seconds = time.perf_counter() - start
+  # ru_maxrss is in KiB on Linux
+  peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) * 1024
+  return {'peak': peak, 'blocks': sys.getallocatedblocks() - blocks, 'seconds': seconds,
+          'variants': len(variants)}
+
+
+METHODS = {
+  'clone': (clone_variants, DictHaiku),
+  'copy-on-write': (cow_variants, Haiku),
+}
+
+
+def main(argv=None):
+  argv = list(argv or [])
+  if argv and argv[0] == '--method':
+    # Child process: one method, results as JSON on stdout
+    print(json.dumps(measure(argv[1], int(argv[2]))))
+    return
+  count = int(argv[0]) if argv else 10 ** 6
+  print(f"{count:,} variants of a three-line haiku, all kept in memory")
+  print(f"{'method':<16} {'peak MB':>9} {'bytes/variant':>14} {'blocks/variant':>15} {'time':>8}")
+  rows = {}
+  for name in METHODS:
+    # A fresh process per method, so each peak RSS is its own
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.haiku_memory_bench',
+                             '--method', name, str(count)],
+                            check=True, capture_output=True, text=True).stdout
+    row = rows[name] = json.loads(output)
+    print(f"{name:<16} {row['peak'] / 2 ** 20:>9.1f} {row['peak'] / count:>14.0f} "
+          f"{row['blocks'] / count:>15.1f} {row['seconds']:>7.2f}s")
+  print(f"peak memory reduced by {1 - rows['copy-on-write']['peak'] / rows['clone']['peak']:.0%}, "
+        f"memory blocks by {1 - rows['copy-on-write']['blocks'] / rows['clone']['blocks']:.0%}")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
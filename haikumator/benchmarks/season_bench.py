@@ -0,0 +1,64 @@
+"""
+Benchmark for season classification over a corpus.
+
+Compares one SeasonDetector per haiku (detect_season) with the batch
+SeasonDetector.classify_corpus, on a seeded synthetic corpus.
+Run from the haikumator folder:
+  python -m benchmarks.season_bench [number of haikus]
+"""
+
+import random
+import sys
+import time
+from helpers.haiku import Haiku
+from processors.seasonDetector import SeasonDetector, np
+
+FILLER = ['the', 'a', 'quiet', 'over', 'old', 'pond', 'light', 'falls', 'into', 'my',
+          'path', 'still', 'sky', 'mountain', 'voice', 'water', 'evening', 'alone']
+
+
+def synthetic_corpus(count, seed=1507):
+  """Haikus mixing filler words with season keywords"""
+  rng = random.Random(seed)
+  terms = list(SeasonDetector.TERMS)
+  haikus = []
+  for _ in range(count):
+    lines = []
+    for length in (3, 5, 3):
+      words = [rng.choice(terms) if rng.random() < 0.2 else rng.choice(FILLER)
+               for _ in range(length)]
+      lines.append(' '.join(words).capitalize() + rng.choice(['', '.', ',']))
+    haikus.append(Haiku(*lines))
+  return haikus
+
+
+def run(count):
+  haikus = synthetic_corpus(count)
+
+  start = time.perf_counter()
+  single = [SeasonDetector(haiku).detect_season() for haiku in haikus]
+  per_haiku = time.perf_counter() - start
+
+  # Fresh copies, so the batch run does not reuse tokenized lines
+  haikus = synthetic_corpus(count)
+  start = time.perf_counter()
+  result = SeasonDetector.classify_corpus(haikus)
+  batch = time.perf_counter() - start
+
+  agree = sum(a == b for a, b in zip(single, result.seasons))
+  return {'haikus': count, 'per_haiku': per_haiku, 'batch': batch,
+          'agreement': agree / count if count else 1.0}
+
+
+def main(argv=None):
+  counts = [int(arg) for arg in (argv or [])] or [1000, 10000, 100000]
+  print(f"NumPy: {'yes' if np is not None else 'no (pure Python fallback)'}")
+  print(f"{'haikus':>9} {'per haiku':>11} {'batch':>11} {'agreement':>10}")
+  for count in counts:
+    row = run(count)
+    print(f"{row['haikus']:>9} {row['per_haiku']:>10.3f}s {row['batch']:>10.3f}s "
+          f"{row['agreement']:>10.1%}")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for helpers.sorted_list.SortedList.
+
+Compares bulk construction, one-by-one add() and irange() queries with the
+previous linear-scan implementation, for 10^3 to 10^6 random words.
+Run from the haikumator folder:
+  python -m benchmarks.sorted_list_bench
+"""
+
+import random
+import string
+import sys
+import time
+from helpers.sorted_list import SortedList
+
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+# The linear-scan version is O(N^2); skip it where it would take minutes
+LINEAR_LIMIT = 10 ** 4
+
+
+class LinearSortedList:
+  """The previous implementation: linear scan, key recomputed on every compare"""
+  def __init__(self, iterable=None, key=None):
+    self._items = []
+    self._key = key or (lambda x: x)
+    if iterable:
+      for item in iterable:
+        self.add(item)
+
+  def add(self, item):
+    value = self._key(item)
+    for i, existing in enumerate(self._items):
+      if value < self._key(existing):
+        self._items.insert(i, item)
+        return
+    self._items.append(item)
+
+
+def random_words(count, seed=1507):
+  rng = random.Random(seed)
+  letters = string.ascii_lowercase
+  return [''.join(rng.choices(letters, k=rng.randint(2, 14))) for _ in range(count)]
+
+
+def timed(func):
+  start = time.perf_counter()
+  func()
+  return time.perf_counter() - start
+
+
+def run(sizes=SIZES):
+  """Time each operation for each size; returns a list of result rows"""
+  results = []
+  for size in sizes:
+    words = random_words(size)
+    row = {'size': size}
+    row['bulk'] = timed(lambda: SortedList(words, key=len))
+
+    def add_all():
+      sorted_list = SortedList(key=len)
+      for word in words:
+        sorted_list.add(word)
+    # add() is still O(N) per insert because of list.insert; cap it at 10^5
+    row['add'] = timed(add_all) if size <= 10 ** 5 else None
+
+    sorted_list = SortedList(words, key=len)
+    row['irange'] = timed(lambda: [list(sorted_list.irange(n, n + 1)) for n in range(2, 15)])
+    row['linear'] = timed(lambda: LinearSortedList(words, key=len)) if size <= LINEAR_LIMIT else None
+    results.append(row)
+  return results
+
+
+def format_seconds(value):
+  return f"{value:10.4f}s" if value is not None else f"{'skipped':>11}"
+
+
+def main(argv=None):
+  sizes = [int(arg) for arg in (argv or [])] or SIZES
+  print(f"{'size':>9} {'bulk':>11} {'add':>11} {'irange':>11} {'linear':>11}")
+  for row in run(sizes):
+    print(f"{row['size']:>9} {format_seconds(row['bulk'])} {format_seconds(row['add'])} "
+          f"{format_seconds(row['irange'])} {format_seconds(row['linear'])}")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,224 @@
+"""
+Benchmark suite for the Haikumator application.
+
+Generates a seeded synthetic thesaurus and haiku corpus, times thesaurus
+loading, every processor, season detection and batch throughput, and
+saves the results as JSON so that two runs can be compared:
+  python -m benchmarks.suite run --size small --out before.json
+  python -m benchmarks.suite run --size small --out after.json
+  python -m benchmarks.suite compare before.json after.json --threshold 0.10
+
+'compare' exits with status 1 if any benchmark got slower by more than
+the threshold. Processors are timed through apply(), which is process()
+without the console I/O. Each benchmark runs several times and the
+fastest run is kept, so one-off index building shows up only in 'mean'.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from benchmarks.generators import generate_corpus, generate_thesaurus, make_vocabulary
+from helpers.compact_thesaurus import CompactThesaurus
+from helpers.compiled_thesaurus import CompiledThesaurus, compile_thesaurus
+from helpers.haiku import Haiku
+from helpers.sinks import JsonlSink
+from helpers.thesaurus import Thesaurus
+from processors.antonymizer import Antonymizer
+from processors.batchProcessor import BatchProcessor
+from processors.lengthen import Lengthener
+from processors.seasonDetector import SeasonDetector
+from processors.synonymizer import Synonymizer
+from processors.zenizer import Zenizer
+
+# entries and fanout of the thesaurus, haikus in the corpus, batch permutations
+SIZES = {
+  'small': {'entries': 2000, 'fanout': 8, 'haikus': 500, 'permutations': 20000},
+  'medium': {'entries': 20000, 'fanout': 12, 'haikus': 5000, 'permutations': 200000},
+  'large': {'entries': 200000, 'fanout': 16, 'haikus': 50000, 'permutations': 2000000},
+}
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+
+def timed(func, repeat, setup=None):
+  """Run func `repeat` times; returns (fastest, mean) seconds
+
+  With setup, each run is func(setup()) and setup is not timed.
+  """
+  times = []
+  for _ in range(repeat):
+    args = (setup(),) if setup else ()
+    start = time.perf_counter()
+    func(*args)
+    times.append(time.perf_counter() - start)
+  return min(times), sum(times) / len(times)
+
+
+def run_suite(size='small', seed=1507, repeat=DEFAULT_REPEAT, only=None):
+  """Run every benchmark; returns the results document"""
+  params = SIZES[size]
+  results = {}
+
+  def record(name, ops, func, setup=None):
+    if only and not any(part in name for part in only):
+      return
+    best, mean = timed(func, repeat, setup)
+    results[name] = {'seconds': best, 'mean': mean, 'ops': ops,
+                     'ops_per_sec': ops / best if best > 0 else None}
+    print(f"{name:<28} {best:>10.4f}s {results[name]['ops_per_sec'] or 0:>14,.0f} ops/s",
+          file=sys.stderr)
+
+  with tempfile.TemporaryDirectory() as folder:
+    vocabulary = make_vocabulary(params['entries'] * 2, seed)
+    syn_file = os.path.join(folder, 'syn.txt')
+    ant_file = os.path.join(folder, 'ant.txt')
+    headwords = generate_thesaurus(syn_file, params['entries'], params['fanout'], seed,
+                                   vocabulary)
+    generate_thesaurus(ant_file, params['entries'] // 2, params['fanout'], seed + 1,
+                       vocabulary)
+    corpus_lines = generate_corpus(params['haikus'], headwords, seed)
+
+    def fresh_corpus():
+      # New Haiku objects, so no run reuses lines tokenized by an earlier one
+      return [Haiku(*lines) for lines in corpus_lines]
+    corpus = fresh_corpus()
+
+    # Thesaurus loading
+    def load_text():
+      Thesaurus().load_from_file(syn_file)
+    record('thesaurus_load_text', params['entries'], load_text)
+
+    def load_compact():
+      CompactThesaurus().load_from_file(syn_file)
+    record('thesaurus_load_compact', params['entries'], load_compact)
+    compiled_file = compile_thesaurus(syn_file, os.path.join(folder, 'syn.hkc'))
+    record('thesaurus_compile', params['entries'],
+           lambda: compile_thesaurus(syn_file, compiled_file))
+
+    def open_compiled():
+      for _ in range(100):
+        CompiledThesaurus(compiled_file).close()
+    record('thesaurus_open_compiled', 100, open_compiled)
+    compiled = CompiledThesaurus(compiled_file)
+    record('thesaurus_compiled_lookup', len(headwords),
+           lambda: [compiled.get_entries(word) for word in headwords])
+
+    thesaurus = Thesaurus()
+    thesaurus.load_from_file(syn_file)
+    antonyms = Thesaurus()
+    antonyms.load_from_file(ant_file)
+    record('thesaurus_dict_lookup', len(headwords),
+           lambda: [thesaurus.get_entries(word) for word in headwords])
+    compact = CompactThesaurus()
+    compact.load_from_file(syn_file)
+    record('thesaurus_compact_lookup', len(headwords),
+           lambda: [compact.get_entries(word) for word in headwords])
+
+    # Processors
+    processors = {
+      'synonymize': Synonymizer(None, thesaurus),
+      'zenize': Zenizer(None, thesaurus),
+      'lengthen': Lengthener(None, thesaurus),
+      'antonymize': Antonymizer(None, thesaurus, antonyms),
+    }
+    for name, processor in processors.items():
+      record(f'process_{name}', len(corpus),
+             lambda haikus, processor=processor: [processor.apply(haiku) for haiku in haikus],
+             fresh_corpus)
+
+    # Season detection
+    record('season_detect', len(corpus),
+           lambda haikus: [SeasonDetector(haiku).detect_season() for haiku in haikus],
+           fresh_corpus)
+    record('season_classify_corpus', len(corpus), SeasonDetector.classify_corpus, fresh_corpus)
+
+    # Batch throughput: a haiku made of thesaurus words, cut off after N permutations
+    batch_haiku = Haiku(' '.join(headwords[0:3]), ' '.join(headwords[3:6]),
+                        ' '.join(headwords[6:9]))
+    batch = BatchProcessor(batch_haiku, thesaurus)
+    words, synonym_lists = batch.get_replaceable_words()
+
+    def batch_run():
+      target = os.path.join(folder, 'batch.jsonl')
+      with JsonlSink(target) as sink:
+        batch.generate_range(sink, words, synonym_lists, 0, params['permutations'])
+      os.remove(target)
+    record('batch_throughput', params['permutations'], batch_run)
+    compiled.close()
+
+  return {
+    'meta': {
+      'size': size, 'seed': seed, 'repeat': repeat, 'params': params,
+      'python': platform.python_version(), 'platform': platform.platform(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    },
+    'results': results,
+  }
+
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+  """Compare two result documents; returns rows (name, old, new, change, regressed)"""
+  rows = []
+  for name in sorted(set(old['results']) | set(new['results'])):
+    before = old['results'].get(name)
+    after = new['results'].get(name)
+    if before is None or after is None:
+      rows.append((name, before and before['seconds'], after and after['seconds'], None, False))
+      continue
+    change = after['seconds'] / before['seconds'] - 1 if before['seconds'] > 0 else 0.0
+    rows.append((name, before['seconds'], after['seconds'], change, change > threshold))
+  return rows
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Haikumator benchmark suite")
+  commands = parser.add_subparsers(dest='command', required=True)
+
+  run_parser = commands.add_parser('run', help="run the benchmarks")
+  run_parser.add_argument('--size', choices=sorted(SIZES), default='small')
+  run_parser.add_argument('--seed', type=int, default=1507)
+  run_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+  run_parser.add_argument('--only', nargs='*', help="run benchmarks whose name contains these")
+  run_parser.add_argument('--out', help="JSON file for the results (default: stdout)")
+
+  compare_parser = commands.add_parser('compare', help="compare two result files")
+  compare_parser.add_argument('old')
+  compare_parser.add_argument('new')
+  compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                              help="slowdown that counts as a regression, default 0.10")
+  args = parser.parse_args(argv)
+
+  if args.command == 'run':
+    document = run_suite(args.size, args.seed, args.repeat, args.only)
+    if args.out:
+      with open(args.out, 'w') as f:
+        json.dump(document, f, indent=2)
+    else:
+      print(json.dumps(document, indent=2))
+    return 0
+
+  with open(args.old) as f:
+    old = json.load(f)
+  with open(args.new) as f:
+    new = json.load(f)
+  if old['meta']['params'] != new['meta']['params']:
+    print("Warning: the runs used different benchmark sizes")
+  regressions = 0
+  print(f"{'benchmark':<28} {'old':>10} {'new':>10} {'change':>8}")
+  for name, before, after, change, regressed in compare(old, new, args.threshold):
+    if change is None:
+      print(f"{name:<28} {'only in one run':>30}")
+      continue
+    flag = '  REGRESSION' if regressed else ''
+    print(f"{name:<28} {before:>9.4f}s {after:>9.4f}s {change:>+8.1%}{flag}")
+    regressions += regressed
+  print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Benchmark for thesaurus memory use.
+
+Loads the same seeded synthetic thesaurus into the dict backend
+(Thesaurus) and the interned backend (CompactThesaurus), and reports the
+bytes per entry of each, measured with tracemalloc (memory held after
+loading, and the peak while loading) and with thesaurus_nbytes().
+Run from the haikumator folder:
+  python -m benchmarks.thesaurus_memory_bench [number of entries ...]
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.generators import generate_thesaurus
+from helpers.compact_thesaurus import CompactThesaurus, thesaurus_nbytes
+from helpers.thesaurus import Thesaurus
+
+FANOUT = 12
+
+
+def measure(backend, filename):
+  """Load a thesaurus; returns (thesaurus, held, peak, seconds)
+
+  The load is timed without tracemalloc, which slows allocation down, and
+  then repeated under it to measure memory.
+  """
+  start = time.perf_counter()
+  backend().load_from_file(filename)
+  seconds = time.perf_counter() - start
+  gc.collect()
+  tracemalloc.start()
+  thesaurus = backend()
+  thesaurus.load_from_file(filename)
+  held, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return thesaurus, held, peak, seconds
+
+
+def run(entries):
+  with tempfile.TemporaryDirectory() as folder:
+    filename = os.path.join(folder, 'syn.txt')
+    generate_thesaurus(filename, entries, FANOUT)
+    rows = {}
+    for name, backend in (('dict', Thesaurus), ('compact', CompactThesaurus)):
+      thesaurus, held, peak, seconds = measure(backend, filename)
+      rows[name] = {'held': held / entries, 'peak': peak / entries,
+                    'nbytes': thesaurus_nbytes(thesaurus) / entries, 'seconds': seconds}
+      del thesaurus
+  return rows
+
+
+def main(argv=None):
+  counts = [int(arg) for arg in (argv or [])] or [10000, 100000, 500000]
+  print(f"Bytes per entry, {FANOUT} synonyms per entry")
+  print(f"{'entries':>9} {'backend':>8} {'held':>9} {'peak':>9} {'nbytes':>9} {'load':>9}")
+  for count in counts:
+    rows = run(count)
+    for name, row in rows.items():
+      print(f"{count:>9} {name:>8} {row['held']:>9.0f} {row['peak']:>9.0f} "
+            f"{row['nbytes']:>9.0f} {row['seconds']:>8.2f}s")
+    print(f"{'':>9} {'saving':>8} {1 - rows['compact']['held'] / rows['dict']['held']:>9.0%}")
+
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,47 @@
+# FileCache class
+
+# Size-bounded LRU registry of objects loaded from files (Thesaurus, Haiku)
+# Entries are keyed by path and loader, and are reloaded when the file's
+# mtime or size changes
+
+import os
+from collections import OrderedDict
+
+
+class FileCache:
+  def __init__(self, maxsize=32):
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._entries = OrderedDict()
+
+  def get(self, filename, loader):
+    """Return loader(filename), reusing the cached object if the file is unchanged"""
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), loader)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    entry = self._entries.get(key)
+    if entry is not None and entry[0] == signature:
+      self.hits += 1
+      self._entries.move_to_end(key)
+      return entry[1]
+
+    self.misses += 1
+    value = loader(filename)
+    self._entries[key] = (signature, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)  # evict least recently used
+    return value
+
+  def clear(self):
+    self._entries.clear()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def stats(self):
+    """Hit/miss counters and current size"""
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+            'maxsize': self.maxsize}
@@ -0,0 +1,116 @@
+# Checkpoints and manifests for batch jobs
+
+# A batch job (or one shard/worker part of it) covers a contiguous range of
+# permutation indexes. Its checkpoint file records how far the range got;
+# once the range is finished the same file is the range's manifest. It also
+# keeps the sink's mark() from that moment, so a resumed run can cut the
+# target back to it before writing again, and the length of the job's
+# dedup digest log (see helpers.dedup.DigestLog), which is cut back the same way.
+# merge_manifests() combines the manifests of all shards into one index.
+
+import json
+import os
+
+DEFAULT_CHECKPOINT_EVERY = 10000
+
+# Manifest fields that identify the job; a checkpoint only resumes a job
+# with the same values
+JOB_FIELDS = ('words', 'radices', 'start', 'stop', 'target')
+
+
+class Checkpoint:
+  def __init__(self, path, job, every=DEFAULT_CHECKPOINT_EVERY):
+    # job: dict with the JOB_FIELDS of the range being generated
+    self.path = path
+    self.job = job
+    self.every = every
+
+  def load(self):
+    """Return the manifest saved for this job, or a fresh one"""
+    if not os.path.isfile(self.path):
+      return dict(self.job, next=self.job['start'], count=0, complete=False)
+    with open(self.path, 'r') as f:
+      manifest = json.load(f)
+    for field in JOB_FIELDS:
+      if manifest.get(field) != self.job[field]:
+        raise ValueError(f"Checkpoint {self.path} belongs to a different job ({field} differs)")
+    return manifest
+
+  def save(self, next_index, count, complete=False, sink=None, dedup=None):
+    """Atomically record progress: next index to generate, haikus written,
+    the sink's mark() and the dedup state ({'digests', 'dropped'})"""
+    manifest = dict(self.job, next=next_index, count=count, complete=complete, sink=sink,
+                    dedup=dedup)
+    temp = self.path + '.tmp'
+    with open(temp, 'w') as f:
+      json.dump(manifest, f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(temp, self.path)
+    return manifest
+
+
+def checkpoint_path(target, shard=0, shards=1):
+  """Default checkpoint/manifest file for a target and shard"""
+  return f"{os.path.normpath(target)}.shard{shard}-of-{shards}.json"
+
+
+def digest_log_path(checkpoint_file):
+  """Dedup digest log kept beside a checkpoint file"""
+  return f"{checkpoint_file}.digests"
+
+
+def merge_manifests(paths):
+  """Combine range manifests into one index of what was produced
+
+  Raises ValueError if the manifests come from different jobs or overlap.
+  Ranges that are not covered by any manifest are listed under 'missing'.
+  """
+  manifests = []
+  for path in paths:
+    with open(path, 'r') as f:
+      manifests.append(json.load(f))
+  if not manifests:
+    raise ValueError("No manifests to merge")
+
+  first = manifests[0]
+  for manifest in manifests[1:]:
+    if manifest['words'] != first['words'] or manifest['radices'] != first['radices']:
+      raise ValueError("Manifests belong to different jobs")
+
+  total = 1
+  for radix in first['radices']:
+    total *= radix
+
+  ranges = []
+  missing = []
+  position = 0
+  for manifest in sorted(manifests, key=lambda m: m['start']):
+    if manifest['start'] < position:
+      raise ValueError(f"Manifest ranges overlap at permutation {manifest['start']}")
+    if manifest['start'] > position:
+      missing.append([position, manifest['start']])
+    # Anything from 'next' onwards was not produced yet
+    if manifest['next'] < manifest['stop']:
+      missing.append([manifest['next'], manifest['stop']])
+    ranges.append({
+      'start': manifest['start'],
+      'stop': manifest['stop'],
+      'produced': [manifest['start'], manifest['next']],
+      'count': manifest['count'],
+      'target': manifest['target'],
+      'complete': manifest['complete'],
+    })
+    position = manifest['stop']
+  if position < total:
+    missing.append([position, total])
+
+  return {
+    'words': first['words'],
+    'radices': first['radices'],
+    'total': total,
+    'count': sum(r['count'] for r in ranges),
+    'complete': not missing,
+    'ranges': ranges,
+    'missing': missing,
+  }
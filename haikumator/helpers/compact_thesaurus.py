@@ -0,0 +1,81 @@
+# CompactThesaurus class
+
+# In-memory Thesaurus for very large vocabularies: every distinct word is
+# stored once in a string table, and entries are ranges of string ids in
+# two arrays instead of one Python list of strings per headword
+# thesaurus_nbytes(): approximate memory held by a thesaurus, either backend
+
+import sys
+from array import array
+from helpers.thesaurus import Thesaurus
+
+
+class CompactThesaurus(Thesaurus):
+  def __init__(self):
+    super().__init__()
+    self._strings = []              # string id -> word, each word stored once
+    self._entries = {}              # headword -> entry number
+    self._offsets = array('I', [0])  # entry n is _values[_offsets[n]:_offsets[n + 1]]
+    self._values = array('I')       # string ids of the synonyms
+
+  def load_from_file(self, filename):
+    """Load thesaurus data from file, one line at a time"""
+    # word -> string id; dicts keep insertion order, so ids follow it
+    ids = {word: i for i, word in enumerate(self._strings)}
+    heads = {ids[word]: entry for word, entry in self._entries.items()}
+    values = self._values
+    with open(filename, 'r') as f:
+      for line in f:
+        if ':' in line:
+          word, synonyms = line.split(':', 1)
+          head = ids.setdefault(word.strip().lower(), len(ids))
+          values.extend([ids.setdefault(s.strip().lower(), len(ids))
+                         for s in synonyms.split(',')])
+          # A repeated headword replaces its earlier entry and moves to its
+          # new line, as in Thesaurus
+          heads.pop(head, None)
+          heads[head] = len(self._offsets) - 1
+          self._offsets.append(len(values))
+    self._strings = list(ids)
+    self._entries = {self._strings[head]: entry for head, entry in heads.items()}
+    self._reset_indexes()
+
+  def get_entries(self, word):
+    """Get entries for a word (case insensitive)"""
+    entry = self._entries.get(word.lower())
+    if entry is None:
+      return []
+    strings = self._strings
+    return [strings[i] for i in self._values[self._offsets[entry]:self._offsets[entry + 1]]]
+
+  def __contains__(self, word):
+    return word.lower() in self._entries
+
+  def __iter__(self):
+    """Iterate over words in the thesaurus"""
+    return iter(self._entries)
+
+  def __len__(self):
+    return len(self._entries)
+
+
+def thesaurus_nbytes(thesaurus):
+  """Approximate bytes held by a thesaurus's entries (dict or compact backend)
+
+  Counts the containers and every string object once, as sys.getsizeof
+  reports them; derived indexes (rankings, graph) are not included.
+  """
+  if isinstance(thesaurus, CompactThesaurus):
+    total = (sys.getsizeof(thesaurus._strings) + sys.getsizeof(thesaurus._entries)
+             + sys.getsizeof(thesaurus._offsets) + sys.getsizeof(thesaurus._values))
+    return total + sum(sys.getsizeof(word) for word in thesaurus._strings)
+
+  seen = set()
+  total = sys.getsizeof(thesaurus._data)
+  for head, synonyms in thesaurus._data.items():
+    total += sys.getsizeof(synonyms)
+    for word in (head, *synonyms):
+      if id(word) not in seen:
+        seen.add(id(word))
+        total += sys.getsizeof(word)
+  return total
@@ -0,0 +1,261 @@
+# Compiled thesaurus files
+
+# compile_thesaurus(): turn a text thesaurus (word: syn, syn, ...) into a
+#   binary index with a sorted string table and offset arrays
+# CompiledThesaurus: Thesaurus backed by an mmap of the compiled file
+# open_thesaurus(): load a thesaurus through its compiled cache, which lives
+#   next to the source (syn001.txt -> syn001.txt.hkc) and is rebuilt when
+#   the source content changes, or a LazyThesaurus
+# prepare_thesaurus(): build the cache (or lazy index) once, e.g. before
+#   starting worker processes that all open the same thesaurus
+#
+# File layout (little-endian):
+#   header          magic, version, counts, sha256 of source, source size/mtime
+#   string_offsets  n_strings + 1 uint32, byte offsets into the string data
+#   heads           n_entries uint32, string id of each headword (sorted)
+#   order           n_entries uint32, entry index of each headword in source order
+#   entry_offsets   n_entries + 1 uint32, offsets into values
+#   values          n_values uint32, string ids of the synonyms
+#   string data     UTF-8 bytes of every distinct word, sorted
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from helpers.lazy_thesaurus import LazyThesaurus, ensure_line_index
+from helpers.thesaurus import Thesaurus
+
+MAGIC = b'HKTH'
+VERSION = 2
+CACHE_SUFFIX = '.hkc'
+_HEADER = struct.Struct('<4sIIII32sQQ')
+
+
+def _source_hash(filename):
+  digest = hashlib.sha256()
+  with open(filename, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return digest.digest()
+
+
+def _uint32_array(values):
+  data = array('I', values)
+  if sys.byteorder == 'big':
+    data.byteswap()
+  return data.tobytes()
+
+
+def compile_thesaurus(source, target=None):
+  """Compile a text thesaurus into the binary format; returns the target path"""
+  target = target or source + CACHE_SUFFIX
+
+  # Same parsing rules as Thesaurus.load_from_file
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(source)
+  data = thesaurus._data
+
+  strings = set(data)
+  for synonyms in data.values():
+    strings.update(synonyms)
+  encoded = sorted(word.encode('utf-8') for word in strings)
+  ids = {word: i for i, word in enumerate(encoded)}
+
+  string_offsets = [0]
+  for word in encoded:
+    string_offsets.append(string_offsets[-1] + len(word))
+  heads = sorted(word.encode('utf-8') for word in data)
+  entries = {head: i for i, head in enumerate(heads)}
+  entry_offsets = [0]
+  values = []
+  for head in heads:
+    values.extend(ids[synonym.encode('utf-8')] for synonym in data[head.decode('utf-8')])
+    entry_offsets.append(len(values))
+
+  stat = os.stat(source)
+  header = _HEADER.pack(MAGIC, VERSION, len(encoded), len(heads), len(values),
+                        _source_hash(source), stat.st_size, stat.st_mtime_ns)
+  # A temporary file of its own, so processes compiling at the same time
+  # never replace the target with each other's half-written files
+  fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target) or '.')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(header)
+      f.write(_uint32_array(string_offsets))
+      f.write(_uint32_array(ids[head] for head in heads))
+      f.write(_uint32_array(entries[head.encode('utf-8')] for head in data))
+      f.write(_uint32_array(entry_offsets))
+      f.write(_uint32_array(values))
+      f.write(b''.join(encoded))
+    # mkstemp() makes the file private; readable like its source instead
+    os.chmod(temp, stat.st_mode & 0o666)
+    os.replace(temp, target)
+  except BaseException:
+    os.remove(temp)
+    raise
+  return target
+
+
+def _compiled_size(f, header):
+  """Size a compiled file with this header must have; f is positioned after it"""
+  _, _, n_strings, n_entries, n_values = header[:5]
+  arrays = _HEADER.size + 4 * (n_strings + 1 + 2 * n_entries + n_entries + 1 + n_values)
+  # The last string offset is the length of the string data
+  f.seek(_HEADER.size + 4 * n_strings)
+  last = f.read(4)
+  if len(last) < 4:
+    return None
+  return arrays + struct.unpack('<I', last)[0]
+
+
+# Thesaurus read straight from a memory-mapped compiled file
+class CompiledThesaurus(Thesaurus):
+  def __init__(self, filename):
+    super().__init__()
+    self.filename = filename
+    with open(filename, 'rb') as f:
+      header = f.read(_HEADER.size)
+      if len(header) < _HEADER.size or _HEADER.unpack(header)[:2] != (MAGIC, VERSION):
+        raise ValueError(f"{filename} is not a compiled thesaurus")
+      if os.fstat(f.fileno()).st_size != _compiled_size(f, _HEADER.unpack(header)):
+        raise ValueError(f"{filename} is truncated")
+      self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, version, n_strings, n_entries, n_values,
+     self.source_hash, self.source_size, self.source_mtime) = _HEADER.unpack_from(self._mm)
+
+    position = _HEADER.size
+    self._string_offsets, position = self._array(position, n_strings + 1)
+    self._heads, position = self._array(position, n_entries)
+    self._order, position = self._array(position, n_entries)
+    self._entry_offsets, position = self._array(position, n_entries + 1)
+    self._values, position = self._array(position, n_values)
+    self._strings_start = position
+
+  def _array(self, position, length):
+    end = position + 4 * length
+    if sys.byteorder == 'little':
+      view = memoryview(self._mm)[position:end].cast('I')
+    else:
+      view = array('I', self._mm[position:end])
+      view.byteswap()
+    return view, end
+
+  def _string(self, string_id):
+    start = self._strings_start + self._string_offsets[string_id]
+    end = self._strings_start + self._string_offsets[string_id + 1]
+    return self._mm[start:end]
+
+  def _find(self, word):
+    """Binary search the headwords; returns the entry index or -1"""
+    key = word.lower().encode('utf-8')
+    lo, hi = 0, len(self._heads)
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self._string(self._heads[mid]) < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    if lo < len(self._heads) and self._string(self._heads[lo]) == key:
+      return lo
+    return -1
+
+  def load_from_file(self, filename):
+    raise TypeError("CompiledThesaurus is read-only; use open_thesaurus()")
+
+  def get_entries(self, word):
+    """Get entries for a word (case insensitive)"""
+    entry = self._find(word)
+    if entry < 0:
+      return []
+    return [
+      self._string(self._values[i]).decode('utf-8')
+      for i in range(self._entry_offsets[entry], self._entry_offsets[entry + 1])
+    ]
+
+  def __contains__(self, word):
+    return self._find(word) >= 0
+
+  def __iter__(self):
+    """Iterate over words in the thesaurus, in source order as Thesaurus does"""
+    return (self._string(self._heads[entry]).decode('utf-8') for entry in self._order)
+
+  def __len__(self):
+    return len(self._heads)
+
+  def close(self):
+    """Release the memory map"""
+    for view in (self._string_offsets, self._heads, self._order, self._entry_offsets,
+                 self._values):
+      if isinstance(view, memoryview):
+        view.release()
+    self._mm.close()
+
+
+def _cache_is_fresh(source, cache):
+  """Check a compiled cache against its source, by content hash
+
+  A cache that is not a whole compiled file (bad magic, cut short) is stale.
+  """
+  try:
+    with open(cache, 'rb') as f:
+      header = f.read(_HEADER.size)
+      magic, version, _, _, _, digest, size, mtime = _HEADER.unpack(header)
+      if magic != MAGIC or version != VERSION:
+        return False
+      if os.fstat(f.fileno()).st_size != _compiled_size(f, _HEADER.unpack(header)):
+        return False
+  except (OSError, struct.error):
+    return False
+  stat = os.stat(source)
+  if stat.st_size == size and stat.st_mtime_ns == mtime:
+    return True  # unchanged since compiling, no need to hash
+  if stat.st_size != size or _source_hash(source) != digest:
+    return False
+  # Touched but identical content: record the new mtime
+  with open(cache, 'r+b') as f:
+    f.write(_HEADER.pack(magic, version, *_HEADER.unpack(header)[2:7], stat.st_mtime_ns))
+  return True
+
+
+def open_thesaurus(filename, lazy=False):
+  """Load a thesaurus, compiling it to a cached binary index when needed
+
+  With lazy=True, returns a LazyThesaurus that parses entries from the
+  text file only when they are looked up. Falls back to parsing the text
+  file if the cache cannot be written.
+  """
+  if lazy:
+    return LazyThesaurus(filename)
+  cache = filename + CACHE_SUFFIX
+  try:
+    if not _cache_is_fresh(filename, cache):
+      compile_thesaurus(filename, cache)
+    try:
+      return CompiledThesaurus(cache)
+    except ValueError:
+      # Damaged since it was checked: compile it again
+      compile_thesaurus(filename, cache)
+      return CompiledThesaurus(cache)
+  except OSError:
+    thesaurus = Thesaurus()
+    thesaurus.load_from_file(filename)
+    return thesaurus
+
+
+def prepare_thesaurus(filename, lazy=False):
+  """Bring the compiled cache (or with lazy=True the line index) of a
+  thesaurus up to date, so that processes opening it later only read it
+
+  A cache that cannot be written is left to open_thesaurus, which falls
+  back to the text file.
+  """
+  try:
+    if lazy:
+      ensure_line_index(filename)
+    elif not _cache_is_fresh(filename, filename + CACHE_SUFFIX):
+      compile_thesaurus(filename, filename + CACHE_SUFFIX)
+  except OSError:
+    pass
@@ -0,0 +1,140 @@
+# Corpus reader
+
+# Streams Haiku objects out of multi-poem files:
+#   text   poems separated by blank lines (first three lines of each are used)
+#   jsonl  one record per line, with "text" or "lines"
+# Either may be gzip-compressed (.gz). Files are read in fixed-size chunks,
+# so memory use does not depend on the size of the corpus. Each poem comes
+# with the byte offset where it starts (in the uncompressed data), which
+# read_at() can seek back to. A malformed jsonl record is yielded with an
+# error instead of a haiku, so one bad line does not end the file.
+
+import gzip
+import json
+from collections import namedtuple
+from helpers.haiku import Haiku
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+FORMATS = ('text', 'jsonl')
+
+# One poem of a corpus
+#   number  1-based position of the poem in the file
+#   offset  byte offset of the poem's first line (uncompressed)
+#   haiku   the Haiku, None if the record is malformed
+#   record  the parsed JSON record for jsonl input, None for text (and for
+#           a line that is not JSON)
+#   error   why the record is malformed, None if it is not
+CorpusEntry = namedtuple('CorpusEntry', 'number offset haiku record error', defaults=(None,))
+
+
+def record_haiku(record):
+  """Build a Haiku from a JSON record with "text" or "lines" """
+  if 'lines' in record:
+    lines = record['lines']
+  elif 'text' in record:
+    lines = record['text'].split('\n')
+  else:
+    raise ValueError("record has no 'text' or 'lines'")
+  return Haiku(*[line.strip() for line in lines[:3]])
+
+
+def corpus_format(path):
+  """'jsonl' for *.jsonl(.gz) files, 'text' otherwise"""
+  name = path[:-3] if path.endswith('.gz') else path
+  return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'text'
+
+
+def _open(path):
+  return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def iter_lines(f, chunk_size=DEFAULT_CHUNK_SIZE):
+  """Yield (offset, line) from a binary file, reading chunk_size bytes at a time
+
+  Lines are decoded and lose their line ending.
+  """
+  buffer = bytearray()
+  base = 0  # file offset of buffer[0]
+  while True:
+    chunk = f.read(chunk_size)
+    if not chunk:
+      break
+    buffer += chunk
+    start = 0
+    while True:
+      end = buffer.find(b'\n', start)
+      if end < 0:
+        break
+      yield base + start, buffer[start:end].decode('utf-8').rstrip('\r')
+      start = end + 1
+    del buffer[:start]
+    base += start
+  if buffer:
+    yield base, buffer.decode('utf-8').rstrip('\r')
+
+
+def _text_poems(lines):
+  """Group (offset, line) pairs into (offset, poem lines) at blank lines"""
+  offset = None
+  poem = []
+  for line_offset, line in lines:
+    if line.strip():
+      if not poem:
+        offset = line_offset
+      poem.append(line.strip())
+    elif poem:
+      yield offset, poem
+      poem = []
+  if poem:
+    yield offset, poem
+
+
+def iter_corpus(path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, start=0):
+  """Yield a CorpusEntry for every poem in a corpus file
+
+  format is 'text' or 'jsonl', guessed from the file name by default.
+  Reading starts at byte offset `start`, which must be the offset of a
+  poem; numbers then count from there. Malformed jsonl records are
+  yielded too, with their error set and no haiku, and are numbered like
+  the others.
+  """
+  format = format or corpus_format(path)
+  if format not in FORMATS:
+    raise ValueError(f"Unknown corpus format: {format}")
+  with _open(path) as f:
+    if start:
+      f.seek(start)
+    lines = ((start + offset, line) for offset, line in iter_lines(f, chunk_size))
+    if format == 'text':
+      for number, (offset, poem) in enumerate(_text_poems(lines), 1):
+        yield CorpusEntry(number, offset, Haiku(*poem[:3]), None)
+      return
+    number = 0
+    for offset, line in lines:
+      if not line.strip():
+        continue
+      number += 1
+      record = None
+      try:
+        record = json.loads(line)
+        haiku = record_haiku(record)
+      except (ValueError, TypeError, AttributeError) as e:
+        # Keep a record that parsed, so its fields can be passed through
+        if not isinstance(record, dict):
+          record = None
+        yield CorpusEntry(number, offset, None, record, str(e))
+        continue
+      yield CorpusEntry(number, offset, haiku, record)
+
+
+def read_at(path, offset, format=None):
+  """Read the single poem starting at a byte offset reported by iter_corpus
+
+  Plain files seek directly; gzip files have to decompress up to the offset.
+  Raises ValueError if the record there is malformed.
+  """
+  for entry in iter_corpus(path, format, start=offset):
+    if entry.error:
+      raise ValueError(f"{path}: bad record at byte {offset}: {entry.error}")
+    return entry
+  raise ValueError(f"{path}: no poem at byte {offset}")
@@ -0,0 +1,141 @@
+# Duplicate detection for batch output
+
+# ExactDeduplicator: set of text digests, no false positives
+# BloomDeduplicator: fixed-size Bloom filter for very large jobs; may drop
+#   a small fraction (error_rate) of haikus that were not duplicates
+# make_deduplicator(): build one from a mode name
+# DigestLog: append-only file of the digests a deduplicator remembered, so
+#   a resumed job can rebuild its filter
+
+import math
+import os
+from hashlib import blake2b
+
+# Above this many permutations 'auto' switches from a set to a Bloom filter
+AUTO_BLOOM_THRESHOLD = 10_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+
+_DIGEST_SIZE = 16
+
+
+def _digest(text):
+  return blake2b(text.encode('utf-8'), digest_size=_DIGEST_SIZE).digest()
+
+
+class ExactDeduplicator:
+  def __init__(self):
+    self._seen = set()
+    self.dropped = 0
+    # DigestLog that new digests are appended to, if any
+    self.log = None
+
+  def is_duplicate(self, text):
+    """Return True if text was seen before, otherwise remember it"""
+    digest = _digest(text)
+    if digest in self._seen:
+      self.dropped += 1
+      return True
+    self._seen.add(digest)
+    if self.log is not None:
+      self.log.write(digest)
+    return False
+
+  def remember(self, digest):
+    """Take a digest replayed from a DigestLog"""
+    self._seen.add(digest)
+
+
+class BloomDeduplicator:
+  def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+    # Standard sizing: m = -n ln p / (ln 2)^2 bits and k = m/n ln 2 hashes
+    capacity = max(1, capacity)
+    self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    self.hashes = max(1, round(self.size / capacity * math.log(2)))
+    self._bits = bytearray((self.size + 7) // 8)
+    self.dropped = 0
+    # DigestLog that new digests are appended to, if any
+    self.log = None
+
+  def is_duplicate(self, text):
+    """Return True if text was (probably) seen before, otherwise remember it"""
+    digest = _digest(text)
+    if self.remember(digest):
+      self.dropped += 1
+      return True
+    if self.log is not None:
+      self.log.write(digest)
+    return False
+
+  def remember(self, digest):
+    """Set the bits of a digest; returns True if they all were set already"""
+    # Double hashing: position i is h1 + i * h2
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    bits = self._bits
+    present = True
+    for i in range(self.hashes):
+      position = (h1 + i * h2) % self.size
+      byte, mask = position >> 3, 1 << (position & 7)
+      if not bits[byte] & mask:
+        present = False
+        bits[byte] |= mask
+    return present
+
+
+def make_deduplicator(mode, expected=0, error_rate=DEFAULT_ERROR_RATE):
+  """Create a deduplicator: 'exact', 'bloom' or 'auto' (bloom for huge jobs)"""
+  if mode == 'auto':
+    mode = 'bloom' if expected > AUTO_BLOOM_THRESHOLD else 'exact'
+  if mode == 'exact':
+    return ExactDeduplicator()
+  if mode == 'bloom':
+    return BloomDeduplicator(expected, error_rate)
+  raise ValueError(f"Unknown dedup mode: {mode}")
+
+
+class DigestLog:
+  # The digests of the haikus a deduplicator let through, in order. Like a
+  # sink, the log is cut back to the length saved with the last checkpoint
+  # before a resumed job appends to it; replaying it gives the filter the
+  # state it had then (a Bloom filter of any size, or the exact set).
+  def __init__(self, path, sync='none'):
+    self.path = path
+    self.sync = sync
+    self._file = None
+
+  def open(self, deduplicator, length=0):
+    """Replay the first `length` bytes into the deduplicator, drop the
+    rest, and log the deduplicator's new digests from now on"""
+    size = _DIGEST_SIZE * (length // _DIGEST_SIZE)
+    self._file = open(self.path, 'a+b')
+    if self._file.seek(0, os.SEEK_END) < size:
+      self._file.close()
+      self._file = None
+      raise ValueError(f"Digest log {self.path} is shorter than its checkpoint")
+    self._file.truncate(size)
+    self._file.seek(0)
+    remember = deduplicator.remember
+    while True:
+      chunk = self._file.read(_DIGEST_SIZE << 12)
+      if not chunk:
+        break
+      for i in range(0, len(chunk), _DIGEST_SIZE):
+        remember(chunk[i:i + _DIGEST_SIZE])
+    deduplicator.log = self
+    return self
+
+  def write(self, digest):
+    self._file.write(digest)
+
+  def mark(self):
+    """Length of the log so far, flushed (and synced, if the sink is)"""
+    self._file.flush()
+    if self.sync != 'none':
+      os.fsync(self._file.fileno())
+    return self._file.tell()
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
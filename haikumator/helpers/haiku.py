@@ -4,47 +4,216 @@
 # Methods to parse, display, and modify lines
 # Word counting functionality
 
+import re
+from collections import namedtuple
+from itertools import islice
+
+# A token is any run of non-whitespace characters. Its word core starts and
+# ends with a word character, so leading quotes/brackets and trailing
+# punctuation are split off while inner hyphens and apostrophes are kept.
+_TOKEN_RE = re.compile(r"\S+")
+_WORD_RE = re.compile(r"^(\W*)(\w(?:.*\w)?)(\W*)$")
+# The same word cores, found directly in a whole line
+_LINE_WORDS_RE = re.compile(r"(?<!\S)\W*(\w(?:\S*\w)?)\W*(?!\S)")
+
+# One word of a haiku line
+#   line        index of the line the word is on
+#   start, end  offsets of the word core inside the line
+#   lead, trail punctuation before/after the core (e.g. '"' and '.,')
+#   word        the word core as written
+#   key         lowercase word core, used for matching
+#   capitalized True if the word core starts with an uppercase letter
+Span = namedtuple('Span', 'line start end lead word trail key capitalized')
+
+
+def _match_case(new_word, capitalized):
+  """Apply the case rule of the word being replaced to its replacement"""
+  return new_word.capitalize() if capitalized else new_word.lower()
+
+
+def tokenize_line(line, line_index=0):
+  """Split a line into word spans"""
+  spans = []
+  for match in _TOKEN_RE.finditer(line):
+    parts = _WORD_RE.match(match.group())
+    if not parts:
+      continue  # punctuation-only token such as '-' or '...'
+    lead, word, trail = parts.groups()
+    start = match.start() + len(lead)
+    spans.append(Span(line_index, start, start + len(word), lead, word, trail,
+                      word.lower(), word[0].isupper()))
+  return spans
+
+
+def line_words(line):
+  """Lowercase word cores of a line, without building spans"""
+  return _LINE_WORDS_RE.findall(line.lower())
+
+
 class Haiku:
-  def __init__(self, line1="", line2="", line3=""):
-    self._lines = [line1, line2, line3]
+  # Lines and their word spans are kept in tuples, which copies share with
+  # the haiku they came from. Changing a line gives this haiku a new tuple
+  # and re-tokenizes only that line, so unchanged lines are never copied.
+  __slots__ = ('_lines', '_spans', 'frozen')
+
+  def __init__(self, line1="", line2="", line3="", frozen=False):
+    self._lines = (line1, line2, line3)
+    self._spans = (None, None, None)  # per-line spans, tokenized on first use
+    # A frozen haiku refuses in-place changes; use replaced() or copy()
+    self.frozen = frozen
+
+  @classmethod
+  def _derive(cls, lines, spans, frozen=False):
+    """New haiku sharing the given line and span tuples"""
+    haiku = cls.__new__(cls)
+    haiku._lines = lines
+    haiku._spans = spans
+    haiku.frozen = frozen
+    return haiku
 
   @property
   def lines(self):
-    """Public property to access haiku lines"""
+    """Public property to access haiku lines (a tuple)"""
     return self._lines
-    
+
+  @property
+  def spans(self):
+    """Word spans of every line, in reading order"""
+    return [span for line_spans in self.line_spans() for span in line_spans]
+
   @classmethod
   def from_file(cls, filename):
-    """Create Haiku from file"""
+    """Create Haiku from the first three lines of a file
+
+    For files holding many poems, use helpers.corpus.iter_corpus().
+    """
     with open(filename, 'r') as f:
-      lines = [line.strip() for line in f.readlines()[:3]]
+      lines = [line.strip() for line in islice(f, 3)]
     return cls(*lines)
-    
+
   def __str__(self):
     return "\n".join(self._lines)
-    
+
+  def line_spans(self):
+    """Word spans of each line, one tuple per line
+
+    Each line is tokenized once; lines changed since are tokenized again.
+    """
+    spans = self._spans
+    if None in spans:
+      spans = tuple(
+        line_spans if line_spans is not None else tuple(tokenize_line(line, i))
+        for i, (line, line_spans) in enumerate(zip(self._lines, spans))
+      )
+      self._spans = spans
+    return spans
+
+  def _check_mutable(self):
+    if self.frozen:
+      raise TypeError("this Haiku is frozen; use replaced() or copy() instead")
+
+  def _set_lines(self, lines):
+    """Take new lines, keeping the strings and spans of lines that did not change"""
+    unchanged = [new == old for new, old in zip(lines, self._lines)]
+    self._lines = tuple(old if same else new
+                        for new, old, same in zip(lines, self._lines, unchanged))
+    self._spans = tuple(old_spans if same else None
+                        for old_spans, same in zip(self._spans, unchanged))
+
+  def copy(self, frozen=False):
+    """A copy sharing this haiku's lines and spans until either is changed"""
+    return self._derive(self._lines, self._spans, frozen)
+
+  def freeze(self):
+    """Refuse in-place changes from now on; returns the haiku"""
+    self.frozen = True
+    return self
+
+  def set_line(self, index, text):
+    """Replace one line"""
+    self._check_mutable()
+    lines = list(self._lines)
+    lines[index] = text
+    self._set_lines(lines)
+
+  @staticmethod
+  def _replacement_for(span, mapping):
+    """Cased replacement for a span, or None if the word is not mapped"""
+    new_word = mapping.get(span.key)
+    if new_word is not None:
+      return _match_case(new_word, span.capitalized)
+    if '-' not in span.key:
+      return None
+    # Hyphenated word: replace the parts that are mapped, keep the rest
+    parts = span.word.split('-')
+    replaced = False
+    for i, part in enumerate(parts):
+      new_part = mapping.get(part.lower())
+      if new_part is not None:
+        parts[i] = _match_case(new_part, part[:1].isupper())
+        replaced = True
+    return '-'.join(parts) if replaced else None
+
+  def render_lines(self, mapping):
+    """Return the lines with words replaced, without modifying the haiku
+
+    Every line is rewritten in a single pass over its spans. Keys of
+    mapping must be lowercase words as returned by get_words().
+    """
+    lines = []
+    for line, spans in zip(self._lines, self.line_spans()):
+      pieces = []
+      pos = 0
+      for span in spans:
+        new_word = self._replacement_for(span, mapping)
+        if new_word is not None:
+          pieces.append(line[pos:span.start])
+          pieces.append(new_word)
+          pos = span.end
+      if pieces:
+        pieces.append(line[pos:])
+        line = ''.join(pieces)
+      lines.append(line)
+    return lines
+
+  def replaced(self, mapping):
+    """Return a new haiku with words replaced; unchanged lines stay shared
+
+    Keys of mapping must be lowercase words as returned by get_words().
+    """
+    lines = self.render_lines(mapping)
+    haiku = self.copy()
+    haiku._set_lines(lines)
+    return haiku
+
+  def render(self, mapping):
+    """Return the haiku text with words replaced, without modifying it
+
+    Keys of mapping must be lowercase words as returned by get_words().
+    """
+    return "\n".join(self.render_lines(mapping))
+
+  def apply_replacements(self, mapping):
+    """Replace many words at once while preserving case and punctuation"""
+    self._check_mutable()
+    mapping = {old.lower(): new for old, new in mapping.items()}
+    self._set_lines(self.render_lines(mapping))
+
   def replace_word(self, old_word, new_word):
     """Replace words while preserving original case and punctuation"""
-    for i in range(len(self._lines)):
-      words = self._lines[i].split()
-      for j in range(len(words)):
-        # Compare without punctuation
-        clean_word = words[j].rstrip('.,!?;:').lower()
-        if clean_word == old_word.lower():
-          # Preserve original capitalization and punctuation
-          if words[j][0].isupper():
-            new_word_cased = new_word.capitalize()
-          else:
-            new_word_cased = new_word.lower()
-          
-          # Preserve punctuation
-          punctuation = words[j][len(clean_word):]
-          words[j] = new_word_cased + punctuation
-      self._lines[i] = ' '.join(words)
-    
+    self.apply_replacements({old_word: new_word})
+
+  def capitalize_lines(self):
+    """Capitalize the first letter of each line (and lowercase the rest)"""
+    self._check_mutable()
+    self._set_lines([line.capitalize() for line in self._lines])
+
   def get_words(self):
     """Get all unique words in haiku (lowercase, no punctuation)"""
     words = set()
-    for line in self._lines:
-      words.update(word.rstrip('.,!?;:').lower() for word in line.split())
-    return words
\ No newline at end of file
+    for span in self.spans:
+      words.add(span.key)
+      if '-' in span.key:
+        # Parts of hyphenated words can be replaced on their own
+        words.update(part for part in span.key.split('-') if part)
+    return words
@@ -0,0 +1,135 @@
+# Instrumentation class
+
+# Opt-in per-stage profiling for processors: wall and CPU time, call counts
+# and, optionally, the tracemalloc peak of each stage
+# Processors without instrumentation use a shared no-op stage instead
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Returned by Processor.stage() when instrumentation is off
+NO_STAGE = nullcontext()
+
+
+class StageStats:
+  __slots__ = ('calls', 'wall', 'cpu', 'peak')
+
+  def __init__(self):
+    self.calls = 0
+    self.wall = 0.0
+    self.cpu = 0.0
+    self.peak = None  # bytes above the stage's starting allocation, if tracked
+
+  def as_dict(self):
+    return {'calls': self.calls, 'wall': self.wall, 'cpu': self.cpu,
+            'mean_wall': self.wall / self.calls if self.calls else 0.0,
+            'peak_bytes': self.peak}
+
+
+class Instrumentation:
+  def __init__(self, memory=False, callback=None):
+    # memory: track the tracemalloc peak of every stage (slow, off by default)
+    # callback: called as callback(name, wall, cpu, peak) after every stage
+    self.memory = memory
+    self.callback = callback
+    self.stages = {}
+    self._open = []  # [start_current, peak] of the memory-tracked stages in progress
+    self._started_tracing = False
+    if memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracing = True
+
+  def _stats(self, name):
+    stats = self.stages.get(name)
+    if stats is None:
+      stats = self.stages[name] = StageStats()
+    return stats
+
+  def record(self, name, wall, cpu=0.0, calls=1, peak=None):
+    """Add measurements to a stage"""
+    stats = self._stats(name)
+    stats.calls += calls
+    stats.wall += wall
+    stats.cpu += cpu
+    if peak is not None:
+      stats.peak = peak if stats.peak is None else max(stats.peak, peak)
+    if self.callback is not None:
+      self.callback(name, wall, cpu, peak)
+
+  @contextmanager
+  def stage(self, name):
+    """Time the body of a with-statement as one call of stage `name`"""
+    frame = None
+    if self.memory:
+      current, peak = tracemalloc.get_traced_memory()
+      # The enclosing stages keep the peak reached so far before it is reset
+      for outer in self._open:
+        outer[1] = max(outer[1], peak)
+      tracemalloc.reset_peak()
+      frame = [current, current]
+      self._open.append(frame)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+      yield
+    finally:
+      wall = time.perf_counter() - wall
+      cpu = time.process_time() - cpu
+      peak = None
+      if frame is not None:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        for outer in self._open:
+          outer[1] = max(outer[1], traced_peak)
+        self._open.pop()
+        peak = frame[1] - frame[0]
+      self.record(name, wall, cpu, peak=peak)
+
+  def wrap(self, name, func):
+    """Return func timed as stage `name`, for calls made in a tight loop"""
+    def timed(*args, **kwargs):
+      with self.stage(name):
+        return func(*args, **kwargs)
+    return timed
+
+  def merge(self, report):
+    """Add the stages of another report() (e.g. from a worker process)"""
+    for name, stats in report['stages'].items():
+      target = self._stats(name)
+      target.calls += stats['calls']
+      target.wall += stats['wall']
+      target.cpu += stats['cpu']
+      if stats['peak_bytes'] is not None:
+        target.peak = max(target.peak or 0, stats['peak_bytes'])
+
+  def report(self):
+    """Per-stage totals, slowest stage first"""
+    stages = sorted(self.stages.items(), key=lambda item: item[1].wall, reverse=True)
+    return {
+      'memory': self.memory,
+      'stages': {name: stats.as_dict() for name, stats in stages},
+    }
+
+  def dump(self, path=None):
+    """Write the report as JSON to path; returns the JSON text"""
+    text = json.dumps(self.report(), indent=2)
+    if path is not None:
+      with open(path, 'w') as f:
+        f.write(text + '\n')
+    return text
+
+  def format(self):
+    """The report as a text table"""
+    rows = [f"{'stage':<16} {'calls':>10} {'wall':>10} {'cpu':>10} {'peak':>12}"]
+    for name, stats in self.report()['stages'].items():
+      peak = f"{stats['peak_bytes']:,}" if stats['peak_bytes'] is not None else '-'
+      rows.append(f"{name:<16} {stats['calls']:>10} {stats['wall']:>9.4f}s "
+                  f"{stats['cpu']:>9.4f}s {peak:>12}")
+    return '\n'.join(rows)
+
+  def close(self):
+    """Stop tracemalloc if this instrumentation started it"""
+    if self._started_tracing:
+      tracemalloc.stop()
+      self._started_tracing = False
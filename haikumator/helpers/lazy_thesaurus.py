@@ -0,0 +1,372 @@
+# LazyThesaurus class
+
+# Thesaurus that parses entries from the source file only when they are
+# asked for. A headword -> byte offset index over the file is built once
+# and cached next to it (syn001.txt -> syn001.txt.hki); lookups binary
+# search that index through mmap and keep recently parsed entries in an LRU,
+# so memory and start-up time depend on the words looked up, not on the
+# size of the file. Synonym rankings and antonyms (LazyAntonyms) are also
+# resolved per word; a synonym -> line table in the index finds the
+# headwords that list a word
+#
+# Index file layout (little-endian):
+#   header     magic, version, source size/mtime, number of headwords,
+#              number of synonym listings
+#   offsets    uint64 byte offset of each headword's line, sorted by headword
+#   positions  uint64 byte position of each listed synonym in the file,
+#              sorted by synonym, then by line
+#   lines      uint64 byte offset of the line listing each of those synonyms
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import OrderedDict, deque
+from helpers.sorted_list import SortedList
+from helpers.thesaurus import Thesaurus, _rank_key
+
+MAGIC = b'HKLI'
+VERSION = 2
+INDEX_SUFFIX = '.hki'
+DEFAULT_CACHE_SIZE = 1024
+_HEADER = struct.Struct('<4sIQQQQ')
+
+
+def _headword(line):
+  """Normalized headword of a raw line, as Thesaurus.load_from_file keys it"""
+  return line.split(b':', 1)[0].decode('utf-8').strip().lower().encode('utf-8')
+
+
+# The ASCII characters str.strip() removes
+_ASCII_SPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+def _normalize(text):
+  """A raw synonym or headword as Thesaurus.load_from_file keys it, encoded"""
+  if text.isascii():
+    return text.strip(_ASCII_SPACE).lower()
+  return text.decode('utf-8').strip().lower().encode('utf-8')
+
+
+def _synonyms(line):
+  """Parsed synonyms of a raw line, as Thesaurus.load_from_file lists them"""
+  return [s.strip().lower() for s in line.decode('utf-8').split(':', 1)[1].split(',')]
+
+
+def scan_thesaurus(source):
+  """The arrays of a line index: (offsets, positions, lines), see above
+
+  A headword listed twice keeps its last line, as in Thesaurus, and only
+  that line's synonyms are listed.
+  """
+  heads = {}
+  position = 0
+  with open(source, 'rb') as f:
+    for line in f:
+      if b':' in line:
+        heads[_headword(line)] = position
+      position += len(line)
+  offsets = array('Q', (heads[head] for head in sorted(heads)))
+
+  kept = set(heads.values())
+  listings = {}  # synonym -> [line offset, synonym position, ...] in file order
+  position = 0
+  with open(source, 'rb') as f:
+    for line in f:
+      if position in kept:
+        start = line.index(b':') + 1
+        listed = set()  # a synonym listed twice on a line is one listing
+        for text in line[start:].split(b','):
+          synonym = _normalize(text)
+          if synonym and synonym not in listed:
+            listed.add(synonym)
+            listings.setdefault(synonym, []).extend((position, position + start))
+          start += len(text) + 1
+      position += len(line)
+  pairs = array('Q')
+  for synonym in sorted(listings):
+    pairs.extend(listings[synonym])
+  return offsets, pairs[1::2], pairs[0::2]
+
+
+def build_line_index(source, target=None):
+  """Write the headword index of a text thesaurus; returns the target path"""
+  target = target or source + INDEX_SUFFIX
+  arrays = scan_thesaurus(source)
+  if sys.byteorder == 'big':
+    for values in arrays:
+      values.byteswap()
+  offsets, positions, _ = arrays
+
+  stat = os.stat(source)
+  # A temporary file of its own, so processes indexing at the same time
+  # never replace the target with each other's half-written files
+  fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target) or '.')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      f.write(_HEADER.pack(MAGIC, VERSION, stat.st_size, stat.st_mtime_ns, len(offsets),
+                           len(positions)))
+      for values in arrays:
+        f.write(values.tobytes())
+    # mkstemp() makes the file private; readable like its source instead
+    os.chmod(temp, stat.st_mode & 0o666)
+    os.replace(temp, target)
+  except BaseException:
+    os.remove(temp)
+    raise
+  return target
+
+
+def _index_is_fresh(source, index):
+  """Check a line index against its source by size and mtime
+
+  An index that is not a whole index file (bad magic, cut short) is stale.
+  """
+  try:
+    with open(index, 'rb') as f:
+      magic, version, size, mtime, count, listings = _HEADER.unpack(f.read(_HEADER.size))
+      length = os.fstat(f.fileno()).st_size
+  except (OSError, struct.error):
+    return False
+  stat = os.stat(source)
+  return (magic == MAGIC and version == VERSION and stat.st_size == size
+          and stat.st_mtime_ns == mtime
+          and length == _HEADER.size + 8 * (count + 2 * listings))
+
+
+def ensure_line_index(source, index=None):
+  """Build the line index of a text thesaurus unless it is up to date;
+  returns its path"""
+  index = index or source + INDEX_SUFFIX
+  if not _index_is_fresh(source, index):
+    build_line_index(source, index)
+  return index
+
+
+class LazyThesaurus(Thesaurus):
+  def __init__(self, filename, cache_size=DEFAULT_CACHE_SIZE, index_file=None):
+    super().__init__()
+    self.filename = filename
+    self.cache_size = cache_size
+    self.hits = 0
+    self.misses = 0
+    self._cache = OrderedDict()  # word -> parsed entry, or None if not a headword
+    self._index_mm = None
+
+    index_file = index_file or filename + INDEX_SUFFIX
+    self._mm = b''  # mmap cannot map an empty file
+    if os.path.getsize(filename):
+      with open(filename, 'rb') as f:
+        self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      ensure_line_index(filename, index_file)
+      with open(index_file, 'rb') as f:
+        self._index_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      count, listings = _HEADER.unpack_from(self._index_mm)[4:]
+      self._offsets = self._array(self._index_mm, _HEADER.size, count)
+      self._positions = self._array(self._index_mm, _HEADER.size + 8 * count, listings)
+      self._lines = self._array(self._index_mm, _HEADER.size + 8 * (count + listings),
+                                listings)
+    except OSError:
+      # Index cannot be cached (e.g. read-only folder): keep it in memory
+      self._offsets, self._positions, self._lines = scan_thesaurus(filename)
+
+  @staticmethod
+  def _array(buffer, position, length):
+    end = position + 8 * length
+    if sys.byteorder == 'little':
+      return memoryview(buffer)[position:end].cast('Q')
+    view = array('Q', buffer[position:end])
+    view.byteswap()
+    return view
+
+  def _line(self, offset):
+    end = self._mm.find(b'\n', offset)
+    return self._mm[offset:end if end >= 0 else len(self._mm)]
+
+  def _find(self, key):
+    """Binary search the index for an encoded headword; returns the offset
+    of its line or None"""
+    lo, hi = 0, len(self._offsets)
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if _headword(self._line(self._offsets[mid])) < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    if lo < len(self._offsets):
+      offset = self._offsets[lo]
+      if _headword(self._line(offset)) == key:
+        return offset
+    return None
+
+  def _entry(self, word):
+    """Parsed synonyms of a word, or None; served from the LRU when possible"""
+    word = word.lower()
+    if word in self._cache:
+      self.hits += 1
+      self._cache.move_to_end(word)
+      return self._cache[word]
+
+    self.misses += 1
+    offset = self._find(word.encode('utf-8'))
+    entry = _synonyms(self._line(offset)) if offset is not None else None
+    self._cache[word] = entry
+    if len(self._cache) > self.cache_size:
+      self._cache.popitem(last=False)  # evict least recently used
+    return entry
+
+  def _synonym(self, position):
+    """Normalized synonym listed at a byte position of the file"""
+    end = self._mm.find(b'\n', position)
+    end = len(self._mm) if end < 0 else end
+    comma = self._mm.find(b',', position, end)
+    return _normalize(self._mm[position:comma if comma >= 0 else end])
+
+  def _listing(self, word):
+    """(offset, headword) of every line that lists a word as a synonym, in
+    file order; a binary search of the synonym table"""
+    key = word.lower().encode('utf-8')
+    lo, hi = 0, len(self._positions)
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self._synonym(self._positions[mid]) < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    found = []
+    while lo < len(self._positions) and self._synonym(self._positions[lo]) == key:
+      offset = self._lines[lo]
+      found.append((offset, _headword(self._line(offset)).decode('utf-8')))
+      lo += 1
+    return found
+
+  def load_from_file(self, filename):
+    raise TypeError("LazyThesaurus reads its own file; create a new one instead")
+
+  def get_entries(self, word):
+    """Get entries for a word (case insensitive)"""
+    entry = self._entry(word)
+    return list(entry) if entry is not None else []
+
+  def __contains__(self, word):
+    return self._entry(word) is not None
+
+  def __iter__(self):
+    """Iterate over words in the thesaurus, in sorted order"""
+    return (_headword(self._line(offset)).decode('utf-8') for offset in self._offsets)
+
+  def __len__(self):
+    return len(self._offsets)
+
+  # Rankings and antonyms are worked out per looked-up word; the indexes
+  # Thesaurus builds over every headword would parse the whole file
+
+  def ranked(self, word, measure='length', tie_break='order'):
+    """Synonyms of a word ranked from smallest to largest, or an empty tuple
+
+    Not memoized: the entry comes from the LRU and is short to rank.
+    """
+    return tuple(SortedList(self.get_entries(word), key=_rank_key(measure, tie_break)))
+
+  def shortest(self, word, measure='length', tie_break='order'):
+    """Smallest synonym of a word, or None"""
+    entry = self._entry(word)
+    if not entry:
+      return None
+    return min(entry, key=_rank_key(measure, tie_break))
+
+  def longest(self, word, measure='length', tie_break='order'):
+    """Largest synonym of a word, or None"""
+    entry = self._entry(word)
+    if not entry:
+      return None
+    # The last of the largest, as in the ranked order
+    return max(reversed(entry), key=_rank_key(measure, tie_break))
+
+  def antonym_index(self, antonym_thesaurus, max_depth=1):
+    """Antonym lookup that resolves each word when it is asked for"""
+    key = (antonym_thesaurus, max_depth)
+    index = self._antonym_indexes.get(key)
+    if index is None:
+      index = LazyAntonyms(self, antonym_thesaurus, max_depth)
+      self._antonym_indexes[key] = index
+    return index
+
+  def stats(self):
+    """LRU hit/miss counters and current size"""
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache),
+            'maxsize': self.cache_size}
+
+  def close(self):
+    """Release the memory maps"""
+    for view in (self._offsets, self._positions, self._lines):
+      if isinstance(view, memoryview):
+        view.release()
+    if self._index_mm is not None:
+      self._index_mm.close()
+    if isinstance(self._mm, mmap.mmap):
+      self._mm.close()
+
+
+# Antonyms resolved one word at a time through a LazyThesaurus
+class LazyAntonyms:
+  """Same answers as AntonymIndex, found per word: the headword of a word and
+  the headwords listing a word come from the synonym table of the line
+  index (LazyThesaurus._listing()) instead of reverse_index() and graph()
+  over every entry. Resolved words are kept.
+  """
+
+  def __init__(self, synonym_thesaurus, antonym_thesaurus, max_depth=1):
+    self.synonym_thesaurus = synonym_thesaurus
+    self.antonym_thesaurus = antonym_thesaurus
+    self.max_depth = max_depth
+    self._antonyms = {}
+
+  def _canonical(self, word):
+    """The headword reverse_index() maps a word to: the last line that is
+    its own or lists it"""
+    lines = self.synonym_thesaurus._listing(word)
+    own = self.synonym_thesaurus._find(word.encode('utf-8'))
+    if own is not None:
+      lines.append((own, word))
+    return max(lines)[1] if lines else word
+
+  def _steps(self, word, depth):
+    """(neighbour, hops) that AntonymIndex follows from a word: its own
+    synonyms, last listed first, then the headwords that list it, which
+    are a hop further from the start"""
+    own = [(neighbour, depth + 1)
+           for neighbour in reversed(self.synonym_thesaurus._entry(word) or ())]
+    hops = depth + 1 if depth else 2
+    if hops > self.max_depth:
+      return own
+    return own + [(head, hops) for _, head in self.synonym_thesaurus._listing(word)
+                  if head != word]
+
+  def _resolve(self, start):
+    """Breadth-first search for the nearest word with antonyms"""
+    seen = {start}
+    queue = deque([(start, 0)])
+    while queue:
+      word, depth = queue.popleft()
+      antonyms = self.antonym_thesaurus.get_entries(word)
+      if antonyms:
+        return antonyms
+      for neighbour, hops in self._steps(word, depth):
+        if hops <= self.max_depth and neighbour not in seen:
+          seen.add(neighbour)
+          queue.append((neighbour, hops))
+    return []
+
+  def get(self, word):
+    """Antonyms of a word (case insensitive), or an empty list"""
+    word = word.lower()
+    if word not in self._antonyms:
+      self._antonyms[word] = self._resolve(self._canonical(word))
+    return self._antonyms[word]
+
+  def __contains__(self, word):
+    return bool(self.get(word))
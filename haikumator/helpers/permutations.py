@@ -0,0 +1,296 @@
+# Permutation index helpers
+
+# A combination of synonym choices is a mixed-radix number: digit i picks
+# one of radices[i] synonyms for word i, with the last word varying fastest.
+# This is the same order itertools.product uses, so permutation k here is
+# the (k+1)-th combination product() yields.
+
+import heapq
+import random
+import sys
+from itertools import islice
+from math import prod
+
+try:
+  import numpy as np
+except ImportError:  # sample_choices falls back to the random module
+  np = None
+
+
+def count_permutations(radices):
+  """Number of combinations for the given synonym list lengths"""
+  return prod(radices)
+
+
+def unrank(index, radices):
+  """Turn a permutation index into its choice vector"""
+  digits = [0] * len(radices)
+  for i in range(len(radices) - 1, -1, -1):
+    index, digits[i] = divmod(index, radices[i])
+  if index:
+    raise IndexError("permutation index out of range")
+  return digits
+
+
+def rank(choice, radices):
+  """Turn a choice vector back into its permutation index"""
+  index = 0
+  for digit, radix in zip(choice, radices):
+    if not 0 <= digit < radix:
+      raise IndexError("choice out of range")
+    index = index * radix + digit
+  return index
+
+
+def iter_choices(radices, start=0, stop=None):
+  """Yield choice vectors for indexes start..stop-1, in product() order"""
+  total = count_permutations(radices)
+  stop = total if stop is None else min(stop, total)
+  if start >= stop:
+    return
+  digits = unrank(start, radices)
+  for _ in range(stop - start):
+    yield tuple(digits)
+    # Increment the mixed-radix counter like an odometer
+    i = len(digits) - 1
+    while i >= 0:
+      digits[i] += 1
+      if digits[i] < radices[i]:
+        break
+      digits[i] = 0
+      i -= 1
+
+
+def split_ranges(total, parts):
+  """Split 0..total-1 into at most `parts` contiguous (start, stop) ranges"""
+  parts = max(1, min(parts, total))
+  size, extra = divmod(total, parts)
+  ranges = []
+  start = 0
+  for i in range(parts):
+    stop = start + size + (1 if i < extra else 0)
+    ranges.append((start, stop))
+    start = stop
+  return ranges
+
+
+def shard_range(total, shard, shards):
+  """(start, stop) of shard `shard` (0-based) out of `shards` equal shards"""
+  if not 0 <= shard < shards:
+    raise ValueError(f"shard must be between 0 and {shards - 1}")
+  return total * shard // shards, total * (shard + 1) // shards
+
+
+def _unrank_array(indexes, radices):
+  """unrank() for a numpy array of indexes; returns one row per index"""
+  digits = np.empty((len(indexes), len(radices)), dtype=np.int64)
+  for i in range(len(radices) - 1, -1, -1):
+    indexes, digits[:, i] = np.divmod(indexes, radices[i])
+  return digits
+
+
+def sample_choices(radices, n, seed=None, unique=True):
+  """Draw n random choice vectors at once
+
+  With unique=True the vectors are distinct permutations, drawn without
+  replacement, and at most count_permutations(radices) are returned. A
+  seed gives the same draws every time (numpy and the random module draw
+  different ones, so the same seed differs between the two).
+  """
+  total = count_permutations(radices)
+  if unique:
+    n = min(n, total)
+  if n <= 0 or total == 0:
+    return []
+
+  if not radices:
+    return [[] for _ in range(n)]  # nothing to choose: n copies of the one choice
+
+  if np is not None and total < 2 ** 63:
+    rng = np.random.default_rng(seed)
+    if unique:
+      return _unrank_array(rng.choice(total, size=n, replace=False), radices).tolist()
+    # One column of digits per word, all drawn in a single call
+    return rng.integers(0, radices, size=(n, len(radices))).tolist()
+
+  rng = random.Random(seed)
+  if not unique:
+    columns = [rng.choices(range(radix), k=n) for radix in radices]
+    return [list(row) for row in zip(*columns)]
+  if total <= sys.maxsize:
+    indexes = rng.sample(range(total), n)
+  else:
+    # Too large for sample(); collisions are rare, so redraw them
+    seen = set()
+    indexes = []
+    while len(indexes) < n:
+      index = rng.randrange(total)
+      if index not in seen:
+        seen.add(index)
+        indexes.append(index)
+  return [unrank(index, radices) for index in indexes]
+
+
+def remaining_bounds(costs, dimensions):
+  """Least and most each total can still grow by after digit i, for every i
+
+  costs[i][c] is the tuple choice c of digit i adds to the totals; entry i
+  of each returned list covers digits i.. to the end.
+  """
+  size = len(costs)
+  zero = tuple(0 for _ in range(dimensions))
+  least = [zero] * (size + 1)
+  most = [zero] * (size + 1)
+  for i in range(size - 1, -1, -1):
+    columns = list(zip(*costs[i])) if costs[i] else [(0,)] * dimensions
+    least[i] = tuple(a + min(column) for a, column in zip(least[i + 1], columns))
+    most[i] = tuple(a + max(column) for a, column in zip(most[i + 1], columns))
+  return least, most
+
+
+class PrunedSearch:
+  """Depth-first walk over the choice vectors whose totals hit exact budgets
+
+  Every choice adds a fixed amount to each budgeted total (e.g. syllables
+  to each line of a haiku). A branch is skipped as soon as its totals can
+  no longer end up equal to the budgets: a total already over budget, or
+  too low even if every remaining digit picked its largest choice.
+  Matching vectors are yielded as (index, choice) in product() order.
+  """
+
+  def __init__(self, radices, costs, base, budgets):
+    # costs[i][c]: tuple with what choice c of digit i adds to each total
+    # base: tuple of fixed amounts already in each total
+    self.radices = list(radices)
+    self.costs = costs
+    self.base = tuple(base)
+    self.budgets = tuple(budgets)
+    self.total = count_permutations(self.radices)
+    self.visited = 0   # partial choice vectors tried
+    self.pruned = 0    # complete vectors skipped without being built
+    self.found = 0
+
+  def __iter__(self):
+    radices = self.radices
+    size = len(radices)
+    budgets = self.budgets
+    least, most = remaining_bounds(self.costs, len(budgets))
+    if any(total + low > budget or total + high < budget
+           for total, low, high, budget in zip(self.base, least[0], most[0], budgets)):
+      self.pruned += self.total
+      return
+    if size == 0:
+      self.found += 1
+      yield 0, ()
+      return
+
+    # Complete vectors below each depth, to count what a skipped branch held
+    below = [1] * (size + 1)
+    for i in range(size - 1, -1, -1):
+      below[i] = below[i + 1] * radices[i]
+
+    digits = [-1] * size
+    totals = [self.base] + [None] * size
+    indexes = [0] * (size + 1)
+    i = 0
+    while i >= 0:
+      digits[i] += 1
+      if digits[i] == radices[i]:
+        digits[i] = -1
+        i -= 1
+        continue
+      self.visited += 1
+      new = tuple(a + b for a, b in zip(totals[i], self.costs[i][digits[i]]))
+      low = least[i + 1]
+      high = most[i + 1]
+      if any(total + l > budget or total + h < budget
+             for total, l, h, budget in zip(new, low, high, budgets)):
+        self.pruned += below[i + 1]
+        continue
+      index = indexes[i] * radices[i] + digits[i]
+      if i == size - 1:
+        self.found += 1
+        yield index, tuple(digits)
+      else:
+        totals[i + 1] = new
+        indexes[i + 1] = index
+        i += 1
+
+  def stats(self):
+    """Search counters, with the share of the product that was skipped"""
+    return {'total': self.total, 'found': self.found, 'visited': self.visited,
+            'pruned': self.pruned,
+            'skipped_fraction': self.pruned / self.total if self.total else 0.0}
+
+
+class BestFirstSearch:
+  """Choice vectors in order of decreasing score, best first
+
+  Like PrunedSearch, every choice adds a fixed tuple to some totals, and a
+  complete vector scores value(totals). bound(totals, least, most) must
+  return at least the best score of any completion of a partial vector
+  whose totals can still grow by least..most. Partial vectors wait in a
+  heap ordered by their bound, so the search only expands branches that
+  can still beat the results already found, and taking the first k
+  results never enumerates the whole product. The tighter the bound, the
+  fewer branches are expanded; an exact bound (e.g. for scores that are a
+  sum over the choices) walks straight to each next result.
+
+  Yields (score, index, choice); ties come out in product() order.
+  """
+
+  def __init__(self, radices, costs, base, value, bound):
+    self.radices = list(radices)
+    self.costs = costs
+    self.base = tuple(base)
+    self.value = value
+    self.bound = bound
+    self.total = count_permutations(self.radices)
+    self.expanded = 0  # partial choice vectors whose children were scored
+    self.found = 0
+
+  def __iter__(self):
+    radices = self.radices
+    size = len(radices)
+    costs = self.costs
+    value = self.value
+    bound = self.bound
+    if self.total == 0:
+      return
+    least, most = remaining_bounds(costs, len(self.base))
+
+    # Entries: (-score bound, index, depth, totals, choice). Complete vectors
+    # carry their exact score. Indexes are scaled to the full product
+    # (index * below[depth]), so among equal bounds the heap pops the
+    # product's earliest branch, and a complete vector before the partial
+    # vectors that would follow it
+    below = [1] * (size + 1)
+    for i in range(size - 1, -1, -1):
+      below[i] = below[i + 1] * radices[i]
+    first = value(self.base) if size == 0 else bound(self.base, least[0], most[0])
+    heap = [(-first, 0, 0, self.base, ())]
+    while heap:
+      negative, index, depth, totals, choice = heapq.heappop(heap)
+      if depth == size:
+        self.found += 1
+        yield -negative, index, choice
+        continue
+      self.expanded += 1
+      low = least[depth + 1]
+      high = most[depth + 1]
+      step = below[depth + 1]
+      last = depth + 1 == size
+      for digit, cost in enumerate(costs[depth]):
+        new = tuple(a + b for a, b in zip(totals, cost))
+        score = value(new) if last else bound(new, low, high)
+        heapq.heappush(heap, (-score, index + digit * step, depth + 1, new,
+                              choice + (digit,)))
+
+  def top(self, k):
+    """The k best as a list of (score, index, choice)"""
+    return list(islice(self, k))
+
+  def stats(self):
+    """Search counters, with the share of the product that was never built"""
+    return {'total': self.total, 'found': self.found, 'expanded': self.expanded,
+            'skipped_fraction': 1 - self.found / self.total if self.total else 0.0}
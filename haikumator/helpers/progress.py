@@ -0,0 +1,55 @@
+# Progress class
+
+# Reports throughput and ETA of a long run at a fixed interval, on one
+# console line, instead of printing something per item
+
+import sys
+import time
+
+DEFAULT_INTERVAL = 1.0
+
+
+def format_duration(seconds):
+  """Seconds as h:mm:ss"""
+  minutes, seconds = divmod(int(seconds), 60)
+  hours, minutes = divmod(minutes, 60)
+  return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class Progress:
+  def __init__(self, total, interval=DEFAULT_INTERVAL, stream=None, label='haikus'):
+    self.total = total
+    self.interval = interval
+    self.stream = stream or sys.stdout
+    self.label = label
+    self.done = 0
+    self._width = 0  # longest line written, to blank out what a shorter one leaves
+    self._start = time.monotonic()
+    self._next = self._start + interval
+
+  def update(self, done):
+    """Record that `done` items are finished; reports once per interval"""
+    self.done = done
+    now = time.monotonic()
+    if now >= self._next:
+      self._next = now + self.interval
+      self._report(now, '\r')
+
+  def _report(self, now, start='\r', end=''):
+    elapsed = now - self._start
+    rate = self.done / elapsed if elapsed > 0 else 0.0
+    text = f"{self.done:,}/{self.total:,} {self.label}"
+    if self.total:
+      text += f" ({self.done / self.total:.1%})"
+    text += f", {rate:,.0f}/s"
+    if rate > 0 and self.done < self.total:
+      text += f", ETA {format_duration((self.total - self.done) / rate)}"
+    else:
+      text += f", {format_duration(elapsed)} elapsed"
+    self._width = max(self._width, len(text))
+    self.stream.write(f"{start}{text.ljust(self._width)}{end}")
+    self.stream.flush()
+
+  def finish(self):
+    """Print the final line"""
+    self._report(time.monotonic(), '\r', '\n')
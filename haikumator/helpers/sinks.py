@@ -0,0 +1,586 @@
+# Output sinks for batch processing
+
+# Sink (base class); mark() and rewind() let a resumed job drop whatever
+#   reached the target after its last checkpoint
+# DirectorySink: one v{n}.txt file per haiku (original behaviour)
+# JsonlSink: append-only JSON lines, gzip-compressed if the name ends in .gz
+# ZipSink / TarSink: all haikus as members of a single archive
+# SQLiteSink: one row per haiku in a SQLite database
+# BackgroundSink: hands batches of another sink to writer threads
+# open_sink(): pick a sink from the target path, applying the policy for
+#              targets that already hold haikus
+# part_target(): per-worker/per-shard target for parallel and sharded jobs
+
+import gzip
+import io
+import json
+import os
+import queue
+import re
+import sqlite3
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from abc import ABC, abstractmethod
+
+DEFAULT_BATCH_SIZE = 1000
+# Batches that may wait for a BackgroundSink's writers before write() blocks
+DEFAULT_QUEUE_BATCHES = 8
+
+# How hard sinks try to get haikus onto the disk:
+#   none    leave it to the OS
+#   fsync   fsync files when they are flushed (folders: every file)
+#   atomic  like fsync, and folder sinks write each file to a temporary name
+#           first and rename it, so a crash never leaves a partial v{n}.txt
+SYNC_POLICIES = ('none', 'fsync', 'atomic')
+
+# Target suffixes handled by open_sink, longest first
+SINK_SUFFIXES = ('.jsonl.gz', '.tar.gz', '.jsonl', '.zip', '.tar', '.tgz',
+                 '.sqlite', '.db')
+
+# What open_sink does with a target that already holds haikus:
+#   refuse     raise FileExistsError (the default)
+#   overwrite  start over: files are replaced, folders lose their v{n}.txt files
+#   append     keep them and add the new haikus; where a number is written
+#              twice, the later copy wins (replaced file or database row, last
+#              JSONL record or archive member)
+EXISTING_POLICIES = ('refuse', 'overwrite', 'append')
+
+_HAIKU_FILE_RE = re.compile(r'v\d+\.txt(\.tmp)?$')
+
+# Local header of a zip member (zipfile.structFileHeader): magic, versions,
+# flags, method, time, date, crc, compressed and uncompressed size, name and
+# extra field lengths
+_ZIP_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+_ZIP_LOCAL_MAGIC = b'PK\x03\x04'
+
+
+def haiku_name(number):
+  """File/member name of the haiku with the given 1-based number"""
+  return f"v{number}.txt"
+
+
+def _fsync_path(path):
+  """fsync a file or folder by path"""
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    os.fsync(fd)
+  finally:
+    os.close(fd)
+
+
+# Base sink class: collects haikus and writes them out in batches
+class Sink(ABC):
+  def __init__(self, target, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    if sync not in SYNC_POLICIES:
+      raise ValueError(f"Unknown sync policy: {sync}")
+    self.target = target
+    self.batch_size = batch_size
+    self.sync = sync
+    self.count = 0
+    self._buffer = []
+
+  def write(self, number, text):
+    """Queue one haiku, flushing once a full batch is buffered"""
+    self._buffer.append((number, text))
+    self.count += 1
+    if len(self._buffer) >= self.batch_size:
+      self._write_buffer()
+
+  def _write_buffer(self):
+    """Hand the buffered haikus to _write_batch"""
+    if self._buffer:
+      self._write_batch(self._buffer)
+      self._buffer = []
+
+  def flush(self):
+    """Write out all buffered haikus"""
+    self._write_buffer()
+
+  @abstractmethod
+  def _write_batch(self, records):
+    """Write a list of (number, text) records"""
+    pass
+
+  def mark(self):
+    """Flush, and return a JSON value that rewind() can cut the target back to
+
+    Checkpoints save it. None means nothing needs cutting: a haiku written
+    again replaces its earlier copy (folders, databases).
+    """
+    self.flush()
+    return None
+
+  def rewind(self, mark):
+    """Drop whatever reached the target after mark() returned `mark`
+
+    Called on a freshly opened sink, before anything is written.
+    """
+    pass
+
+  def close(self):
+    """Flush remaining haikus and release the target"""
+    self.flush()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+
+class DirectorySink(Sink):
+  def __init__(self, folder, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    super().__init__(folder, batch_size, sync)
+    if not os.path.isdir(folder):
+      raise FileNotFoundError(f"Folder not found: {folder}")
+
+  def _write_batch(self, records):
+    # Files are independent, so several writer threads may call this at once
+    for number, text in records:
+      path = os.path.join(self.target, haiku_name(number))
+      temp = path + '.tmp' if self.sync == 'atomic' else path
+      with open(temp, 'w') as f:
+        f.write(text)
+        if self.sync != 'none':
+          f.flush()
+          os.fsync(f.fileno())
+      if temp != path:
+        os.replace(temp, path)
+
+  def flush(self):
+    super().flush()
+    if self.sync != 'none':
+      _fsync_path(self.target)  # makes the new directory entries durable
+
+
+class JsonlSink(Sink):
+  def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    super().__init__(filename, batch_size, sync)
+    self._file = self._open()
+
+  def _open(self):
+    if self.target.lower().endswith('.gz'):
+      return gzip.open(self.target, 'at', encoding='utf-8')
+    return open(self.target, 'a', encoding='utf-8', buffering=1 << 20)
+
+  def _write_batch(self, records):
+    self._file.write(''.join(
+      json.dumps({"name": haiku_name(number), "text": text}) + "\n"
+      for number, text in records
+    ))
+
+  def flush(self):
+    super().flush()
+    self._file.flush()
+    if self.sync != 'none':
+      os.fsync(self._file.fileno())
+
+  def mark(self):
+    """Byte size of the file; a gzip member is finished first, so the
+    compressed file can be cut at this point"""
+    self.flush()
+    if self.target.lower().endswith('.gz'):
+      self._file.close()
+      if self.sync != 'none':
+        _fsync_path(self.target)
+      size = os.path.getsize(self.target)
+      self._file = self._open()
+      return size
+    return os.fstat(self._file.fileno()).st_size
+
+  def rewind(self, mark):
+    self._file.close()
+    os.truncate(self.target, mark)
+    self._file = self._open()
+
+  def close(self):
+    super().close()
+    self._file.close()
+
+
+def _zip_members(path, end):
+  """Yield (ZipInfo, data) for the members stored before byte `end` of a zip
+
+  Members are read from their local headers, so this also works on a file
+  whose central directory was never written (a killed run).
+  """
+  with open(path, 'rb') as f:
+    position = 0
+    while position < end:
+      f.seek(position)
+      header = f.read(_ZIP_LOCAL_HEADER.size)
+      if len(header) < _ZIP_LOCAL_HEADER.size:
+        raise ValueError(f"{path}: truncated zip member at byte {position}")
+      (magic, _, _, flags, method, mtime, mdate, _, compressed, _, name_length,
+       extra_length) = _ZIP_LOCAL_HEADER.unpack(header)
+      # Sizes must be in the header: no data descriptors, no ZIP64
+      if magic != _ZIP_LOCAL_MAGIC or flags & 0x08 or compressed == 0xFFFFFFFF:
+        raise ValueError(f"{path}: cannot read the zip member at byte {position}")
+      name = f.read(name_length).decode('utf-8' if flags & 0x800 else 'cp437')
+      f.seek(extra_length, os.SEEK_CUR)
+      data = f.read(compressed)
+      if len(data) < compressed:
+        raise ValueError(f"{path}: truncated zip member at byte {position}")
+      if method == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(data, -zlib.MAX_WBITS)
+      info = zipfile.ZipInfo(name, ((mdate >> 9) + 1980, (mdate >> 5) & 0xF, mdate & 0x1F,
+                                    mtime >> 11, (mtime >> 5) & 0x3F, (mtime & 0x1F) * 2))
+      info.compress_type = method
+      yield info, data
+      position = f.tell()
+
+
+def _temp_beside(path):
+  """New empty temporary file in the folder of path, with its permissions,
+  for an atomic replace"""
+  fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path) or '.')
+  os.close(fd)
+  os.chmod(temp, os.stat(path).st_mode & 0o7777)
+  return temp
+
+
+class ZipSink(Sink):
+  def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    super().__init__(filename, batch_size, sync)
+    self._zip = None  # opened on first use, so rewind() can repair the file first
+
+  def _archive(self):
+    if self._zip is None:
+      self._zip = zipfile.ZipFile(self.target, 'a', compression=zipfile.ZIP_DEFLATED)
+    return self._zip
+
+  def _write_batch(self, records):
+    archive = self._archive()
+    for number, text in records:
+      archive.writestr(haiku_name(number), text)
+
+  def mark(self):
+    """Byte offset where the members end (and the central directory will go)"""
+    self.flush()
+    archive = self._archive()
+    archive.fp.flush()
+    if self.sync != 'none':
+      os.fsync(archive.fp.fileno())
+    return archive.start_dir
+
+  def rewind(self, mark):
+    """Rebuild the archive from the members before the mark, unless it was
+    closed right there"""
+    if self._zip is not None:
+      self._zip.close()
+      self._zip = None
+    if not os.path.isfile(self.target):
+      return
+    try:
+      with zipfile.ZipFile(self.target) as archive:
+        if archive.start_dir == mark:
+          return
+    except zipfile.BadZipFile:
+      pass  # killed before close: no central directory
+    temp = _temp_beside(self.target)
+    with zipfile.ZipFile(temp, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+      for info, data in _zip_members(self.target, mark):
+        archive.writestr(info, data)
+    os.replace(temp, self.target)
+
+  def close(self):
+    super().close()
+    self._archive().close()
+    if self.sync != 'none':
+      _fsync_path(self.target)  # the archive is only complete once closed
+
+
+def _copy_members(source, tar, limit=None):
+  """Add the first `limit` members (all by default) of a compressed tar
+  archive to another tar archive; returns how many were copied
+
+  The source is read as a stream and never past the last member copied,
+  so it may be a killed run's archive that was never closed.
+  """
+  copied = 0
+  if limit == 0:
+    return copied
+  with tarfile.open(source, 'r|gz') as old:
+    for member in old:
+      tar.addfile(member, old.extractfile(member))
+      copied += 1
+      if copied == limit:
+        break
+  return copied
+
+
+class TarSink(Sink):
+  def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    super().__init__(filename, batch_size, sync)
+    self.compressed = filename.lower().endswith(('.gz', '.tgz'))
+    self._tar = None  # opened on first use, so rewind() can repair the file first
+    self._members = 0
+
+  def _open(self, keep=None):
+    """Open the archive for writing
+
+    Compressed tar files cannot be appended to: a non-empty one is
+    rewritten into a new archive with its first `keep` members (all by
+    default), which replaces it.
+    """
+    if not self.compressed:
+      self._tar = tarfile.open(self.target, 'a')
+    elif os.path.isfile(self.target) and os.path.getsize(self.target):
+      temp = _temp_beside(self.target)
+      self._tar = tarfile.open(temp, 'w:gz')
+      self._members = _copy_members(self.target, self._tar, keep)
+      os.replace(temp, self.target)
+    else:
+      self._tar = tarfile.open(self.target, 'w:gz')
+    return self._tar
+
+  def _archive(self):
+    return self._tar if self._tar is not None else self._open()
+
+  def _write_batch(self, records):
+    archive = self._archive()
+    now = time.time()
+    for number, text in records:
+      data = text.encode('utf-8')
+      info = tarfile.TarInfo(haiku_name(number))
+      info.size = len(data)
+      info.mtime = now
+      archive.addfile(info, io.BytesIO(data))
+    self._members += len(records)
+
+  def mark(self):
+    """Byte offset of the end of the last member, or for a compressed
+    archive the number of members"""
+    self.flush()
+    archive = self._archive()
+    archive.fileobj.flush()  # gzip: a sync flush, the members so far can be decompressed
+    if self.sync != 'none':
+      os.fsync(archive.fileobj.fileno())
+    return self._members if self.compressed else archive.offset
+
+  def rewind(self, mark):
+    if self._tar is not None:
+      self._tar.close()
+      self._tar = None
+    if self.compressed:
+      self._open(keep=mark)
+      return
+    if os.path.isfile(self.target):
+      with open(self.target, 'r+b') as f:
+        f.truncate(mark)
+        # End-of-archive blocks, which appending looks for
+        f.seek(mark)
+        f.write(bytes(2 * tarfile.BLOCKSIZE))
+    self._open()
+
+  def close(self):
+    super().close()
+    self._archive().close()
+    if self.sync != 'none':
+      _fsync_path(self.target)
+
+
+class SQLiteSink(Sink):
+  def __init__(self, filename, batch_size=DEFAULT_BATCH_SIZE, sync='none'):
+    super().__init__(filename, batch_size, sync)
+    # Used by one thread at a time, but possibly not the one that opened it
+    self._conn = sqlite3.connect(filename, check_same_thread=False)
+    if sync != 'none':
+      # Every batch is a transaction; make sure each one is fsynced
+      self._conn.execute("PRAGMA synchronous=FULL")
+    self._conn.execute(
+      "CREATE TABLE IF NOT EXISTS haikus (number INTEGER PRIMARY KEY, name TEXT, text TEXT)"
+    )
+
+  def _write_batch(self, records):
+    # One transaction per batch
+    with self._conn:
+      self._conn.executemany(
+        "INSERT OR REPLACE INTO haikus (number, name, text) VALUES (?, ?, ?)",
+        ((number, haiku_name(number), text) for number, text in records)
+      )
+
+  def close(self):
+    super().close()
+    self._conn.close()
+
+
+class BackgroundSink(Sink):
+  """Writes another sink's batches from writer threads
+
+  write() only buffers; full batches go through a bounded queue to the
+  writer threads, so generating and writing overlap, and a slow disk makes
+  write() wait instead of letting batches pile up in memory. flush() waits
+  until everything queued is written. Only a DirectorySink is written by
+  several threads at once; other sinks get one writer. An error in a
+  writer is raised by the next write(), flush() or close().
+  """
+
+  def __init__(self, sink, writers=1, max_batches=DEFAULT_QUEUE_BATCHES):
+    super().__init__(sink.target, sink.batch_size, sink.sync)
+    self.sink = sink
+    if not isinstance(sink, DirectorySink):
+      writers = 1
+    self._queue = queue.Queue(max_batches)
+    self._error = None
+    self._threads = [threading.Thread(target=self._run, daemon=True)
+                     for _ in range(max(1, writers))]
+    for thread in self._threads:
+      thread.start()
+
+  def _run(self):
+    while True:
+      records = self._queue.get()
+      try:
+        if records is None:
+          return
+        if self._error is None:  # after an error, drain without writing
+          self.sink._write_batch(records)
+      except Exception as e:
+        self._error = e
+      finally:
+        self._queue.task_done()
+
+  def _raise_error(self):
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise error
+
+  def _write_batch(self, records):
+    self._raise_error()
+    self._queue.put(records)  # blocks while the writers are behind
+
+  def flush(self):
+    self._write_buffer()
+    self._queue.join()
+    self._raise_error()
+    self.sink.flush()
+
+  def mark(self):
+    self.flush()
+    return self.sink.mark()
+
+  def rewind(self, mark):
+    self.sink.rewind(mark)
+
+  def close(self):
+    try:
+      self.flush()
+    finally:
+      for _ in self._threads:
+        self._queue.put(None)
+      for thread in self._threads:
+        thread.join()
+      self.sink.close()
+
+
+def target_problem(target):
+  """Why open_sink cannot write to a path, or None if it can"""
+  if os.path.isdir(target):
+    return None
+  if target.lower().endswith(SINK_SUFFIXES):
+    parent = os.path.dirname(target) or '.'
+    return None if os.path.isdir(parent) else f"Folder {parent} for {target} not found."
+  if os.path.splitext(target)[1] or os.path.isfile(target):
+    return (f"Cannot write to {target}: output files must end in "
+            f"{', '.join(SINK_SUFFIXES)}.")
+  return f"Folder {target} not found."
+
+
+def is_sink_target(target):
+  """Check whether open_sink can write to the given path"""
+  return target_problem(target) is None
+
+
+def has_output(target):
+  """Check whether a target already holds haikus
+
+  Folders count when they contain v{n}.txt files, other targets when they
+  are non-empty files.
+  """
+  if os.path.isdir(target):
+    with os.scandir(target) as entries:
+      return any(_HAIKU_FILE_RE.match(entry.name) for entry in entries)
+  return os.path.isfile(target) and os.path.getsize(target) > 0
+
+
+def prepare_target(target, existing='refuse'):
+  """Apply an EXISTING_POLICIES policy to a target before writing to it"""
+  if existing not in EXISTING_POLICIES:
+    raise ValueError(f"Unknown policy for existing output: {existing}")
+  if existing == 'append' or not has_output(target):
+    return
+  if existing == 'refuse':
+    raise FileExistsError(f"{target} already holds haikus; overwrite or append to it")
+  if os.path.isdir(target):
+    with os.scandir(target) as entries:
+      for entry in entries:
+        if _HAIKU_FILE_RE.match(entry.name):
+          os.remove(entry.path)
+  else:
+    os.remove(target)
+
+
+def part_target(target, label):
+  """Target for one worker or shard: folders are shared, files get a .{label} infix"""
+  if os.path.isdir(target):
+    return target
+  for suffix in SINK_SUFFIXES:
+    if target.lower().endswith(suffix):
+      base = target[:len(target) - len(suffix)]
+      return f"{base}.{label}{target[len(base):]}"
+  raise ValueError(f"Unsupported output target: {target}")
+
+
+def probe_target(folder, target=None):
+  """A target of the same kind as `target` inside folder, for trial writes
+
+  Folders (and None) get a new empty sub-folder.
+  """
+  if target is not None and not os.path.isdir(target):
+    for suffix in SINK_SUFFIXES:
+      if target.lower().endswith(suffix):
+        return os.path.join(folder, 'probe' + suffix)
+    raise ValueError(f"Unsupported output target: {target}")
+  probe = os.path.join(folder, 'probe')
+  os.mkdir(probe)
+  return probe
+
+
+def target_size(target):
+  """Bytes written to a target: the file's size, or the total of a folder's files"""
+  if os.path.isdir(target):
+    return sum(entry.stat().st_size for entry in os.scandir(target) if entry.is_file())
+  return os.path.getsize(target)
+
+
+def open_sink(target, batch_size=DEFAULT_BATCH_SIZE, sync='none', writers=0,
+              max_batches=DEFAULT_QUEUE_BATCHES, existing='refuse'):
+  """Create the sink matching the target: a folder or an archive/database file
+
+  A target that already holds haikus is handled by the `existing` policy
+  (see EXISTING_POLICIES). With writers > 0 the sink is wrapped in a
+  BackgroundSink.
+  """
+  prepare_target(target, existing)
+  name = target.lower()
+  if os.path.isdir(target):
+    sink = DirectorySink(target, batch_size, sync)
+  elif name.endswith(('.jsonl', '.jsonl.gz')):
+    sink = JsonlSink(target, batch_size, sync)
+  elif name.endswith('.zip'):
+    sink = ZipSink(target, batch_size, sync)
+  elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+    sink = TarSink(target, batch_size, sync)
+  elif name.endswith(('.sqlite', '.db')):
+    sink = SQLiteSink(target, batch_size, sync)
+  else:
+    raise ValueError(f"Unsupported output target: {target}")
+  if writers > 0:
+    return BackgroundSink(sink, writers, max_batches)
+  return sink
@@ -1,44 +1,120 @@
 # SortedList class for maintaining a sorted list of items
+# Keys are computed once per item and kept in a parallel list, so inserts
+# and lookups are binary searches (bisect) over the cached keys. Items with
+# equal keys keep their insertion order.
+
+from bisect import bisect_left, bisect_right
+from heapq import merge as heap_merge
+
+
+def _identity(x):
+  return x
+
+
 class SortedList:
   def __init__(self, iterable=None, key=None):
     # Initialize the sorted list and optional key function
     self._items = []
-    self._key = key or (lambda x: x)  # Default key is identity
+    self._keys = []
+    self._key = key or _identity  # Default key is identity
     if iterable:
-      # Add each item from the iterable, maintaining sort order
-      for item in iterable:
-        self.add(item)
-    
+      # Sort everything at once instead of adding items one by one
+      self.update(iterable)
+
   def add(self, item):
     """Add item while maintaining sort order"""
     # Compute the key value for the new item
     value = self._key(item)
-    # Find the correct position to insert the item
-    for i, existing in enumerate(self._items):
-      if value < self._key(existing):
-        self._items.insert(i, item)
+    # Insert after any items with an equal key
+    index = bisect_right(self._keys, value)
+    self._keys.insert(index, value)
+    self._items.insert(index, item)
+
+  def update(self, iterable):
+    """Add many items with one O(N log N) sort"""
+    items = self._items + list(iterable)
+    keys = self._keys + [self._key(item) for item in items[len(self._items):]]
+    # Stable sort of positions, so equal keys keep insertion order
+    order = sorted(range(len(items)), key=keys.__getitem__)
+    self._items = [items[i] for i in order]
+    self._keys = [keys[i] for i in order]
+
+  def merge(self, other):
+    """Add all items of another SortedList (linear merge) or iterable"""
+    if not isinstance(other, SortedList) or other._key is not self._key:
+      self.update(other)
+      return
+    # Both sides are sorted by the same key: merge the (key, position) pairs
+    merged = list(heap_merge(
+      ((k, 0, i) for i, k in enumerate(self._keys)),
+      ((k, 1, i) for i, k in enumerate(other._keys)),
+    ))
+    sources = (self._items, other._items)
+    self._items = [sources[side][i] for _, side, i in merged]
+    self._keys = [k for k, _, _ in merged]
+
+  def remove(self, item):
+    """Remove the first occurrence of item; raises ValueError if missing"""
+    value = self._key(item)
+    start = bisect_left(self._keys, value)
+    end = bisect_right(self._keys, value, start)
+    for i in range(start, end):
+      if self._items[i] == item:
+        del self._items[i]
+        del self._keys[i]
         return
-    # If not inserted, append to the end
-    self._items.append(item)
-  
+    raise ValueError(f"{item!r} not in SortedList")
+
+  def irange(self, lo=None, hi=None, inclusive=(True, True)):
+    """Iterate over items whose key lies between lo and hi"""
+    if lo is None:
+      start = 0
+    elif inclusive[0]:
+      start = bisect_left(self._keys, lo)
+    else:
+      start = bisect_right(self._keys, lo)
+    if hi is None:
+      end = len(self._keys)
+    elif inclusive[1]:
+      end = bisect_right(self._keys, hi)
+    else:
+      end = bisect_left(self._keys, hi)
+    return iter(self._items[start:end])
+
+  def nsmallest(self, n):
+    """The n items with the smallest keys, smallest first"""
+    return self._items[:max(n, 0)]
+
+  def nlargest(self, n):
+    """The n items with the largest keys, largest first"""
+    if n <= 0:
+      return []
+    return self._items[-n:][::-1]
+
   def __getitem__(self, index):
     # Allow indexing into the sorted list
     return self._items[index]
-  
+
   def __len__(self):
     # Return the number of items in the list
     return len(self._items)
-  
+
   def __iter__(self):
     # Allow iteration over the sorted list
     return iter(self._items)
-  
+
+  def __contains__(self, item):
+    value = self._key(item)
+    start = bisect_left(self._keys, value)
+    end = bisect_right(self._keys, value, start)
+    return item in self._items[start:end]
+
   def get_shortest(self):
     """Get shortest item (first item since sorted)"""
     # Return the first item if the list is not empty, else None
     return self._items[0] if self._items else None
-  
+
   def get_longest(self):
     """Get longest item (last item since sorted)"""
     # Return the last item if the list is not empty, else None
-    return self._items[-1] if self._items else None
\ No newline at end of file
+    return self._items[-1] if self._items else None
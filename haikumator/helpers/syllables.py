@@ -0,0 +1,94 @@
+# Syllable counting
+
+# count_syllables(): fast spelling-based estimate, no dictionary needed
+# SyllableCounter: pronunciation dictionary first, estimate as fallback
+
+import os
+import re
+from helpers.cache import FileCache
+
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+# 'word(2)' marks an alternative pronunciation in CMUdict files
+_VARIANT = re.compile(r"\(\d+\)$")
+
+# Used when no dictionary file is given
+PRONUNCIATIONS_ENV = 'HAIKUMATOR_PRONUNCIATIONS'
+
+# Parsed dictionaries, reloaded when their file changes
+_dictionaries = FileCache(maxsize=4)
+
+
+def count_syllables(word):
+  """Estimate the syllables in a word by counting vowel groups"""
+  word = word.lower()
+  if '-' in word:
+    return sum(count_syllables(part) for part in word.split('-') if part)
+  word = re.sub(r"[^a-z]", "", word)
+  if not word:
+    return 0
+  count = len(_VOWEL_GROUPS.findall(word))
+  # Silent final e (make, stone) but not -le (candle) or -ee (tree)
+  if word.endswith('e') and not word.endswith(('le', 'ee')) and count > 1:
+    count -= 1
+  # -ed is usually silent unless after t or d (walked vs. painted)
+  elif word.endswith('ed') and len(word) > 3 and word[-3] not in 'td' and count > 1:
+    count -= 1
+  return max(count, 1)
+
+
+def load_pronunciations(filename):
+  """Parse a CMUdict-style file into word -> syllable count
+
+  Lines look like 'WORD  W ER1 D'; every phoneme carrying a stress digit
+  is a vowel, i.e. one syllable. Lines starting with ';;;' are comments.
+  For words with several pronunciations the first one is kept.
+  """
+  syllables = {}
+  with open(filename, 'r', encoding='latin-1') as f:
+    for line in f:
+      if line.startswith(';;;'):
+        continue
+      parts = line.split()
+      if len(parts) < 2:
+        continue
+      word = _VARIANT.sub('', parts[0].lower())
+      if word not in syllables:
+        syllables[word] = sum(1 for phoneme in parts[1:] if phoneme[-1].isdigit())
+  return syllables
+
+
+class SyllableCounter:
+  def __init__(self, dictionary_file=None):
+    # Dictionary file, or the one named by $HAIKUMATOR_PRONUNCIATIONS if set
+    if dictionary_file is None:
+      dictionary_file = os.environ.get(PRONUNCIATIONS_ENV)
+    self.dictionary_file = dictionary_file
+    self.pronunciations = {}
+    if dictionary_file:
+      self.pronunciations = _dictionaries.get(dictionary_file, load_pronunciations)
+    self._counts = {}
+    self.dictionary_hits = 0
+    self.estimates = 0
+
+  def count_word(self, word):
+    """Syllables of a single word"""
+    word = word.lower()
+    count = self._counts.get(word)
+    if count is None:
+      count = self.pronunciations.get(word.strip(".,;:!?'\"()"))
+      if count is not None:
+        self.dictionary_hits += 1
+      elif '-' in word:
+        count = sum(self.count_word(part) for part in word.split('-') if part)
+      else:
+        count = count_syllables(word)
+        self.estimates += 1
+      self._counts[word] = count
+    return count
+
+  def count(self, text):
+    """Syllables of a word or phrase such as 'deep blue'"""
+    return sum(self.count_word(word) for word in text.split())
+
+  def __call__(self, text):
+    return self.count(text)
@@ -4,11 +4,42 @@
 # SynonymThesaurus (inherits from Thesaurus)
 # AntonymThesaurus (inherits from Thesaurus)
 # Methods to load from file, find words, get random synonyms, etc.
+# AntonymIndex: precomputed antonym lookup over the synonym graph
+
+from collections import deque
+from helpers.sorted_list import SortedList
+from helpers.syllables import count_syllables
+
+# How synonyms can be ranked: by length or by (estimated) syllable count
+RANK_MEASURES = {'length': len, 'syllables': count_syllables}
+# How synonyms that rank equal are ordered: as listed, or alphabetically
+TIE_BREAKS = ('order', 'alpha')
+
+
+def _rank_key(measure, tie_break):
+  """Key function for ranking synonyms"""
+  if measure not in RANK_MEASURES:
+    raise ValueError(f"Unknown measure: {measure}")
+  if tie_break not in TIE_BREAKS:
+    raise ValueError(f"Unknown tie break: {tie_break}")
+  size = RANK_MEASURES[measure]
+  if tie_break == 'alpha':
+    return lambda word: (size(word), word)
+  return size  # SortedList keeps listing order for equal keys
+
 
 # Base Thesaurus class
 class Thesaurus:
   def __init__(self):
     self._data = {}
+    self._reset_indexes()
+
+  def _reset_indexes(self):
+    # Indexes derived from the entries, built on first use
+    self._reverse = None
+    self._graph = None
+    self._antonym_indexes = {}
+    self._rankings = {}
 
   def load_from_file(self, filename):
     """Load thesaurus data from file"""
@@ -16,9 +47,12 @@ class Thesaurus:
       for line in f:
         if ':' in line:
           word, synonyms = line.split(':', 1)
-          self._data[word.strip().lower()] = [
-            s.strip().lower() for s in synonyms.split(',')
-          ]
+          word = word.strip().lower()
+          # A repeated headword replaces its entry and moves to its new line,
+          # so headwords iterate in the order of the lines that define them
+          self._data.pop(word, None)
+          self._data[word] = [s.strip().lower() for s in synonyms.split(',')]
+    self._reset_indexes()
 
   def get_entries(self, word):
     """Get entries for a word (case insensitive)"""
@@ -29,4 +63,121 @@ class Thesaurus:
 
   def __iter__(self):
     """Iterate over words in the thesaurus"""
-    return iter(self._data)
\ No newline at end of file
+    return iter(self._data)
+
+  def reverse_index(self):
+    """Map every headword and every listed synonym to its headword"""
+    if self._reverse is None:
+      reverse = {}
+      for key in self:
+        reverse[key] = key  # map the key to itself
+        for val in self.get_entries(key):
+          reverse[val] = key
+      self._reverse = reverse
+    return self._reverse
+
+  def graph(self):
+    """Undirected synonym graph: word -> neighbouring words
+
+    A headword's own synonyms come first, last listed first, followed by
+    the headwords that list it.
+    """
+    if self._graph is None:
+      graph = {}
+      for key in self:
+        graph.setdefault(key, []).extend(reversed(self.get_entries(key)))
+      for key in self:
+        for val in self.get_entries(key):
+          if val != key:
+            graph.setdefault(val, []).append(key)
+      self._graph = graph
+    return self._graph
+
+  def ranked(self, word, measure='length', tie_break='order'):
+    """Synonyms of a word ranked from smallest to largest, or an empty tuple
+
+    Each word is ranked the first time it is asked for and remembered per
+    measure and tie break, so repeated lookups are a dict lookup and
+    nothing is spent on words that are never looked up.
+    """
+    word = word.lower()
+    table = self._rankings.get((measure, tie_break))
+    if table is None:
+      table = self._rankings[(measure, tie_break)] = {}
+    ranked = table.get(word)
+    if ranked is None:
+      ranked = table[word] = tuple(SortedList(self.get_entries(word),
+                                              key=_rank_key(measure, tie_break)))
+    return ranked
+
+  def shortest(self, word, measure='length', tie_break='order'):
+    """Smallest synonym of a word, or None"""
+    ranked = self.ranked(word, measure, tie_break)
+    return ranked[0] if ranked else None
+
+  def longest(self, word, measure='length', tie_break='order'):
+    """Largest synonym of a word, or None"""
+    ranked = self.ranked(word, measure, tie_break)
+    return ranked[-1] if ranked else None
+
+  def antonym_index(self, antonym_thesaurus, max_depth=1):
+    """Get the AntonymIndex for an antonym thesaurus, building it only once"""
+    key = (antonym_thesaurus, max_depth)
+    index = self._antonym_indexes.get(key)
+    if index is None:
+      index = AntonymIndex(self, antonym_thesaurus, max_depth)
+      self._antonym_indexes[key] = index
+    return index
+
+
+# Antonyms of every known word, resolved through the synonym graph up front
+class AntonymIndex:
+  def __init__(self, synonym_thesaurus, antonym_thesaurus, max_depth=1):
+    # max_depth: how many synonym hops away from the word's headword to look
+    # for a word that has antonyms. The first hop follows only the
+    # headword's own synonyms, as the Antonymizer always has; later hops
+    # also follow the headwords that list a word (see graph())
+    self.max_depth = max_depth
+    reverse = synonym_thesaurus.reverse_index()
+    graph = synonym_thesaurus.graph()
+
+    self._antonyms = {}
+    for word in set(reverse).union(antonym_thesaurus):
+      antonyms = self._resolve(reverse.get(word, word), synonym_thesaurus, graph,
+                               antonym_thesaurus)
+      if antonyms:
+        self._antonyms[word] = antonyms
+
+  def _resolve(self, start, synonym_thesaurus, graph, antonym_thesaurus):
+    """Breadth-first search for the nearest word with antonyms"""
+    seen = {start}
+    queue = deque([(start, 0)])
+    while queue:
+      word, depth = queue.popleft()
+      antonyms = antonym_thesaurus.get_entries(word)
+      if antonyms:
+        return antonyms
+      neighbours = graph.get(word, ())
+      if depth:
+        steps = [(neighbour, depth + 1) for neighbour in neighbours]
+      else:
+        # graph() lists a headword's own synonyms first: they are the first
+        # hop, and the headwords listing the start are the second
+        own = len(synonym_thesaurus.get_entries(word))
+        steps = ([(neighbour, 1) for neighbour in neighbours[:own]]
+                 + [(neighbour, 2) for neighbour in neighbours[own:]])
+      for neighbour, hops in steps:
+        if hops <= self.max_depth and neighbour not in seen:
+          seen.add(neighbour)
+          queue.append((neighbour, hops))
+    return []
+
+  def get(self, word):
+    """Antonyms of a word (case insensitive), or an empty list"""
+    return self._antonyms.get(word.lower(), [])
+
+  def __contains__(self, word):
+    return word.lower() in self._antonyms
+
+  def __len__(self):
+    return len(self._antonyms)
@@ -19,19 +19,31 @@ For each menu option, the application follows a similar workflow:
 
 # Import necessary modules
 from helpers.haiku import Haiku
-from helpers.thesaurus import Thesaurus
+from helpers.compiled_thesaurus import open_thesaurus
 from processors.synonymizer import Synonymizer
 from processors.zenizer import Zenizer
 from processors.antonymizer import Antonymizer
 from processors.batchProcessor import BatchProcessor
 from processors.seasonDetector import SeasonDetector
 from processors.lengthen import Lengthener
+from helpers.cache import FileCache
 from helpers.utils import get_valid_input, validate_choice, validate_file_exists, get_haiku_input
 
 class HaikuGeneratorApp:
-  def __init__(self):
+  def __init__(self, cache_size=32):
+    # Loaded haikus and thesauri, shared by all menu options for the session
+    self.cache = FileCache(cache_size)
     # Display welcome message on initialization
     self.display_welcome()
+
+  # Load files through the session cache
+  def load_haiku(self, filename):
+    """Load a haiku, reusing it if the file has not changed"""
+    return self.cache.get(filename, Haiku.from_file)
+
+  def load_thesaurus(self, filename):
+    """Load a thesaurus, reusing it if the file has not changed"""
+    return self.cache.get(filename, open_thesaurus)
   
   # Display welcome message with student information
   def display_welcome(self):
@@ -112,9 +124,8 @@ class HaikuGeneratorApp:
           input("\nPress Enter to continue...")
 
         # Load haiku and thesaurus data
-        haiku = Haiku.from_file(haiku_file)
-        thesaurus = Thesaurus()
-        thesaurus.load_from_file(thesaurus_file)
+        haiku = self.load_haiku(haiku_file)
+        thesaurus = self.load_thesaurus(thesaurus_file)
 
         # Process haiku with synonyms
         processor = Synonymizer(haiku, thesaurus)
@@ -159,9 +170,8 @@ class HaikuGeneratorApp:
           input("\nPress Enter to continue...")
 
         # Load haiku and thesaurus data
-        haiku = Haiku.from_file(haiku_file)
-        thesaurus = Thesaurus()
-        thesaurus.load_from_file(thesaurus_file)
+        haiku = self.load_haiku(haiku_file)
+        thesaurus = self.load_thesaurus(thesaurus_file)
 
         # Process haiku with Zen transformation
         processor = Zenizer(haiku, thesaurus)
@@ -214,11 +224,9 @@ class HaikuGeneratorApp:
           input("\nPress Enter to continue...")
 
         # Load haiku and thesaurus data
-        haiku = Haiku.from_file(haiku_file)
-        synonym_thesaurus = Thesaurus()
-        synonym_thesaurus.load_from_file(synonym_thesaurus_file)
-        antonym_thesaurus = Thesaurus()
-        antonym_thesaurus.load_from_file(antonym_thesaurus_file)
+        haiku = self.load_haiku(haiku_file)
+        synonym_thesaurus = self.load_thesaurus(synonym_thesaurus_file)
+        antonym_thesaurus = self.load_thesaurus(antonym_thesaurus_file)
 
         # Process haiku with antonyms
         processor = Antonymizer(haiku, synonym_thesaurus, antonym_thesaurus)
@@ -261,9 +269,8 @@ class HaikuGeneratorApp:
         "File not found. Please enter a valid filename."
       )
 
-      haiku = Haiku.from_file(haiku_file)
-      thesaurus = Thesaurus()
-      thesaurus.load_from_file(thesaurus_file)
+      haiku = self.load_haiku(haiku_file)
+      thesaurus = self.load_thesaurus(thesaurus_file)
 
       processor = BatchProcessor(haiku, thesaurus)
       processor.process()
@@ -282,7 +289,7 @@ class HaikuGeneratorApp:
         "File not found. Please enter a valid filename."
       )
       
-      haiku = Haiku.from_file(haiku_file)
+      haiku = self.load_haiku(haiku_file)
       detector = SeasonDetector(haiku)
       season = detector.detect_season()
       
@@ -323,9 +330,8 @@ class HaikuGeneratorApp:
           input("\nPress Enter to continue...")
 
         # Load haiku and thesaurus data
-        haiku = Haiku.from_file(haiku_file)
-        thesaurus = Thesaurus()
-        thesaurus.load_from_file(thesaurus_file)
+        haiku = self.load_haiku(haiku_file)
+        thesaurus = self.load_thesaurus(thesaurus_file)
 
         # Process haiku to lengthen it
         processor = Lengthener(haiku, thesaurus)
@@ -1,13 +1,14 @@
 import random
-from helpers.haiku import Haiku
-from processors.processor import Processor
+from processors.processor import WordReplacer
 
 # Antonymizer class: replaces words with antonyms (if available)
-class Antonymizer(Processor):
-  def __init__(self, haiku, synonym_thesaurus, antonym_thesaurus):
+class Antonymizer(WordReplacer):
+  def __init__(self, haiku, synonym_thesaurus, antonym_thesaurus, max_depth=1):
     self.haiku = haiku
     self.synonym_thesaurus = synonym_thesaurus  # Synonym thesaurus for fallback
     self.antonym_thesaurus = antonym_thesaurus
+    self.max_depth = max_depth  # Synonym hops to search for antonyms
+    self._antonym_index = None
 
   def display_results(self, original, processed_haiku):
     """Display before/after results"""
@@ -20,39 +21,36 @@ class Antonymizer(Processor):
     print("\nPress Enter to continue...")
     input()
 
-  def _build_reverse_syn_map(self):
-    reverse_syn = {}
-    for key in self.synonym_thesaurus:
-      reverse_syn[key.lower()] = key                   # map the key to itself
-      for val in self.synonym_thesaurus.get_entries(key):
-        reverse_syn[val.lower()] = key
-    return reverse_syn
-
-  def _find_antonyms(self, word, reverse_syn):
-    canonical = reverse_syn.get(word.lower(), word)
-    antonyms = self.antonym_thesaurus.get_entries(canonical)
-    if not antonyms and canonical in self.synonym_thesaurus:
-      for syn in reversed(self.synonym_thesaurus.get_entries(canonical)):
-        antonyms = self.antonym_thesaurus.get_entries(syn)
-        if antonyms:
-          break
-    return antonyms
+  def _find_antonyms(self, word):
+    # The index is built once per thesaurus pair and kept by the thesaurus
+    if self._antonym_index is None:
+      self._antonym_index = self.synonym_thesaurus.antonym_index(
+        self.antonym_thesaurus, self.max_depth
+      )
+    return self._antonym_index.get(word)
+
+  def replacements(self, words):
+    """Pick a random antonym for each word that has one"""
+    replacements = {}
+    for word in sorted(words):
+      antonyms = self._find_antonyms(word)
+      if antonyms:
+        replacements[word] = random.choice(antonyms)
+    return replacements
+
+  def candidates(self, haiku):
+    """Replaceable words of a haiku and their distinct antonyms"""
+    words = []
+    choice_lists = []
+    for word in sorted(haiku.get_words()):
+      antonyms = self._find_antonyms(word)
+      if antonyms:
+        words.append(word)
+        choice_lists.append(list(dict.fromkeys(antonyms)))
+    return words, choice_lists
 
   def process(self):
     original = str(self.haiku)
-    processed_haiku = Haiku(*self.haiku._lines)          # clone
-
-    reverse_syn = self._build_reverse_syn_map()
-
-    for word in processed_haiku.get_words():
-      antonyms = self._find_antonyms(word, reverse_syn)
-      if antonyms:
-        new_word = random.choice(antonyms)
-        processed_haiku.replace_word(word, new_word)
-
-    for i, line in enumerate(processed_haiku._lines):
-      if line:
-        processed_haiku._lines[i] = line.capitalize()
-
+    processed_haiku = self.apply(self.haiku)
     self.display_results(original, processed_haiku)
     return processed_haiku
@@ -1,54 +1,445 @@
 import os
-from itertools import product
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from helpers.checkpoint import Checkpoint, checkpoint_path, digest_log_path
+from helpers.dedup import make_deduplicator, DigestLog, DEFAULT_ERROR_RATE
 from helpers.haiku import Haiku
+from helpers.permutations import (count_permutations, iter_choices, split_ranges, shard_range,
+                                  sample_choices, PrunedSearch, BestFirstSearch)
+from helpers.progress import Progress
+from helpers.sinks import (open_sink, target_problem, has_output, prepare_target, part_target,
+                           probe_target, target_size, DEFAULT_QUEUE_BATCHES)
+from helpers.syllables import SyllableCounter
 from processors.processor import Processor
 
+
+def _generate_range(lines, words, synonym_lists, target, start, stop, checkpoint_file,
+                    dedup, error_rate, writers, sync, instrument_memory=None):
+  """Worker: write permutations start..stop-1 to this worker's own sink
+
+  The parent has already applied the policy for existing output, so the
+  worker appends. With instrument_memory set (True/False), the worker is
+  instrumented and its report is returned for the parent to merge.
+  """
+  processor = BatchProcessor(Haiku(*lines), None, dedup=dedup, error_rate=error_rate,
+                             writers=writers, sync=sync, existing='append')
+  if instrument_memory is not None:
+    processor.enable_instrumentation(memory=instrument_memory)
+  with processor.open_sink(target) as sink:
+    count = processor.generate_range(sink, words, synonym_lists, start, stop, checkpoint_file)
+  report = None
+  if processor.instrumentation is not None:
+    report = processor.instrumentation.report()
+    processor.instrumentation.close()
+  return count, processor.duplicates, report
+
+
+def _part_checkpoint(checkpoint_file, part):
+  """Checkpoint file of one worker part: name.json -> name.part{n}.json"""
+  if checkpoint_file is None:
+    return None
+  base, ext = os.path.splitext(checkpoint_file)
+  return f"{base}.part{part}{ext}"
+
+
+# Syllables per line of a classic haiku
+HAIKU_FORM = (5, 7, 5)
+
+# Permutations written to a throwaway sink by estimate()
+DEFAULT_ESTIMATE_SAMPLE = 1000
+
+# Size of a batch job, from BatchProcessor.estimate()
+#   permutations  exact number of haikus the full product holds
+#   bytes         output size extrapolated from the sample
+#   seconds       time to render and write them all in one process, likewise
+#   sample        number of permutations the estimates are based on
+JobEstimate = namedtuple('JobEstimate', 'permutations bytes seconds sample')
+
+# One haiku found by BatchProcessor.top_k()
+#   number  its v{n} number in the full product
+#   score   its score, higher is better
+#   text    the haiku
+Variant = namedtuple('Variant', 'number score text')
+
+
 # BatchProcessor class: Create all possible alternatives of an existing haiku
 class BatchProcessor(Processor):
+  def __init__(self, haiku, thesaurus, workers=1, dedup=None, error_rate=DEFAULT_ERROR_RATE,
+               writers=1, sync='none', queue_batches=DEFAULT_QUEUE_BATCHES,
+               existing='refuse'):
+    super().__init__(haiku, thesaurus)
+    # Number of processes to generate with; None uses every core
+    self.workers = workers
+    # Writer threads per sink (0 writes from the generating thread), the
+    # sinks' sync policy, and how many batches may wait for the writers
+    self.writers = writers
+    self.sync = sync
+    self.queue_batches = queue_batches
+    # What to do with a target that already holds haikus (EXISTING_POLICIES);
+    # a job resuming from its checkpoint always appends
+    self.existing = existing
+    # Duplicate output removal: None, 'exact', 'bloom' or 'auto'
+    self.dedup = dedup
+    self.error_rate = error_rate
+    # Duplicate haikus dropped by the last run
+    self.duplicates = 0
+    # PrunedSearch or BestFirstSearch of the last generate_constrained() or
+    # top_k() run, for its stats
+    self.search = None
+
+  def open_sink(self, target, existing=None):
+    """Open the sink for a target with this processor's writer, sync and
+    existing output settings"""
+    return open_sink(target, sync=self.sync, writers=self.writers,
+                     max_batches=self.queue_batches, existing=existing or self.existing)
+
+  def get_replaceable_words(self):
+    """Get the replaceable words and their synonym lists, in a fixed order"""
+    with self.stage('tokenize'):
+      haiku_words = sorted(self.haiku.get_words())
+
+    words = []
+    synonym_lists = []
+    with self.stage('lookup'):
+      for word in haiku_words:
+        if word in self.thesaurus:
+          synonyms = self.thesaurus.get_entries(word)
+          if self.dedup:
+            # Repeated synonyms only ever produce duplicate haikus
+            synonyms = list(dict.fromkeys(synonyms))
+          if synonyms:
+            words.append(word)
+            synonym_lists.append(synonyms)
+    return words, synonym_lists
+
   def process(self):
     """Generate all possible permutations of the haiku"""
     # Get all replaceable words with their synonyms
-    replaceable_words = {}
-    for word in self.haiku.get_words():
-      if word in self.thesaurus:
-        synonyms = self.thesaurus.get_entries(word)
-        if synonyms:
-          replaceable_words[word] = synonyms
-
-    if not replaceable_words:
+    words, synonym_lists = self.get_replaceable_words()
+
+    if not words:
       print("No replaceable words found in thesaurus.")
       input("Press Enter to continue...")
       return None
 
-    # Get output folder
-    folder = input("\nSelect an existing folder to store the batch processed haikus\n"
+    # Get output folder, or an archive/database file to write into
+    target = input("\nSelect an existing folder to store the batch processed haikus\n"
+                   "(or a .jsonl, .jsonl.gz, .zip, .tar, .tar.gz or .db file)\n"
                    "Please enter the folder name: ").strip()
-    while not os.path.isdir(folder):
-      print("Folder not found. Please enter an existing directory.")
-      folder = input("Please enter the folder name: ").strip()
+    while True:
+      problem = target_problem(target)
+      if problem is None and has_output(target) and self.existing == 'refuse':
+        answer = input(f"{target} already holds haikus. Overwrite (o), append (a) "
+                       "or choose another (c)? ").strip().lower()
+        if answer in ('o', 'a'):
+          self.existing = 'overwrite' if answer == 'o' else 'append'
+          break
+      elif problem is None:
+        break
+      else:
+        print(problem)
+      target = input("Please enter the folder or file name: ").strip()
 
     input('\nPress Enter to start batch processing...\n')
     print("\nBatch processing started!")
 
-    # Generate all possible combinations
-    words = list(replaceable_words.keys())
-    synonym_lists = [replaceable_words[word] for word in words]
+    workers = self.workers or os.cpu_count() or 1
+    if workers > 1:
+      count = self.generate_parallel(target, words, synonym_lists, workers)
+    else:
+      with self.open_sink(target) as sink:
+        count = self.generate(sink, words, synonym_lists)
+
+    print(f"\nBatch processing completed with {count} permutations")
+    if self.dedup:
+      print(f"{self.duplicates} duplicate haikus were skipped")
+    print("Press Enter to continue....")
+    return count
+
+  def generate(self, sink, words, synonym_lists):
+    """Write every combination of synonyms to the sink, numbered from 1"""
+    return self.generate_range(sink, words, synonym_lists, progress=True)
 
-    # Process each combination
+  def generate_range(self, sink, words, synonym_lists, start=0, stop=None,
+                     checkpoint_file=None, progress=False):
+    """Write permutations start..stop-1 to the sink as v{index+1}
+
+    With a checkpoint file, progress is saved every few thousand
+    permutations and a rerun continues from the last saved index. Before
+    it does, whatever reached the sink after that checkpoint is dropped
+    (Sink.rewind), so no haiku is written twice.
+
+    With dedup enabled, haikus identical to one already written for this
+    range are skipped; the number skipped is left in self.duplicates. With
+    a checkpoint, the digests of the haikus written are logged beside it
+    (digest_log_path), so a rerun rebuilds the filter and still skips
+    haikus written before the interruption.
+
+    With progress, throughput and ETA are printed once a second.
+    """
+    radices = [len(synonyms) for synonyms in synonym_lists]
+    total = count_permutations(radices)
+    stop = total if stop is None else min(stop, total)
+
+    deduplicator = None
+    is_duplicate = None
+    if self.dedup:
+      deduplicator = make_deduplicator(self.dedup, stop - start, self.error_rate)
+      is_duplicate = deduplicator.is_duplicate
+
+    checkpoint = None
+    digest_log = None
+    next_index = start
     count = 0
-    for combo in product(*synonym_lists):
-      processed_haiku = Haiku(*self.haiku._lines)
-      for word, replacement in zip(words, combo):
-        processed_haiku.replace_word(word, replacement)
+    if checkpoint_file is not None:
+      job = {'words': list(words), 'radices': radices, 'start': start, 'stop': stop,
+             'target': sink.target}
+      checkpoint = Checkpoint(checkpoint_file, job)
+      manifest = checkpoint.load()
+      next_index = manifest['next']
+      count = manifest['count']
+      dedup_state = manifest.get('dedup') or {'digests': 0, 'dropped': 0}
+      if deduplicator:
+        digest_log = DigestLog(digest_log_path(checkpoint_file), self.sync)
+        digest_log.open(deduplicator, dedup_state['digests'])
+        deduplicator.dropped = dedup_state['dropped']
+      if 'sink' in manifest:
+        sink.rewind(manifest['sink'])
+      else:
+        # Fresh job: a run killed before the first checkpoint restarts from here
+        checkpoint.save(next_index, count, sink=sink.mark(), dedup=self._dedup_state(
+          deduplicator, digest_log))
 
-      # Save to file with v{number}.txt naming
-      filename = os.path.join(folder, f"v{count+1}.txt")
-      with open(filename, 'w') as f:
-        f.write(str(processed_haiku))
+    resumed = next_index
+    reporter = Progress(stop - resumed) if progress else None
 
-      print('.', end='', flush=True)
-      count += 1
+    # The loop calls these through locals; when instrumented they are timed
+    # wrappers, otherwise the plain methods, so profiling costs nothing when off
+    render = self.haiku.render
+    write = sink.write
+    save = checkpoint.save if checkpoint else None
+    if self.instrumentation is not None:
+      render = self.instrumentation.wrap('render', render)
+      write = self.instrumentation.wrap('write', write)
+      if is_duplicate is not None:
+        is_duplicate = self.instrumentation.wrap('dedup', is_duplicate)
+      if save is not None:
+        save = self.instrumentation.wrap('checkpoint', save)
 
-    print(f"\nBatch processing completed with {count} permutations")
-    print("Press Enter to continue....")
+    for choice in iter_choices(radices, next_index, stop):
+      combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+      # Render straight from the cached spans, no clone per permutation
+      text = render(dict(zip(words, combo)))
+      next_index += 1
+      if is_duplicate is None or not is_duplicate(text):
+        write(next_index, text)
+        count += 1
+      if reporter:
+        reporter.update(next_index - resumed)
+
+      if checkpoint and (next_index - start) % checkpoint.every == 0:
+        save(next_index, count, sink=sink.mark(),
+             dedup=self._dedup_state(deduplicator, digest_log))
+
+    if checkpoint:
+      with self.stage('write'):
+        mark = sink.mark()
+      save(next_index, count, complete=True, sink=mark,
+           dedup=self._dedup_state(deduplicator, digest_log))
+    if digest_log:
+      digest_log.close()
+    if reporter:
+      reporter.finish()
+    self.duplicates = deduplicator.dropped if deduplicator else 0
+    return count
+
+  @staticmethod
+  def _dedup_state(deduplicator, digest_log):
+    """Dedup part of a checkpoint: digest log length and haikus dropped"""
+    if digest_log is None:
+      return None
+    return {'digests': digest_log.mark(), 'dropped': deduplicator.dropped}
+
+  def word_uses(self, words):
+    """How often each word is used on each line, and the words that stay fixed
+
+    Returns (uses, fixed): uses[i][line] counts word i on that line, and
+    fixed lists (line, word) for every other word of the haiku.
+    """
+    position = {word: i for i, word in enumerate(words)}
+    uses = [[0] * len(self.haiku.lines) for _ in words]
+    fixed = []
+    for span in self.haiku.spans:
+      # Mirrors Haiku._replacement_for: a mapped hyphenated word wins over its parts
+      if span.key in position:
+        uses[position[span.key]][span.line] += 1
+      elif '-' in span.key:
+        for part in span.key.split('-'):
+          if part in position:
+            uses[position[part]][span.line] += 1
+          elif part:
+            fixed.append((span.line, part))
+      else:
+        fixed.append((span.line, span.key))
+    return uses, fixed
+
+  def syllable_costs(self, words, synonym_lists, counter):
+    """Fixed syllables per line, and what each synonym choice adds to each line
+
+    Returns (base, costs) for PrunedSearch. A word used on several lines
+    adds its syllables to each of them.
+    """
+    uses, fixed = self.word_uses(words)
+    base = [0] * len(self.haiku.lines)
+    for line, word in fixed:
+      base[line] += counter.count_word(word)
+    costs = [[tuple(n * counter.count(synonym) for n in word_uses) for synonym in synonyms]
+             for word_uses, synonyms in zip(uses, synonym_lists)]
+    return base, costs
+
+  def generate_constrained(self, sink, words, synonym_lists, form=HAIKU_FORM, counter=None):
+    """Write only the permutations whose lines have exactly `form` syllables
+
+    Branches of the product are pruned as soon as a line can no longer hit
+    its syllable count, so invalid haikus are never built. Haikus keep the
+    v{n} numbers they have in the full product. Stats of the search are
+    left in self.search.
+    """
+    counter = counter or SyllableCounter()
+    if len(form) != len(self.haiku.lines):
+      raise ValueError(f"form needs {len(self.haiku.lines)} syllable counts")
+    base, costs = self.syllable_costs(words, synonym_lists, counter)
+    self.search = PrunedSearch([len(synonyms) for synonyms in synonym_lists], costs, base,
+                               form)
+
+    deduplicator = None
+    if self.dedup:
+      deduplicator = make_deduplicator(self.dedup, self.search.total, self.error_rate)
+    count = 0
+    for index, choice in self.search:
+      combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+      text = self.haiku.render(dict(zip(words, combo)))
+      if deduplicator is None or not deduplicator.is_duplicate(text):
+        sink.write(index + 1, text)
+        count += 1
+    self.duplicates = deduplicator.dropped if deduplicator else 0
     return count
+
+  def estimate(self, words, synonym_lists, target=None, sample=DEFAULT_ESTIMATE_SAMPLE,
+               seed=0):
+    """Size up a batch job without running it
+
+    The permutation count is exact. Bytes and time come from rendering a
+    random sample and writing it, with this processor's writer and sync
+    settings, to a temporary target of the same kind as `target` (a folder
+    by default), scaled up to the whole product.
+    """
+    radices = [len(synonyms) for synonyms in synonym_lists]
+    total = count_permutations(radices)
+    choices = sample_choices(radices, sample, seed)
+    if not choices:
+      return JobEstimate(total, 0, 0.0, 0)
+
+    render = self.haiku.render
+    with tempfile.TemporaryDirectory() as folder:
+      probe = probe_target(folder, target)
+      started = time.perf_counter()
+      with self.open_sink(probe) as sink:
+        for number, choice in enumerate(choices, 1):
+          combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+          sink.write(number, render(dict(zip(words, combo))))
+      seconds = time.perf_counter() - started
+      nbytes = target_size(probe)
+    scale = total / len(choices)
+    return JobEstimate(total, round(nbytes * scale), seconds * scale, len(choices))
+
+  def top_k(self, words, synonym_lists, k, score):
+    """The k best haikus under a Score, best first, as Variants
+
+    Searches best-first (see BestFirstSearch), so only the branches that
+    can still make the top k are built. With dedup enabled, haikus
+    identical to a better one are skipped and the search continues past
+    them. Stats of the search are left in self.search.
+    """
+    base, costs = score.costs(self, words, synonym_lists)
+    self.search = BestFirstSearch([len(synonyms) for synonyms in synonym_lists], costs, base,
+                                  score.value, score.bound)
+
+    variants = []
+    if k <= 0:
+      return variants
+    deduplicator = None
+    if self.dedup:
+      deduplicator = make_deduplicator(self.dedup, k, self.error_rate)
+    for value, index, choice in self.search:
+      combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+      text = self.haiku.render(dict(zip(words, combo)))
+      if deduplicator is None or not deduplicator.is_duplicate(text):
+        variants.append(Variant(index + 1, value, text))
+        if len(variants) == k:
+          break
+    self.duplicates = deduplicator.dropped if deduplicator else 0
+    return variants
+
+  def generate_parallel(self, target, words, synonym_lists, workers, start=0, stop=None,
+                        label=None, checkpoint_file=None):
+    """Split the permutation indexes into ranges and generate them in a process pool
+
+    Each worker rebuilds its combinations from their mixed-radix index and
+    writes to its own sink (part_target), keeping the v{n} numbering of the
+    sequential run. Each part gets its own checkpoint file, and duplicates
+    are only detected within a part. When instrumented, the workers' stage
+    timings are merged into this processor's instrumentation.
+    """
+    total = count_permutations(len(synonyms) for synonyms in synonym_lists)
+    stop = total if stop is None else min(stop, total)
+    ranges = split_ranges(stop - start, workers)
+    prefix = f"{label}-" if label else ""
+    targets = [part_target(target, f"{prefix}part{part}") for part in range(len(ranges))]
+    checkpoints = [_part_checkpoint(checkpoint_file, part) for part in range(len(ranges))]
+    # Parts of a folder share it, so the policy is applied once, here
+    if not any(path and os.path.isfile(path) for path in checkpoints):
+      for path in dict.fromkeys(targets):
+        prepare_target(path, self.existing)
+    instrument_memory = self.instrumentation.memory if self.instrumentation else None
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+      futures = [
+        pool.submit(_generate_range, list(self.haiku.lines), words, synonym_lists,
+                    targets[part], start + part_start, start + part_stop, checkpoints[part],
+                    self.dedup, self.error_rate, self.writers, self.sync, instrument_memory)
+        for part, (part_start, part_stop) in enumerate(ranges)
+      ]
+      results = [future.result() for future in futures]
+    if self.instrumentation is not None:
+      for _, _, report in results:
+        self.instrumentation.merge(report)
+    self.duplicates = sum(duplicates for _, duplicates, _ in results)
+    return sum(count for count, _, _ in results)
+
+  def run_job(self, target, shard=0, shards=1, workers=1, checkpoint_file=None,
+              progress=False):
+    """Run one resumable shard of the batch job
+
+    Returns the number of haikus produced and the manifest files written,
+    which merge_manifests() combines across shards.
+    """
+    words, synonym_lists = self.get_replaceable_words()
+    total = count_permutations(len(synonyms) for synonyms in synonym_lists)
+    start, stop = shard_range(total, shard, shards)
+    if checkpoint_file is None:
+      checkpoint_file = checkpoint_path(target, shard, shards)
+    label = f"shard{shard}" if shards > 1 else None
+
+    if workers > 1:
+      count = self.generate_parallel(target, words, synonym_lists, workers, start, stop,
+                                     label, checkpoint_file)
+      parts = len(split_ranges(stop - start, workers))
+      return count, [_part_checkpoint(checkpoint_file, part) for part in range(parts)]
+
+    existing = 'append' if os.path.isfile(checkpoint_file) else None
+    with self.open_sink(part_target(target, label) if label else target, existing) as sink:
+      count = self.generate_range(sink, words, synonym_lists, start, stop, checkpoint_file,
+                                  progress)
+    return count, [checkpoint_file]
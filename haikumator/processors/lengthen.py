@@ -1,9 +1,15 @@
-from helpers.haiku import Haiku
-from helpers.sorted_list import SortedList
-from processors.processor import Processor
+from processors.processor import WordReplacer
 
 # Lengthener class to replace words in a Haiku with the longest synonym
-class Lengthener(Processor):
+class Lengthener(WordReplacer):
+  deterministic = True
+
+  def __init__(self, haiku, thesaurus, measure='length', tie_break='order'):
+    super().__init__(haiku, thesaurus)
+    # Rank synonyms by 'length' or 'syllables'; break ties by 'order' or 'alpha'
+    self.measure = measure
+    self.tie_break = tie_break
+
   def display_results(self, original, processed_haiku):
     """Display before/after results"""
     print("\nThe Haiku before processing:")
@@ -15,23 +21,18 @@ class Lengthener(Processor):
     print("\nPress Enter to continue...")
     input()
 
+  def replacements(self, words):
+    """Map each word that has synonyms to its longest one"""
+    replacements = {}
+    for word in words:
+      # Each word is ranked on its first lookup and remembered after that
+      longest = self.thesaurus.longest(word, self.measure, self.tie_break)
+      if longest is not None:
+        replacements[word] = longest
+    return replacements
+
   def process(self):
     original = str(self.haiku)
-    processed_haiku = Haiku(*self.haiku._lines)
-
-    for word in processed_haiku.get_words():
-      if word.lower() in self.thesaurus:
-        synonyms = self.thesaurus.get_entries(word)
-        if synonyms:
-          # Use our SortedList to find longest synonym
-          sorted_syns = SortedList(synonyms, key=len)
-          longest = sorted_syns.get_longest()
-          processed_haiku.replace_word(word, longest)
-
-    # Capitalize the first letter of each line
-    for i, line in enumerate(processed_haiku._lines):
-      if line:
-        processed_haiku._lines[i] = line.capitalize()
-
+    processed_haiku = self.apply(self.haiku)
     self.display_results(original, processed_haiku)
     return processed_haiku
@@ -0,0 +1,88 @@
+# Pipeline class: chains word-replacing processors over one tokenized haiku
+
+# Each stage maps the haiku's current words to new ones through
+# WordReplacer.replacements(); the words are tracked per original word, so the
+# haiku is tokenized once and rendered once, after the last stage.
+# A replacement of several words (e.g. 'deep blue') is looked up as a
+# whole by later stages rather than word by word.
+
+from collections import namedtuple
+from helpers.haiku import Haiku
+from processors.seasonDetector import SeasonDetector
+
+# One replacement made by a stage
+#   stage   name of the stage
+#   word    the word as it appears in the original haiku
+#   before  the word going into the stage
+#   after   the word the stage put in its place
+Replacement = namedtuple('Replacement', 'stage word before after')
+
+# Result of a pipeline run for one haiku
+#   text        the rendered haiku
+#   provenance  Replacements in stage order
+#   season      detected season, or None (also when detection is off)
+PipelineResult = namedtuple('PipelineResult', 'text provenance season')
+
+
+class Pipeline:
+  def __init__(self, stages, detect_season=False):
+    # stages: processors, or (name, processor) pairs; names default to the
+    # lowercase class name
+    self.stages = []
+    for stage in stages:
+      if isinstance(stage, tuple):
+        self.stages.append(stage)
+      else:
+        self.stages.append((type(stage).__name__.lower(), stage))
+    self.detect_season = detect_season
+
+  def _run_stages(self, haiku, memos):
+    """Final word mapping and provenance of one haiku"""
+    current = {word: word for word in sorted(haiku.get_words())}
+    provenance = []
+    for (name, processor), memo in zip(self.stages, memos):
+      words = set(current.values())
+      if memo is None:
+        mapping = processor.replacements(words)
+      else:
+        # Deterministic stage: look up only words not seen earlier in the batch
+        missing = words.difference(memo)
+        if missing:
+          found = processor.replacements(missing)
+          for word in missing:
+            memo[word] = found.get(word)
+        mapping = memo
+      for word, before in current.items():
+        after = mapping.get(before)
+        if after is not None and after.lower() != before:
+          after = after.lower()
+          provenance.append(Replacement(name, word, before, after))
+          current[word] = after
+    final = {word: new for word, new in current.items() if new != word}
+    return final, provenance
+
+  def run_many(self, haikus):
+    """Run every haiku through the stages; returns a list of PipelineResults
+
+    Deterministic stages look each distinct word up once for the whole
+    batch, and season detection classifies all results in one pass.
+    """
+    memos = [{} if processor.deterministic else None for _, processor in self.stages]
+    texts = []
+    provenances = []
+    for haiku in haikus:
+      final, provenance = self._run_stages(haiku, memos)
+      lines = [line.capitalize() for line in haiku.render_lines(final)]
+      texts.append("\n".join(lines))
+      provenances.append(provenance)
+
+    seasons = [None] * len(texts)
+    if self.detect_season and texts:
+      results = [Haiku(*text.split("\n")) for text in texts]
+      seasons = list(SeasonDetector.classify_corpus(results).seasons)
+    return [PipelineResult(text, provenance, season)
+            for text, provenance, season in zip(texts, provenances, seasons)]
+
+  def run(self, haiku):
+    """Run one haiku through the stages"""
+    return self.run_many([haiku])[0]
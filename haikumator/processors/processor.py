@@ -1,13 +1,17 @@
 # Base Processor class
-# Synonymizer (inherits from Processor)
-# Zenizer (inherits from Processor)
-# Antonymizer (inherits from Processor)
+# WordReplacer (inherits from Processor): processors that replace words
+# Synonymizer, Zenizer, Lengthener, Antonymizer (inherit from WordReplacer)
 # BatchProcessor (inherits from Processor)
 
 from abc import ABC, abstractmethod
+from helpers.instrumentation import Instrumentation, NO_STAGE
+from helpers.permutations import sample_choices
 
 # Base processor class for all haiku processors
 class Processor(ABC):
+  # Per-stage timings, off unless enable_instrumentation() is called
+  instrumentation = None
+
   def __init__(self, haiku, thesaurus):
     self.haiku = haiku
     self.thesaurus = thesaurus
@@ -15,4 +19,84 @@ class Processor(ABC):
   @abstractmethod
   def process(self):
     """Process the haiku according to specific rules"""
-    pass
\ No newline at end of file
+    pass
+
+  def enable_instrumentation(self, instrumentation=None, memory=False, callback=None):
+    """Start recording per-stage timings; returns the Instrumentation
+
+    Pass an existing Instrumentation to share it between processors (or
+    with code that times thesaurus loading).
+    """
+    if instrumentation is None:
+      instrumentation = Instrumentation(memory, callback)
+    self.instrumentation = instrumentation
+    return instrumentation
+
+  def disable_instrumentation(self):
+    self.instrumentation = None
+
+  def stage(self, name):
+    """Context manager timing one stage; a shared no-op when not instrumented"""
+    if self.instrumentation is None:
+      return NO_STAGE
+    return self.instrumentation.stage(name)
+
+
+# Base class for the processors that replace words in a haiku
+class WordReplacer(Processor):
+  # True if replacements() always maps a word the same way, so a Pipeline
+  # can look each word up once per batch
+  deterministic = False
+
+  def apply(self, haiku):
+    """Return a processed copy of a haiku, without any console I/O
+
+    Words are replaced as replacements() maps them.
+    """
+    with self.stage('tokenize'):
+      words = haiku.get_words()
+
+    with self.stage('lookup'):
+      replacements = self.replacements(words)
+
+    with self.stage('replace'):
+      # Copy-on-write: lines without replacements are shared with the input
+      processed_haiku = haiku.replaced(replacements)
+
+    # Capitalize the first letter of each line
+    with self.stage('render'):
+      processed_haiku.capitalize_lines()
+    return processed_haiku
+
+  @abstractmethod
+  def replacements(self, words):
+    """Map lowercase words to their replacements, leaving out unchanged words
+
+    Used by apply() and by Pipeline.
+    """
+    pass
+
+  def candidates(self, haiku):
+    """Replaceable words of a haiku and the distinct choices for each word
+
+    By default each word has one choice, the one replacements() makes;
+    processors that pick replacements at random list all of theirs.
+    """
+    mapping = self.replacements(haiku.get_words())
+    words = sorted(mapping)
+    return words, [[mapping[word]] for word in words]
+
+  def sample(self, n, seed=None, unique=True, haiku=None):
+    """Yield n random processed variants of the haiku, as text
+
+    All choices are drawn up front from a generator seeded with `seed`,
+    so the same seed gives the same variants. With unique=True no variant
+    repeats, and fewer than n are yielded if the haiku has fewer.
+    """
+    haiku = self.haiku if haiku is None else haiku
+    words, choice_lists = self.candidates(haiku)
+    radices = [len(choices) for choices in choice_lists]
+    for choice in sample_choices(radices, n, seed, unique):
+      mapping = {word: choices[i] for word, choices, i in zip(words, choice_lists, choice)}
+      # Capitalize the first letter of each line, as apply() does
+      yield "\n".join(line.capitalize() for line in haiku.render_lines(mapping))
@@ -0,0 +1,53 @@
+# Processor registry
+
+# Builds a processor by name for the non-interactive entry points
+# (stream.py, runner.py), loading its thesauri through the compiled cache
+
+from helpers.compiled_thesaurus import open_thesaurus
+from helpers.instrumentation import NO_STAGE
+from processors.antonymizer import Antonymizer
+from processors.lengthen import Lengthener
+from processors.synonymizer import Synonymizer
+from processors.zenizer import Zenizer
+
+PROCESSORS = {
+  'synonymize': Synonymizer,
+  'zenize': Zenizer,
+  'lengthen': Lengthener,
+  'antonymize': Antonymizer,
+}
+
+
+def create_processor(name, thesaurus_file, antonym_file=None, instrumentation=None,
+                     lazy=False):
+  """Create a processor whose apply() turns one Haiku into another
+
+  With an Instrumentation, thesaurus loading is timed as stage 'load' and
+  the processor records its own stages into it. With lazy=True thesaurus
+  entries are parsed only when looked up (see LazyThesaurus).
+  """
+  if name not in PROCESSORS:
+    raise ValueError(f"Unknown processor: {name}")
+  if thesaurus_file is None:
+    raise ValueError(f"{name} needs a synonym thesaurus")
+  if name == 'antonymize' and antonym_file is None:
+    raise ValueError("antonymize needs an antonym thesaurus")
+
+  load = instrumentation.stage('load') if instrumentation else NO_STAGE
+  with load:
+    thesaurus = open_thesaurus(thesaurus_file, lazy)
+    antonyms = open_thesaurus(antonym_file, lazy) if name == 'antonymize' else None
+  if name == 'antonymize':
+    processor = Antonymizer(None, thesaurus, antonyms)
+  else:
+    processor = PROCESSORS[name](None, thesaurus)
+  if instrumentation is not None:
+    processor.enable_instrumentation(instrumentation)
+  return processor
+
+
+def create_pipeline(names, thesaurus_file, antonym_file=None, detect_season=False):
+  """Create a Pipeline running the named processors in order"""
+  from processors.pipeline import Pipeline
+  return Pipeline([(name, create_processor(name, thesaurus_file, antonym_file))
+                   for name in names], detect_season)
@@ -0,0 +1,142 @@
+# Variant scores: rank the permutations of a haiku for BatchProcessor.top_k()
+
+# A score turns every synonym choice into a tuple it adds to some totals
+# (characters, syllables per line, weight per season), and scores the
+# totals of a complete choice; higher is better. Because the totals of a
+# partial choice can only grow within known limits, BestFirstSearch can
+# bound what a branch may still reach and find the best haikus without
+# building the rest of the product.
+
+from abc import ABC, abstractmethod
+from processors.batchProcessor import HAIKU_FORM
+from processors.seasonDetector import SeasonDetector
+from helpers.syllables import SyllableCounter
+
+
+class Score(ABC):
+  @abstractmethod
+  def costs(self, processor, words, synonym_lists):
+    """(base, costs) of the totals, as for PrunedSearch"""
+    pass
+
+  @abstractmethod
+  def value(self, totals):
+    """Score of a complete choice"""
+    pass
+
+  @abstractmethod
+  def bound(self, totals, least, most):
+    """Best score a partial choice can still reach, when its totals may grow
+    by least..most"""
+    pass
+
+
+class LengthScore(Score):
+  """Characters in the haiku, counted as a sum over the chosen synonyms"""
+  sign = 1
+
+  def costs(self, processor, words, synonym_lists):
+    uses, _ = processor.word_uses(words)
+    counts = [sum(word_uses) for word_uses in uses]
+    fixed = len(processor.haiku.render({})) - sum(
+      n * len(word) for n, word in zip(counts, words))
+    costs = [[(self.sign * n * len(synonym),) for synonym in synonyms]
+             for n, synonyms in zip(counts, synonym_lists)]
+    return (self.sign * fixed,), costs
+
+  def value(self, totals):
+    return totals[0]
+
+  def bound(self, totals, least, most):
+    return totals[0] + most[0]
+
+
+class ShortestScore(LengthScore):
+  """Fewest characters first; the score is minus the length"""
+  sign = -1
+
+
+class LongestScore(LengthScore):
+  """Most characters first; the score is the length"""
+  sign = 1
+
+
+class SyllableFitScore(Score):
+  """Closest to a syllable form first; the score is minus the syllables
+  each line is off by, so a perfect fit scores 0"""
+
+  def __init__(self, form=HAIKU_FORM, counter=None):
+    self.form = tuple(form)
+    self.counter = counter or SyllableCounter()
+
+  def costs(self, processor, words, synonym_lists):
+    if len(self.form) != len(processor.haiku.lines):
+      raise ValueError(f"form needs {len(processor.haiku.lines)} syllable counts")
+    return processor.syllable_costs(words, synonym_lists, self.counter)
+
+  def value(self, totals):
+    return -sum(abs(total - target) for total, target in zip(totals, self.form))
+
+  def bound(self, totals, least, most):
+    # Each line can still land anywhere in total+low..total+high
+    return -sum(max(0, total + low - target, target - total - high)
+                for total, low, high, target in zip(totals, least, most, self.form))
+
+
+class SeasonStrengthScore(Score):
+  """Most seasonal first: the weighted keyword score of one season, or of
+  the strongest season when none is given
+
+  Keywords are weighted per category as in SeasonDetector.weight_matrix.
+  Words are matched one at a time (a multi-word synonym as a whole), so a
+  seasonal phrase spread over separate words of the haiku is not counted.
+  """
+
+  def __init__(self, season=None, category_weights=None):
+    if season is not None and season not in SeasonDetector.SEASONS:
+      raise ValueError(f"Unknown season: {season}")
+    self.season = season
+    self.weights = SeasonDetector.weight_matrix(category_weights)
+
+  def _weights(self, text):
+    """Weight per season of the keywords in a word or phrase"""
+    totals = [0.0] * len(SeasonDetector.SEASONS)
+    for term, _ in SeasonDetector._match_words([text.lower().split()]):
+      for i, weight in enumerate(self.weights[SeasonDetector.TERM_IDS[term]]):
+        totals[i] += float(weight)
+    return totals
+
+  def costs(self, processor, words, synonym_lists):
+    uses, fixed = processor.word_uses(words)
+    base = [0.0] * len(SeasonDetector.SEASONS)
+    for _, word in fixed:
+      base = [a + b for a, b in zip(base, self._weights(word))]
+    costs = []
+    for word_uses, synonyms in zip(uses, synonym_lists):
+      n = sum(word_uses)
+      costs.append([tuple(n * weight for weight in self._weights(synonym))
+                    for synonym in synonyms])
+    return base, costs
+
+  def value(self, totals):
+    if self.season is not None:
+      return totals[SeasonDetector.SEASONS.index(self.season)]
+    return max(totals)
+
+  def bound(self, totals, least, most):
+    return self.value([total + high for total, high in zip(totals, most)])
+
+
+SCORES = {
+  'shortest': ShortestScore,
+  'longest': LongestScore,
+  'syllables': SyllableFitScore,
+  'season': SeasonStrengthScore,
+}
+
+
+def create_score(name, **options):
+  """Create a score by name; options go to its constructor"""
+  if name not in SCORES:
+    raise ValueError(f"Unknown score: {name}")
+  return SCORES[name](**options)
@@ -1,4 +1,54 @@
 # Season Detector class: Detects the season based on haiku content
+
+from collections import namedtuple
+from helpers.haiku import line_words
+
+try:
+  import numpy as np
+except ImportError:  # classify_corpus falls back to plain Python lists
+  np = None
+
+# Marks the end of a phrase in the trie
+PHRASE_END = None
+
+
+def build_keyword_index(season_words):
+  """Compile season words into a term -> ((season, category), ...) index
+
+  Terms of several words, such as 'wild goose', go into a separate trie keyed
+  by word instead: first word -> next word -> ... -> PHRASE_END -> matches.
+  """
+  index = {}
+  for season, categories in season_words.items():
+    for category, season_list in categories.items():
+      for term in season_list:
+        index.setdefault(term, []).append((season, category))
+
+  words = {}
+  phrases = {}
+  for term, matches in index.items():
+    parts = term.split()
+    if len(parts) == 1:
+      words[term] = tuple(matches)
+      continue
+    node = phrases
+    for part in parts:
+      node = node.setdefault(part, {})
+    node[PHRASE_END] = (term, tuple(matches))
+  return words, phrases
+
+
+# Result of SeasonDetector.classify_corpus, one entry per poem
+#   seasons     season name, or None when no seasonal keyword was found
+#   season_ids  index into SeasonDetector.SEASONS, or -1
+#   confidence  share of the poem's total score that the winning season has
+#   scores      poems x seasons matrix of weighted keyword scores
+#   keywords    tuple of the seasonal terms matched in each poem
+CorpusClassification = namedtuple(
+  'CorpusClassification', 'seasons season_ids confidence scores keywords'
+)
+
+
 class SeasonDetector:
   SEASON_WORDS = {
     'spring': {
@@ -60,6 +110,15 @@ class SeasonDetector:
     }
   }
 
+  # Compiled once for the class
+  WORD_INDEX, PHRASE_TRIE = build_keyword_index(SEASON_WORDS)
+  SEASONS = tuple(SEASON_WORDS)
+  # Every term (word or phrase) with an id; sorted, so the ids do not
+  # depend on the order of SEASON_WORDS
+  TERMS = tuple(sorted({term for categories in SEASON_WORDS.values()
+                        for season_list in categories.values() for term in season_list}))
+  TERM_IDS = {term: i for i, term in enumerate(TERMS)}
+
   def __init__(self, haiku):
     self.haiku = haiku
     self.season = None
@@ -68,25 +127,112 @@ class SeasonDetector:
   def detect_season(self):
     """Detect the dominant season in the haiku"""
     season_counts = {season: 0 for season in self.SEASON_WORDS}
-    
-    for line in self.haiku._lines:
-      words = line.lower().split()
-      for word in words:
-        clean_word = word.strip('.,!?;:')
-        self._update_season_counts(clean_word, season_counts)
-    
+    self.season = None
+    self.keywords = []
+
+    for term, matches in self._match_keywords():
+      for season, category in matches:
+        season_counts[season] += 1
+        self.keywords.append((term, season, category))
+
     total = sum(season_counts.values())
     if total > 0:
       self.season = max(season_counts.items(), key=lambda x: x[1])[0]
-    
+
     return self.season
 
-  def _update_season_counts(self, clean_word, season_counts):
-    for season, categories in self.SEASON_WORDS.items():
-      for category, season_list in categories.items():
-        if clean_word in season_list:
-          season_counts[season] += 1
-          self.keywords.append((clean_word, season, category))
+  def _match_keywords(self):
+    """Yield (term, matches) for each seasonal term, in one pass over the words
+
+    At each word the longest phrase starting there wins, so 'wild goose'
+    is one keyword rather than 'goose'.
+    """
+    return self._match_words([span.key for span in line_spans]
+                             for line_spans in self.haiku.line_spans())
+
+  @classmethod
+  def _match_words(cls, lines):
+    """Match over lines given as lists of lowercase words"""
+    for words in lines:
+      i = 0
+      while i < len(words):
+        found = None
+        node = cls.PHRASE_TRIE
+        j = i
+        while j < len(words) and words[j] in node:
+          node = node[words[j]]
+          j += 1
+          if PHRASE_END in node:
+            found = (node[PHRASE_END], j)
+        if found:
+          yield found[0]
+          i = found[1]
+          continue
+        matches = cls.WORD_INDEX.get(words[i])
+        if matches:
+          yield words[i], matches
+        i += 1
+
+  @classmethod
+  def weight_matrix(cls, category_weights=None):
+    """Term x season weights: sum of the category weights of each term's matches
+
+    Categories missing from category_weights count 1, like detect_season.
+    """
+    category_weights = category_weights or {}
+    matrix = [[0.0] * len(cls.SEASONS) for _ in cls.TERMS]
+    for season_index, season in enumerate(cls.SEASONS):
+      for category, season_list in cls.SEASON_WORDS[season].items():
+        weight = category_weights.get(category, 1.0)
+        for term in season_list:
+          matrix[cls.TERM_IDS[term]][season_index] += weight
+    return np.array(matrix) if np is not None else matrix
+
+  @classmethod
+  def classify_corpus(cls, haikus, category_weights=None):
+    """Classify many haikus at once
+
+    Each poem becomes a sparse bag of keyword ids; the whole batch is
+    scored with one product against the term x season weight matrix.
+    Accepts Haiku objects or strings of newline separated lines. Returns a
+    CorpusClassification of NumPy arrays, or of lists without NumPy.
+    Words are found with a regex over each line, so no spans are built.
+    """
+    rows = []
+    term_ids = []
+    keywords = []
+    for row, haiku in enumerate(haikus):
+      lines = haiku.split('\n')[:3] if isinstance(haiku, str) else haiku.lines
+      terms = tuple(term for term, _ in cls._match_words(line_words(line) for line in lines))
+      keywords.append(terms)
+      rows.extend([row] * len(terms))
+      term_ids.extend(cls.TERM_IDS[term] for term in terms)
+
+    weights = cls.weight_matrix(category_weights)
+    if np is not None:
+      scores = np.zeros((len(keywords), len(cls.SEASONS)))
+      # Sparse (poem x term) counts times the weight matrix, in one step
+      np.add.at(scores, np.array(rows, dtype=np.intp), weights[np.array(term_ids, dtype=np.intp)])
+      totals = scores.sum(axis=1)
+      season_ids = np.where(totals > 0, scores.argmax(axis=1), -1)
+      confidence = np.divide(scores.max(axis=1, initial=0), totals,
+                             out=np.zeros_like(totals), where=totals > 0)
+      seasons = [cls.SEASONS[i] if i >= 0 else None for i in season_ids.tolist()]
+      return CorpusClassification(seasons, season_ids, confidence, scores, keywords)
+
+    scores = [[0.0] * len(cls.SEASONS) for _ in keywords]
+    for row, term_id in zip(rows, term_ids):
+      for season_index, weight in enumerate(weights[term_id]):
+        scores[row][season_index] += weight
+    season_ids = []
+    confidence = []
+    for row_scores in scores:
+      total = sum(row_scores)
+      best = max(range(len(row_scores)), key=row_scores.__getitem__)
+      season_ids.append(best if total > 0 else -1)
+      confidence.append(row_scores[best] / total if total > 0 else 0.0)
+    seasons = [cls.SEASONS[i] if i >= 0 else None for i in season_ids]
+    return CorpusClassification(seasons, season_ids, confidence, scores, keywords)
 
   def get_detailed_report(self):
     """Generate a detailed season analysis report"""
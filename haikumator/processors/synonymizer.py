@@ -1,9 +1,8 @@
 import random
-from helpers.haiku import Haiku
-from processors.processor import Processor
+from processors.processor import WordReplacer
 
 # Synonymizer class to replace words in a Haiku with synonyms
-class Synonymizer(Processor):
+class Synonymizer(WordReplacer):
   def display_results(self, original, processed_haiku):
     """Display before/after results"""
     print("\nThe Haiku before processing:")
@@ -15,21 +14,30 @@ class Synonymizer(Processor):
     print("\nPress Enter to continue...")
     input()
 
-  def process(self):
-    original = str(self.haiku)
-    processed_haiku = Haiku(*self.haiku._lines)  # Make a copy
-
-    for word in processed_haiku.get_words():
+  def replacements(self, words):
+    """Pick a random synonym for each word that has one"""
+    replacements = {}
+    for word in sorted(words):
       if word.lower() in self.thesaurus:
         synonyms = self.thesaurus.get_entries(word)
         if synonyms:
-          new_word = random.choice(synonyms)
-          processed_haiku.replace_word(word, new_word)
+          replacements[word] = random.choice(synonyms)
+    return replacements
 
-    # Capitalize the first letter of each line
-    for i, line in enumerate(processed_haiku._lines):
-      if line:
-        processed_haiku._lines[i] = line.capitalize()
+  def candidates(self, haiku):
+    """Replaceable words of a haiku and their distinct synonyms"""
+    words = []
+    choice_lists = []
+    for word in sorted(haiku.get_words()):
+      if word in self.thesaurus:
+        synonyms = list(dict.fromkeys(self.thesaurus.get_entries(word)))
+        if synonyms:
+          words.append(word)
+          choice_lists.append(synonyms)
+    return words, choice_lists
 
+  def process(self):
+    original = str(self.haiku)
+    processed_haiku = self.apply(self.haiku)
     self.display_results(original, processed_haiku)
     return processed_haiku
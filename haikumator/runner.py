@@ -0,0 +1,196 @@
+"""
+Directory runner for the Haikumator application.
+
+Processes every haiku file under a folder and writes the results to a
+mirrored folder tree:
+  python runner.py synonymize corpus/ out/ --thesaurus data/syn001.txt
+  python runner.py season corpus/ reports/ --pattern "haiku*.txt"
+
+Files are read and written by a thread pool so disk I/O overlaps, while
+the processing runs in a process pool whose workers load the thesauri
+once each. Files whose output is newer than both the input and the
+thesauri are skipped, so rerunning only redoes what changed.
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from helpers.compiled_thesaurus import prepare_thesaurus
+from helpers.haiku import Haiku
+from processors.registry import PROCESSORS, create_processor
+from processors.seasonDetector import SeasonDetector
+
+# Files handed to the process pool at a time; the next chunk is read while
+# the current one is processed
+DEFAULT_CHUNK_SIZE = 256
+
+# Set in each worker process by _init_worker
+_transform = None
+
+
+def _init_worker(name, thesaurus_file, antonym_file, lazy=False):
+  """Load the processor (and its thesauri) once per worker process"""
+  global _transform
+  if name == 'season':
+    def detect(haiku):
+      detector = SeasonDetector(haiku)
+      detector.detect_season()
+      return detector.get_detailed_report()
+    _transform = detect
+  else:
+    processor = create_processor(name, thesaurus_file, antonym_file, lazy=lazy)
+    _transform = lambda haiku: str(processor.apply(haiku))
+
+
+def _process_text(text):
+  """Worker: process one haiku file's text; returns (ok, output or error)"""
+  try:
+    lines = [line.strip() for line in text.splitlines()[:3]]
+    return True, _transform(Haiku(*lines))
+  except Exception as e:
+    return False, str(e)
+
+
+def _read(path):
+  with open(path, 'r', encoding='utf-8') as f:
+    return f.read()
+
+
+def _write(path, text):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w', encoding='utf-8') as f:
+    f.write(text)
+
+
+def _finish_writes(writes, failures):
+  """Wait for (source, future) writes; returns how many succeeded"""
+  wait([future for _, future in writes])
+  done = 0
+  for source, future in writes:
+    try:
+      future.result()
+      done += 1
+    except OSError as e:
+      failures.append((source, str(e)))
+  return done
+
+
+def find_jobs(input_dir, output_dir, pattern='*.txt', exclude=(), newer_than=0):
+  """List (source, target) pairs to process and the number skipped as up to date
+
+  An output folder inside the input folder is not searched, so earlier
+  results are never taken for input.
+  """
+  exclude = {os.path.abspath(path) for path in exclude}
+  output = os.path.realpath(output_dir)
+  jobs = []
+  skipped = 0
+  for folder, dirs, files in os.walk(input_dir):
+    dirs[:] = sorted(name for name in dirs
+                     if os.path.realpath(os.path.join(folder, name)) != output)
+    for name in sorted(fnmatch.filter(files, pattern)):
+      source = os.path.join(folder, name)
+      if os.path.abspath(source) in exclude:
+        continue
+      target = os.path.join(output_dir, os.path.relpath(source, input_dir))
+      try:
+        target_mtime = os.stat(target).st_mtime
+      except FileNotFoundError:
+        target_mtime = None
+      if target_mtime is not None and target_mtime >= max(os.stat(source).st_mtime, newer_than):
+        skipped += 1
+        continue
+      jobs.append((source, target))
+  return jobs, skipped
+
+
+def run(jobs, name, thesaurus_file=None, antonym_file=None, workers=None, io_threads=8,
+        chunk_size=DEFAULT_CHUNK_SIZE, lazy=False):
+  """Process the jobs; returns (processed, failures) where failures is [(source, error)]"""
+  processed = 0
+  failures = []
+  chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+  # Build the thesaurus caches here, once, rather than in every worker at once
+  if name != 'season':
+    for path in (thesaurus_file, antonym_file):
+      if path:
+        prepare_thesaurus(path, lazy)
+  with ThreadPoolExecutor(io_threads) as io, \
+       ProcessPoolExecutor(workers, initializer=_init_worker,
+                           initargs=(name, thesaurus_file, antonym_file, lazy)) as pool:
+    cpu_count = workers or os.cpu_count() or 1
+    reads = [io.submit(_read, source) for source, _ in chunks[0]] if chunks else []
+    writes = []
+    for i, chunk in enumerate(chunks):
+      readable = []
+      texts = []
+      for job, future in zip(chunk, reads):
+        try:
+          texts.append(future.result())
+          readable.append(job)
+        except (OSError, UnicodeDecodeError) as e:
+          failures.append((job[0], str(e)))
+      # Start reading the next chunk while this one is processed
+      if i + 1 < len(chunks):
+        reads = [io.submit(_read, source) for source, _ in chunks[i + 1]]
+      results = pool.map(_process_text, texts, chunksize=max(1, len(texts) // (cpu_count * 4)))
+      # Writes of the previous chunk must finish before queueing more
+      processed += _finish_writes(writes, failures)
+      writes = []
+      for (source, target), (ok, output) in zip(readable, results):
+        if ok:
+          writes.append((source, io.submit(_write, target, output)))
+        else:
+          failures.append((source, output))
+    processed += _finish_writes(writes, failures)
+  return processed, failures
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Process a folder tree of haiku files")
+  parser.add_argument('processor', choices=sorted(PROCESSORS) + ['season'])
+  parser.add_argument('input', help="folder of haiku files")
+  parser.add_argument('output', help="folder to write results to (mirrors input)")
+  parser.add_argument('--thesaurus', help="synonym thesaurus file")
+  parser.add_argument('--antonyms', help="antonym thesaurus file (antonymize)")
+  parser.add_argument('--pattern', default='*.txt', help="file name pattern, default *.txt")
+  parser.add_argument('--workers', type=int, help="processes, default one per core")
+  parser.add_argument('--io-threads', type=int, default=8, help="threads for reading/writing")
+  parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+  parser.add_argument('--lazy', action='store_true',
+                      help="parse thesaurus entries only when looked up (huge thesauri)")
+  args = parser.parse_args(argv)
+
+  if not os.path.isdir(args.input):
+    print(f"Folder not found: {args.input}")
+    return 1
+  if args.processor != 'season' and args.thesaurus is None:
+    print(f"{args.processor} needs --thesaurus")
+    return 1
+  if args.processor == 'antonymize' and args.antonyms is None:
+    print("antonymize needs --antonyms")
+    return 1
+
+  thesauri = [path for path in (args.thesaurus, args.antonyms) if path]
+  # Outputs older than a thesaurus are stale too
+  newer_than = max((os.stat(path).st_mtime for path in thesauri), default=0)
+  jobs, skipped = find_jobs(args.input, args.output, args.pattern, thesauri, newer_than)
+
+  start = time.perf_counter()
+  processed, failures = run(jobs, args.processor, args.thesaurus, args.antonyms,
+                            args.workers, args.io_threads, args.chunk_size, args.lazy)
+  elapsed = time.perf_counter() - start
+
+  rate = processed / elapsed if elapsed > 0 else 0.0
+  print(f"{processed} files processed in {elapsed:.2f}s ({rate:.1f} files/s), "
+        f"{skipped} up to date, {len(failures)} failed")
+  for source, error in failures:
+    print(f"  {source}: {error}")
+  return 1 if failures else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Headless streaming mode for the Haikumator application.
+
+Reads haiku records as JSON lines from stdin, applies one processor and
+writes one JSON line per record to stdout, so the processors can be used
+in a data pipeline:
+  python stream.py synonymize --thesaurus data/syn001.txt < in.jsonl > out.jsonl
+  python stream.py antonymize --thesaurus data/syn001.txt --antonyms data/ant001.txt
+  python stream.py season < in.jsonl
+
+Each input record holds the poem as "text" (lines separated by newlines)
+or as "lines" (a list); all other fields are passed through. The output
+adds "result" (the processed text), or "season" and "keywords" for the
+season detector. Records that cannot be processed get an "error" field.
+Thesauri are loaded once, input is read one line at a time and output is
+flushed in batches, so memory use does not grow with the stream.
+Multi-poem corpus files can be read instead of stdin with --input; each
+output record then carries the poem's byte offset in its file. With
+--profile, per-stage timings are written as JSON when the stream ends.
+"""
+
+import argparse
+import json
+import random
+import sys
+from helpers.corpus import iter_corpus, record_haiku
+from helpers.instrumentation import Instrumentation
+from processors.registry import PROCESSORS, create_processor
+from processors.seasonDetector import SeasonDetector
+
+
+def make_transform(args, instrumentation=None):
+  """Return a function turning a Haiku into the output fields"""
+  if args.processor == 'season':
+    def detect(haiku):
+      detector = SeasonDetector(haiku)
+      season = detector.detect_season()
+      return {'season': season,
+              'keywords': [[keyword, season_name, category]
+                           for keyword, season_name, category in detector.keywords]}
+    if instrumentation is not None:
+      return instrumentation.wrap('detect', detect)
+    return detect
+
+  try:
+    processor = create_processor(args.processor, args.thesaurus, args.antonyms,
+                                 instrumentation, args.lazy)
+  except ValueError as e:
+    raise SystemExit(str(e))
+  return lambda haiku: {'result': str(processor.apply(haiku))}
+
+
+def stream(transform, infile, outfile, flush_every=100):
+  """Process JSON lines from infile to outfile; returns (records, errors)"""
+  buffer = []
+  records = errors = 0
+  for number, line in enumerate(infile, 1):
+    if not line.strip():
+      continue
+    record = None
+    try:
+      record = json.loads(line)
+      record.update(transform(record_haiku(record)))
+    except (ValueError, TypeError, AttributeError) as e:
+      # Keep the passthrough fields of a record that parsed
+      if isinstance(record, dict):
+        record = dict(record, error=str(e))
+      else:
+        record = {'line': number, 'error': str(e)}
+      errors += 1
+    buffer.append(json.dumps(record))
+    records += 1
+    if len(buffer) >= flush_every:
+      outfile.write('\n'.join(buffer) + '\n')
+      outfile.flush()
+      buffer = []
+  if buffer:
+    outfile.write('\n'.join(buffer) + '\n')
+    outfile.flush()
+  return records, errors
+
+
+def stream_corpus(transform, entries, outfile, flush_every=100):
+  """Process CorpusEntries (see helpers.corpus) to JSON lines; returns (records, errors)
+
+  Text poems become {"number", "offset", "text"} records; JSON records
+  keep their fields and gain "offset". Malformed records get an "error"
+  field, as in stream(), and the rest of the file is still processed.
+  """
+  buffer = []
+  records = errors = 0
+  for entry in entries:
+    if entry.record is not None:
+      record = dict(entry.record, offset=entry.offset)
+    elif entry.error:
+      record = {'number': entry.number, 'offset': entry.offset}
+    else:
+      record = {'number': entry.number, 'offset': entry.offset, 'text': str(entry.haiku)}
+    try:
+      if entry.error:
+        raise ValueError(entry.error)
+      record.update(transform(entry.haiku))
+    except (ValueError, TypeError, AttributeError) as e:
+      record['error'] = str(e)
+      errors += 1
+    buffer.append(json.dumps(record))
+    records += 1
+    if len(buffer) >= flush_every:
+      outfile.write('\n'.join(buffer) + '\n')
+      outfile.flush()
+      buffer = []
+  if buffer:
+    outfile.write('\n'.join(buffer) + '\n')
+    outfile.flush()
+  return records, errors
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Process a stream of haiku JSON lines")
+  parser.add_argument('processor', choices=sorted(PROCESSORS) + ['season'])
+  parser.add_argument('--thesaurus', help="synonym thesaurus file")
+  parser.add_argument('--antonyms', help="antonym thesaurus file (antonymize)")
+  parser.add_argument('--input', nargs='+',
+                      help="corpus files to read instead of stdin: blank-line separated "
+                           "text or .jsonl, optionally .gz")
+  parser.add_argument('--lazy', action='store_true',
+                      help="parse thesaurus entries only when looked up (huge thesauri)")
+  parser.add_argument('--flush-every', type=int, default=100,
+                      help="records to buffer before writing")
+  parser.add_argument('--seed', type=int, help="random seed for repeatable output")
+  parser.add_argument('--profile', help="write per-stage timings to this JSON file")
+  parser.add_argument('--profile-memory', action='store_true',
+                      help="also track the peak memory of each stage (slower)")
+  args = parser.parse_args(argv)
+
+  if args.seed is not None:
+    random.seed(args.seed)
+  instrumentation = None
+  if args.profile:
+    instrumentation = Instrumentation(memory=args.profile_memory)
+  transform = make_transform(args, instrumentation)
+  if args.input:
+    records = errors = 0
+    for path in args.input:
+      try:
+        done, failed = stream_corpus(transform, iter_corpus(path), sys.stdout,
+                                     args.flush_every)
+      except (OSError, ValueError) as e:
+        # Unreadable file (or text that is not UTF-8): the rest of it is skipped
+        print(f"Error: {e}", file=sys.stderr)
+        errors += 1
+        continue
+      records += done
+      errors += failed
+  else:
+    records, errors = stream(transform, sys.stdin, sys.stdout, args.flush_every)
+  print(f"{records} records processed, {errors} errors", file=sys.stderr)
+  if instrumentation:
+    instrumentation.dump(args.profile)
+    instrumentation.close()
+    print(instrumentation.format(), file=sys.stderr)
+  return 1 if errors else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,41 @@
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import tarfile
+import zipfile
+
+# The application imports its modules as top-level packages (helpers,
+# processors), as when run from the haikumator folder
+PACKAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'haikumator')
+sys.path.insert(0, PACKAGE)
+
+
+def read_records(target):
+  """(name, text) of every haiku in a target, duplicates included"""
+  if os.path.isdir(target):
+    records = []
+    for name in os.listdir(target):
+      with open(os.path.join(target, name)) as f:
+        records.append((name, f.read()))
+    return records
+  name = target.lower()
+  if name.endswith(('.jsonl', '.jsonl.gz')):
+    opener = gzip.open if name.endswith('.gz') else open
+    with opener(target, 'rt', encoding='utf-8') as f:
+      return [(record['name'], record['text']) for record in map(json.loads, f)]
+  if name.endswith('.zip'):
+    with zipfile.ZipFile(target) as archive:
+      return [(info.filename, archive.read(info).decode('utf-8'))
+              for info in archive.infolist()]
+  if name.endswith(('.tar', '.tar.gz', '.tgz')):
+    with tarfile.open(target) as archive:
+      # In archive order: seeking back in a gzip stream decompresses it again
+      return [(member.name, archive.extractfile(member).read().decode('utf-8'))
+              for member in archive]
+  connection = sqlite3.connect(target)
+  try:
+    return connection.execute("SELECT name, text FROM haikus").fetchall()
+  finally:
+    connection.close()
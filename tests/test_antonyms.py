@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from helpers.lazy_thesaurus import LazyThesaurus
+from helpers.thesaurus import Thesaurus
+
+
+def write_thesaurus(path, lines):
+  with open(path, 'w') as f:
+    f.write(''.join(f"{head}: {', '.join(words)}\n" for head, words in lines))
+  return str(path)
+
+
+def load(path):
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(path)
+  return thesaurus
+
+
+def old_antonyms(word, synonym_thesaurus, antonym_thesaurus):
+  """The Antonymizer's resolution before the AntonymIndex: the word's
+  headword, then that headword's own synonyms, last listed first"""
+  reverse_syn = {}
+  for key in synonym_thesaurus:
+    reverse_syn[key.lower()] = key
+    for val in synonym_thesaurus.get_entries(key):
+      reverse_syn[val.lower()] = key
+  canonical = reverse_syn.get(word.lower(), word)
+  antonyms = antonym_thesaurus.get_entries(canonical)
+  if not antonyms and canonical in synonym_thesaurus:
+    for syn in reversed(synonym_thesaurus.get_entries(canonical)):
+      antonyms = antonym_thesaurus.get_entries(syn)
+      if antonyms:
+        break
+  return antonyms
+
+
+def random_lines(rng, words, count):
+  return [(rng.choice(words), rng.sample(words, rng.randint(1, 4))) for _ in range(count)]
+
+
+def test_depth_one_follows_only_the_headwords_own_synonyms(tmp_path):
+  synonyms = load(write_thesaurus(tmp_path / 'syn.txt',
+                                  [('big', ['large', 'huge']), ('large', ['vast'])]))
+  antonyms = load(write_thesaurus(tmp_path / 'ant.txt', [('big', ['small'])]))
+  index = synonyms.antonym_index(antonyms)
+  assert index.get('big') == ['small']
+  assert index.get('huge') == ['small']
+  # 'large' is its own headword and 'vast' belongs to it; neither lists 'big'
+  assert index.get('large') == []
+  assert index.get('vast') == []
+  assert synonyms.antonym_index(antonyms, max_depth=2).get('vast') == ['small']
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_depth_one_matches_the_old_resolution(tmp_path, seed):
+  rng = random.Random(seed)
+  words = [f"w{i}" for i in range(150)]
+  synonym_file = write_thesaurus(tmp_path / 'syn.txt', random_lines(rng, words, 120))
+  antonym_file = write_thesaurus(tmp_path / 'ant.txt', random_lines(rng, words, 40))
+  synonyms, antonyms = load(synonym_file), load(antonym_file)
+  lazy = LazyThesaurus(synonym_file)
+  try:
+    for thesaurus in (synonyms, lazy):
+      index = thesaurus.antonym_index(antonyms)
+      for word in words:
+        assert index.get(word) == old_antonyms(word, synonyms, antonyms), word
+  finally:
+    lazy.close()
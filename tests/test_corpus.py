@@ -0,0 +1,94 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from helpers.corpus import iter_corpus, read_at
+from stream import stream, stream_corpus
+
+POEMS = [["an old silent pond", "a frog jumps into the pond", "splash silence again"],
+         ["autumn moonlight", "a worm digs silently", "into the chestnut"],
+         ["über die straße", "ein kleiner frosch springt", "wasser überall"]]
+
+
+def write_text(path, poems):
+  data = '\n\n\n'.join('\n'.join(poem) for poem in poems) + '\n'
+  opener = gzip.open if str(path).endswith('.gz') else open
+  with opener(path, 'wt', encoding='utf-8') as f:
+    f.write(data)
+  return str(path), data.encode('utf-8')
+
+
+def jsonl_lines(poems):
+  return [json.dumps({'id': i, 'lines': poem}) for i, poem in enumerate(poems)]
+
+
+def write_jsonl(path, lines):
+  data = '\n'.join(lines) + '\n'
+  opener = gzip.open if str(path).endswith('.gz') else open
+  with opener(path, 'wt', encoding='utf-8') as f:
+    f.write(data)
+  return str(path), data.encode('utf-8')
+
+
+@pytest.mark.parametrize('name', ['poems.txt', 'poems.txt.gz', 'poems.jsonl', 'poems.jsonl.gz'])
+@pytest.mark.parametrize('chunk_size', [7, 1 << 16])
+def test_offsets_point_at_each_poem(tmp_path, name, chunk_size):
+  if '.jsonl' in name:
+    path, data = write_jsonl(tmp_path / name, jsonl_lines(POEMS))
+  else:
+    path, data = write_text(tmp_path / name, POEMS)
+  entries = list(iter_corpus(path, chunk_size=chunk_size))
+  assert [entry.number for entry in entries] == [1, 2, 3]
+  assert [str(entry.haiku).split('\n') for entry in entries] == POEMS
+  for entry, poem in zip(entries, POEMS):
+    assert data[entry.offset:].decode('utf-8').startswith(poem[0] if '.jsonl' not in name else '{')
+
+
+@pytest.mark.parametrize('name', ['poems.txt', 'poems.jsonl.gz'])
+def test_reading_resumes_from_an_offset(tmp_path, name):
+  if '.jsonl' in name:
+    path, _ = write_jsonl(tmp_path / name, jsonl_lines(POEMS))
+  else:
+    path, _ = write_text(tmp_path / name, POEMS)
+  entries = list(iter_corpus(path))
+  resumed = list(iter_corpus(path, start=entries[1].offset))
+  assert [entry.offset for entry in resumed] == [entry.offset for entry in entries[1:]]
+  assert [entry.number for entry in resumed] == [1, 2]
+  assert [str(entry.haiku) for entry in resumed] == [str(entry.haiku) for entry in entries[1:]]
+  for entry in entries:
+    assert str(read_at(path, entry.offset).haiku) == str(entry.haiku)
+
+
+def test_bad_records_are_yielded_with_their_offsets(tmp_path):
+  good = jsonl_lines(POEMS)
+  lines = [good[0], 'not json', '{"id": 7}', '[1, 2]', good[1], good[2]]
+  path, data = write_jsonl(tmp_path / 'poems.jsonl', lines)
+  entries = list(iter_corpus(path))
+  assert [entry.number for entry in entries] == [1, 2, 3, 4, 5, 6]
+  assert [entry.error is not None for entry in entries] == [False, True, True, True, False, False]
+  for entry, line in zip(entries, lines):
+    assert data[entry.offset:].decode('utf-8').startswith(line)
+  assert entries[2].record == {'id': 7} and entries[2].haiku is None
+  assert entries[1].record is None and entries[3].record is None
+  with pytest.raises(ValueError, match=f"byte {entries[1].offset}"):
+    read_at(path, entries[1].offset)
+
+
+def test_corpus_and_stdin_modes_treat_bad_records_alike(tmp_path):
+  good = jsonl_lines(POEMS)
+  lines = [good[0], 'not json', '{"id": 7}', good[1], good[2]]
+  path, _ = write_jsonl(tmp_path / 'poems.jsonl', lines)
+  transform = lambda haiku: {'result': str(haiku).upper()}
+
+  corpus_out = io.StringIO()
+  assert stream_corpus(transform, iter_corpus(path), corpus_out) == (5, 2)
+  stdin_out = io.StringIO()
+  assert stream(transform, io.StringIO('\n'.join(lines) + '\n'), stdin_out) == (5, 2)
+
+  from_corpus = [json.loads(line) for line in corpus_out.getvalue().splitlines()]
+  from_stdin = [json.loads(line) for line in stdin_out.getvalue().splitlines()]
+  assert [('error' in record, record.get('id'), record.get('result')) for record in from_corpus] == \
+         [('error' in record, record.get('id'), record.get('result')) for record in from_stdin]
+  assert from_corpus[-1]['result'] == '\n'.join(POEMS[2]).upper()
@@ -0,0 +1,125 @@
+import functools
+import json
+import os
+
+import pytest
+
+import processors.batchProcessor as batch
+from conftest import PACKAGE, read_records
+from helpers.checkpoint import Checkpoint
+from helpers.dedup import BloomDeduplicator, ExactDeduplicator, make_deduplicator
+from helpers.haiku import Haiku
+from helpers.permutations import iter_choices
+from helpers.sinks import open_sink, haiku_name
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+
+
+class Crash(Exception):
+  pass
+
+
+@pytest.fixture
+def thesaurus_file(tmp_path):
+  # "Exclusively glitters": 'only just' + 'sparkles' reads the same as
+  # 'only' + 'just sparkles', so those haikus come in pairs
+  path = str(tmp_path / 'syn.txt')
+  with open(THESAURUS) as source, open(path, 'w') as f:
+    f.write(source.read().replace('exclusively: ', 'exclusively: only just, ')
+            .replace('glitters: ', 'glitters: just sparkles, '))
+  return path
+
+
+def make_processor(thesaurus_file, dedup):
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(thesaurus_file)
+  return BatchProcessor(Haiku.from_file(HAIKU), thesaurus, dedup=dedup)
+
+
+def first_copies(processor):
+  """Records of the whole product, each text only the first time it
+  appears, and the size of the product"""
+  words, synonym_lists = processor.get_replaceable_words()
+  records = {}
+  total = 0
+  for index, choice in enumerate(iter_choices([len(synonyms) for synonyms in synonym_lists])):
+    combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+    records.setdefault(processor.haiku.render(dict(zip(words, combo))), haiku_name(index + 1))
+    total += 1
+  return sorted((name, text) for text, name in records.items()), total
+
+
+@pytest.mark.parametrize('deduplicator', [ExactDeduplicator(), BloomDeduplicator(1000, 0.001)])
+def test_deduplicators_drop_repeated_texts(deduplicator):
+  texts = [f"haiku {i}" for i in range(500)]
+  assert [deduplicator.is_duplicate(text) for text in texts] == [False] * 500
+  assert [deduplicator.is_duplicate(text) for text in texts[::7]] == [True] * 72
+  assert deduplicator.dropped == 72
+
+
+def test_bloom_filter_keeps_close_to_its_error_rate():
+  deduplicator = BloomDeduplicator(20000, 0.01)
+  for i in range(20000):
+    deduplicator.is_duplicate(f"seen {i}")
+  # Probing adds to the filter too, so probe with few texts
+  false_positives = sum(deduplicator.is_duplicate(f"new {i}") for i in range(1000))
+  assert false_positives < 1000 * 0.02
+
+
+def test_auto_mode_picks_by_size():
+  assert isinstance(make_deduplicator('auto', 1000), ExactDeduplicator)
+  assert isinstance(make_deduplicator('auto', 10 ** 8), BloomDeduplicator)
+  with pytest.raises(ValueError):
+    make_deduplicator('fuzzy')
+
+
+@pytest.mark.parametrize('dedup', ['exact', 'bloom'])
+def test_generated_output_has_each_text_once(tmp_path, thesaurus_file, dedup):
+  processor = make_processor(thesaurus_file, dedup)
+  expected, total = first_copies(processor)
+  target = str(tmp_path / 'out.jsonl')
+  words, synonym_lists = processor.get_replaceable_words()
+  with open_sink(target) as sink:
+    count = processor.generate_range(sink, words, synonym_lists)
+  assert sorted(read_records(target)) == expected
+  assert processor.duplicates > 0
+  assert count + processor.duplicates == total
+
+
+@pytest.mark.parametrize('dedup', ['exact', 'bloom'])
+@pytest.mark.parametrize('crash_at', [40, 333])
+def test_resumed_run_remembers_haikus_written_before_the_interruption(
+    tmp_path, monkeypatch, thesaurus_file, dedup, crash_at):
+  monkeypatch.setattr(batch, 'Checkpoint', functools.partial(Checkpoint, every=50))
+  processor = make_processor(thesaurus_file, dedup)
+  expected, total = first_copies(processor)
+  target = str(tmp_path / 'out.jsonl')
+  checkpoint = str(tmp_path / 'checkpoint.json')
+  words, synonym_lists = processor.get_replaceable_words()
+
+  written = 0
+  with open_sink(target) as sink:
+    write = sink.write
+
+    def write_then_crash(number, text):
+      nonlocal written
+      written += 1
+      if written == crash_at:
+        raise Crash()
+      write(number, text)
+
+    sink.write = write_then_crash
+    with pytest.raises(Crash):
+      processor.generate_range(sink, words, synonym_lists, checkpoint_file=checkpoint)
+
+  processor = make_processor(thesaurus_file, dedup)
+  with open_sink(target, existing='append') as sink:
+    count = processor.generate_range(sink, words, synonym_lists, checkpoint_file=checkpoint)
+  assert sorted(read_records(target)) == expected
+  with open(checkpoint) as f:
+    manifest = json.load(f)
+  assert count == manifest['count'] == len(expected)
+  assert processor.duplicates == manifest['dedup']['dropped'] == total - len(expected)
@@ -0,0 +1,132 @@
+import os
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku, tokenize_line
+from helpers.thesaurus import Thesaurus
+
+BUNDLED = [('haiku001.txt', 'syn001.txt'), ('haiku002.txt', 'syn002.txt'),
+           ('haiku003.txt', 'syn003.txt')]
+
+
+def old_replace_word(lines, old_word, new_word):
+  """Haiku.replace_word before word spans: split on spaces, strip trailing
+  punctuation, compare lowercase"""
+  for i in range(len(lines)):
+    words = lines[i].split()
+    for j in range(len(words)):
+      clean_word = words[j].rstrip('.,!?;:').lower()
+      if clean_word == old_word.lower():
+        new_word_cased = new_word.capitalize() if words[j][0].isupper() else new_word.lower()
+        words[j] = new_word_cased + words[j][len(clean_word):]
+    lines[i] = ' '.join(words)
+
+
+def keys(line):
+  return [span.key for span in tokenize_line(line)]
+
+
+def test_spans_split_off_punctuation_and_keep_offsets():
+  line = '"Red, yellow, brown!" (unite)...'
+  spans = tokenize_line(line, 2)
+  assert [span.word for span in spans] == ['Red', 'yellow', 'brown', 'unite']
+  assert [(span.lead, span.trail) for span in spans] == [('"', ','), ('', ','), ('', '!"'),
+                                                         ('(', ')...')]
+  assert all(line[span.start:span.end] == span.word and span.line == 2 for span in spans)
+  assert [span.capitalized for span in spans] == [True, False, False, False]
+  assert keys("Red RED red") == ['red', 'red', 'red']
+
+
+def test_hyphens_and_apostrophes_stay_inside_words():
+  assert keys("the moon's well-lit path isn't 'far' - ...") == \
+         ["the", "moon's", "well-lit", "path", "isn't", "far"]
+  assert keys("-dawn- o'er") == ["dawn", "o'er"]
+
+
+@pytest.mark.parametrize('mapping, expected', [
+  ({'red': 'crimson'}, "Crimson, yellow, crimson."),
+  ({'yellow': 'golden'}, "Red, golden, red."),
+  ({'red': 'DEEP Scarlet'}, "Deep scarlet, yellow, deep scarlet."),
+])
+def test_replacements_take_the_case_of_the_word_they_replace(mapping, expected):
+  haiku = Haiku("Red, yellow, red.")
+  assert haiku.render(mapping).split('\n')[0] == expected
+
+
+def test_hyphenated_words_are_replaced_whole_or_by_part():
+  haiku = Haiku("Well-lit moon's path", "a well-lit sky")
+  assert haiku.render({'well-lit': 'bright'}).split('\n')[:2] == ["Bright moon's path", "a bright sky"]
+  assert haiku.render({'well': 'dimly'}).split('\n')[:2] == ["Dimly-lit moon's path", "a dimly-lit sky"]
+  assert haiku.render({"moon's": 'lunar'}).split('\n')[0] == "Well-lit lunar path"
+  assert Haiku("well-lit").get_words() == {'well-lit', 'well', 'lit'}
+
+
+def test_replacement_for_leaves_unmapped_words_alone():
+  span, = tokenize_line("Sun-kissed")
+  assert Haiku._replacement_for(span, {}) is None
+  assert Haiku._replacement_for(span, {'kissed': 'warmed'}) == "Sun-warmed"
+  assert Haiku._replacement_for(span, {'sun-kissed': 'golden'}) == "Golden"
+
+
+@pytest.mark.parametrize('haiku_file, thesaurus_file', BUNDLED)
+@pytest.mark.parametrize('pick', range(3))
+def test_bundled_haikus_render_as_the_old_replace_word_did(haiku_file, thesaurus_file, pick):
+  haiku = Haiku.from_file(os.path.join(PACKAGE, 'data', haiku_file))
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(os.path.join(PACKAGE, 'data', thesaurus_file))
+  words = haiku.get_words()
+  mapping = {}
+  for word in sorted(words):
+    synonyms = thesaurus.get_entries(word)
+    # The old code replaced one word at a time, so a replacement that is
+    # itself a word of the haiku would be replaced again; leave those out
+    if synonyms and not set(synonyms[pick % len(synonyms)].lower().split()) & words:
+      mapping[word] = synonyms[pick % len(synonyms)]
+  assert mapping
+  lines = list(haiku.lines)
+  for word, new_word in mapping.items():
+    old_replace_word(lines, word, new_word)
+  assert haiku.render_lines(mapping) == lines
+
+
+def test_changing_a_copy_leaves_the_original_alone():
+  original = Haiku("an old pond", "a frog jumps in", "splash")
+  spans = original.line_spans()
+  copy = original.copy()
+  assert copy.lines is original.lines and copy.line_spans() is spans
+
+  copy.set_line(1, "a toad jumps in")
+  copy.replace_word('pond', 'lake')
+  copy.capitalize_lines()
+  assert str(copy) == "An old lake\nA toad jumps in\nSplash"
+  assert str(original) == "an old pond\na frog jumps in\nsplash"
+  assert original.line_spans() is spans
+  assert original.get_words() == {'an', 'old', 'pond', 'a', 'frog', 'jumps', 'in', 'splash'}
+
+  # Changing the original does not reach the copy either
+  original.replace_word('splash', 'plop')
+  assert copy.lines[2] == "Splash"
+
+
+def test_replaced_shares_unchanged_lines():
+  original = Haiku("an old pond", "a frog jumps in", "splash")
+  spans = original.line_spans()
+  replaced = original.replaced({'frog': 'toad'})
+  assert replaced.lines[1] == "a toad jumps in"
+  assert replaced.lines[0] is original.lines[0] and replaced.lines[2] is original.lines[2]
+  assert replaced.line_spans()[0] is spans[0] and replaced.line_spans()[2] is spans[2]
+  assert [span.key for span in replaced.line_spans()[1]] == ['a', 'toad', 'jumps', 'in']
+  assert original.lines[1] == "a frog jumps in"
+
+
+def test_frozen_haiku_refuses_changes():
+  haiku = Haiku("an old pond", "a frog jumps in", "splash").freeze()
+  for change in (lambda: haiku.set_line(0, "x"), lambda: haiku.replace_word('pond', 'lake'),
+                 haiku.capitalize_lines):
+    with pytest.raises(TypeError):
+      change()
+  assert str(haiku.replaced({'pond': 'lake'})).startswith("an old lake")
+  thawed = haiku.copy()
+  thawed.set_line(2, "plop")
+  assert haiku.lines[2] == "splash" and haiku.frozen and not thawed.frozen
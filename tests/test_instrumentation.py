@@ -0,0 +1,83 @@
+import json
+import os
+import tracemalloc
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku
+from helpers.instrumentation import Instrumentation, NO_STAGE
+from helpers.thesaurus import Thesaurus
+from processors.zenizer import Zenizer
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+
+
+def make_zenizer():
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(THESAURUS)
+  return Zenizer(Haiku.from_file(HAIKU), thesaurus)
+
+
+def test_apply_records_each_stage_once_per_call():
+  zenizer = make_zenizer()
+  calls = []
+  instrumentation = zenizer.enable_instrumentation(callback=lambda name, *_: calls.append(name))
+  for _ in range(3):
+    zenizer.apply(zenizer.haiku)
+  stages = instrumentation.report()['stages']
+  assert calls == ['tokenize', 'lookup', 'replace', 'render'] * 3
+  assert {name: stats['calls'] for name, stats in stages.items()} == \
+         {'tokenize': 3, 'lookup': 3, 'replace': 3, 'render': 3}
+  assert all(stats['wall'] >= 0 and stats['peak_bytes'] is None
+             for stats in stages.values())
+
+  zenizer.disable_instrumentation()
+  assert zenizer.stage('lookup') is NO_STAGE
+  zenizer.apply(zenizer.haiku)
+  assert instrumentation.report()['stages']['lookup']['calls'] == 3
+
+
+def test_failing_stage_is_still_recorded():
+  instrumentation = Instrumentation()
+  with pytest.raises(KeyError):
+    with instrumentation.stage('lookup'):
+      raise KeyError('pond')
+  assert instrumentation.stages['lookup'].calls == 1
+
+
+def test_memory_peaks_of_nested_stages():
+  was_tracing = tracemalloc.is_tracing()
+  instrumentation = Instrumentation(memory=True)
+  try:
+    with instrumentation.stage('outer'):
+      with instrumentation.stage('inner'):
+        block = bytearray(1 << 20)
+        del block
+      small = bytearray(1 << 10)
+    del small
+  finally:
+    instrumentation.close()
+  assert tracemalloc.is_tracing() == was_tracing
+  inner = instrumentation.stages['inner'].peak
+  outer = instrumentation.stages['outer'].peak
+  # The outer stage's peak includes the megabyte allocated in the inner one
+  assert inner >= 1 << 20
+  assert outer >= inner
+
+
+def test_reports_merge_and_dump(tmp_path):
+  first, second = Instrumentation(), Instrumentation()
+  first.record('render', 2.0, 1.5, calls=4)
+  second.record('render', 1.0, 0.5, calls=2, peak=100)
+  second.record('write', 3.0)
+  first.merge(second.report())
+  report = json.loads(first.dump(str(tmp_path / 'profile.json')))
+  with open(tmp_path / 'profile.json') as f:
+    assert json.load(f) == report
+  assert list(report['stages']) == ['render', 'write']  # slowest first
+  render = report['stages']['render']
+  assert (render['calls'], render['wall'], render['cpu'], render['peak_bytes']) == (6, 3.0, 2.0, 100)
+  assert render['mean_wall'] == 0.5
+  assert first.format().splitlines()[1].split()[:2] == ['render', '6']
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from conftest import PACKAGE, read_records
+from helpers.haiku import Haiku
+from helpers.permutations import split_ranges
+from helpers.sinks import part_target
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+TOTAL = 384
+
+
+def make_processor():
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(THESAURUS)
+  return BatchProcessor(Haiku.from_file(HAIKU), thesaurus)
+
+
+def make_target(folder, name):
+  folder.mkdir()
+  target = str(folder / name)
+  if name == 'out':
+    os.mkdir(target)
+  return target
+
+
+def read_parts(target, labels):
+  """Records of a target and of its part targets"""
+  records = []
+  for path in dict.fromkeys(part_target(target, label) for label in labels):
+    records.extend(read_records(path))
+  return sorted(records)
+
+
+@pytest.mark.parametrize('name', ['out', 'out.jsonl', 'out.zip', 'out.tar', 'out.db'])
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_output_equals_sequential_output(tmp_path, name, workers):
+  sequential = make_target(tmp_path / 'sequential', name)
+  count, _ = make_processor().run_job(sequential, checkpoint_file=str(tmp_path / 'seq.json'))
+  expected = sorted(read_records(sequential))
+  assert count == len(expected) == TOTAL
+
+  parallel = make_target(tmp_path / 'parallel', name)
+  count, manifests = make_processor().run_job(parallel, workers=workers,
+                                              checkpoint_file=str(tmp_path / 'par.json'))
+  assert count == TOTAL
+  assert len(manifests) == workers
+  labels = [f"part{part}" for part in range(workers)]
+  assert read_parts(parallel, labels) == expected
+
+
+def test_sharded_parallel_output_equals_sequential_output(tmp_path):
+  sequential = make_target(tmp_path / 'sequential', 'out.jsonl')
+  make_processor().run_job(sequential, checkpoint_file=str(tmp_path / 'seq.json'))
+  expected = sorted(read_records(sequential))
+
+  parallel = make_target(tmp_path / 'parallel', 'out.jsonl')
+  labels = []
+  for shard in range(2):
+    make_processor().run_job(parallel, shard, 2, workers=2,
+                             checkpoint_file=str(tmp_path / f'shard{shard}.json'))
+    labels.extend(f"shard{shard}-part{part}" for part in range(len(split_ranges(TOTAL // 2, 2))))
+  assert read_parts(parallel, labels) == expected
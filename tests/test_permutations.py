@@ -0,0 +1,54 @@
+import random
+from itertools import product
+
+import pytest
+
+from helpers.permutations import (count_permutations, iter_choices, rank, sample_choices,
+                                  shard_range, split_ranges, unrank)
+
+RADICES = [[3], [2, 3, 4], [5, 1, 2, 3], [1, 1], [7, 2, 6]]
+
+
+@pytest.mark.parametrize('radices', RADICES)
+def test_rank_and_unrank_round_trip(radices):
+  for index in range(count_permutations(radices)):
+    assert rank(unrank(index, radices), radices) == index
+
+
+def test_round_trip_beyond_machine_integers():
+  radices = [97] * 40
+  rng = random.Random(7)
+  for _ in range(200):
+    index = rng.randrange(count_permutations(radices))
+    assert rank(unrank(index, radices), radices) == index
+
+
+@pytest.mark.parametrize('radices', RADICES)
+def test_choices_follow_product_order(radices):
+  expected = list(product(*map(range, radices)))
+  assert [tuple(unrank(index, radices)) for index in range(len(expected))] == expected
+  assert list(iter_choices(radices)) == expected
+  assert list(iter_choices(radices, 1, 4)) == expected[1:4]
+
+
+def test_out_of_range_is_an_index_error():
+  with pytest.raises(IndexError):
+    unrank(24, [2, 3, 4])
+  with pytest.raises(IndexError):
+    rank([0, 3, 0], [2, 3, 4])
+
+
+@pytest.mark.parametrize('total, parts', [(10, 3), (384, 7), (2, 5), (1, 1)])
+def test_ranges_and_shards_cover_every_index_once(total, parts):
+  ranges = split_ranges(total, parts)
+  assert [i for start, stop in ranges for i in range(start, stop)] == list(range(total))
+  shards = [shard_range(total, shard, parts) for shard in range(parts)]
+  assert [i for start, stop in shards for i in range(start, stop)] == list(range(total))
+
+
+def test_unique_samples_are_distinct_and_seeded():
+  radices = [2, 3, 4]
+  drawn = sample_choices(radices, 100, seed=3)
+  assert len(drawn) == 24
+  assert sorted(rank(choice, radices) for choice in drawn) == list(range(24))
+  assert sample_choices(radices, 10, seed=3) == sample_choices(radices, 10, seed=3)
@@ -0,0 +1,78 @@
+import os
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku
+from helpers.thesaurus import Thesaurus
+from processors.lengthen import Lengthener
+from processors.pipeline import Pipeline, Replacement
+from processors.processor import WordReplacer
+from processors.zenizer import Zenizer
+
+BUNDLED = [('haiku001.txt', 'syn001.txt'), ('haiku002.txt', 'syn002.txt'),
+           ('haiku003.txt', 'syn003.txt')]
+
+
+def load(path):
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(path)
+  return thesaurus
+
+
+class Mapper(WordReplacer):
+  # Fixed word mapping that counts the words it is asked about
+  deterministic = True
+
+  def __init__(self, mapping):
+    super().__init__(None, None)
+    self.mapping = mapping
+    self.lookups = []
+
+  def replacements(self, words):
+    self.lookups.extend(sorted(words))
+    return {word: self.mapping[word] for word in words if word in self.mapping}
+
+  def process(self):
+    pass
+
+
+def test_one_stage_pipeline_matches_apply():
+  for haiku_file, thesaurus_file in BUNDLED:
+    haiku = Haiku.from_file(os.path.join(PACKAGE, 'data', haiku_file))
+    thesaurus = load(os.path.join(PACKAGE, 'data', thesaurus_file))
+    for processor in (Zenizer(haiku, thesaurus), Lengthener(haiku, thesaurus)):
+      assert Pipeline([processor]).run(haiku).text == str(processor.apply(haiku))
+
+
+def test_stages_chain_and_record_provenance():
+  haiku = Haiku("An old pond.", "A frog jumps in,", "the Water's sound!")
+  pipeline = Pipeline([('first', Mapper({'old': 'ancient', 'frog': 'toad'})),
+                       ('second', Mapper({'ancient': 'timeworn', 'sound': 'deep blue'})),
+                       ('third', Mapper({'deep blue': 'hush', 'pond': 'lake'}))])
+  result = pipeline.run(haiku)
+  assert result.text == "An timeworn lake.\nA toad jumps in,\nThe water's hush!"
+  assert result.provenance == [
+    Replacement('first', 'frog', 'frog', 'toad'),
+    Replacement('first', 'old', 'old', 'ancient'),
+    Replacement('second', 'old', 'ancient', 'timeworn'),
+    Replacement('second', 'sound', 'sound', 'deep blue'),
+    Replacement('third', 'pond', 'pond', 'lake'),
+    Replacement('third', 'sound', 'deep blue', 'hush'),
+  ]
+  assert result.season is None
+
+
+def test_deterministic_stages_look_each_word_up_once_per_batch():
+  mapper = Mapper({'frog': 'toad'})
+  haikus = [Haiku("a frog", "a pond", "a frog"), Haiku("the frog", "a pond", "the moon")]
+  results = Pipeline([mapper]).run_many(haikus)
+  assert [result.text.split('\n')[0] for result in results] == ["A toad", "The toad"]
+  assert sorted(mapper.lookups) == ['a', 'frog', 'moon', 'pond', 'the']
+
+
+def test_seasons_are_detected_on_the_results():
+  haiku = Haiku("cold rain falls", "on the quiet pond", "a leaf drifts")
+  mapper = Mapper({'rain': 'snow'})
+  result = Pipeline([mapper], detect_season=True).run(haiku)
+  assert result.text.startswith("Cold snow falls")
+  assert result.season == 'winter'
+  assert Pipeline([], detect_season=True).run_many([]) == []
@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PACKAGE, read_records
+from helpers.haiku import Haiku
+from helpers.permutations import iter_choices
+from helpers.sinks import open_sink, haiku_name
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku001.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn001.txt')
+# Checkpoints are saved every 10000 permutations
+STOP = 25000
+
+# Runs the job and dies (no cleanup, no flushing) when the kill_at-th
+# haiku is written
+KILLED_RUN = """
+import os, sys
+sys.path.insert(0, {package!r})
+from helpers.haiku import Haiku
+from helpers.sinks import open_sink
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor
+
+thesaurus = Thesaurus()
+thesaurus.load_from_file({thesaurus!r})
+processor = BatchProcessor(Haiku.from_file({haiku!r}), thesaurus)
+words, synonym_lists = processor.get_replaceable_words()
+sink = open_sink({target!r}, writers={writers})
+write = sink.write
+written = 0
+
+def write_then_die(number, text):
+  global written
+  written += 1
+  if written == {kill_at}:
+    os._exit(1)
+  write(number, text)
+
+sink.write = write_then_die
+processor.generate_range(sink, words, synonym_lists, 0, {stop}, {checkpoint!r})
+"""
+
+
+def make_processor():
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(THESAURUS)
+  return BatchProcessor(Haiku.from_file(HAIKU), thesaurus)
+
+
+def expected_records():
+  processor = make_processor()
+  words, synonym_lists = processor.get_replaceable_words()
+  radices = [len(synonyms) for synonyms in synonym_lists]
+  records = []
+  for index, choice in enumerate(iter_choices(radices, 0, STOP)):
+    combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+    records.append((haiku_name(index + 1), processor.haiku.render(dict(zip(words, combo)))))
+  return records
+
+
+@pytest.fixture(scope='module')
+def expected():
+  return sorted(expected_records())
+
+
+@pytest.mark.parametrize('kill_at', [5000, 22000])
+@pytest.mark.parametrize('name, writers', [
+  ('out', 0), ('out.jsonl', 0), ('out.jsonl', 1), ('out.jsonl.gz', 0), ('out.zip', 0),
+  ('out.zip', 1), ('out.tar', 0), ('out.tar.gz', 0), ('out.db', 0),
+])
+def test_killed_run_resumes_without_losing_or_repeating_haikus(tmp_path, expected, name,
+                                                               writers, kill_at):
+  target = str(tmp_path / name)
+  if name == 'out':
+    os.mkdir(target)
+  checkpoint = str(tmp_path / 'checkpoint.json')
+  script = KILLED_RUN.format(package=PACKAGE, thesaurus=THESAURUS, haiku=HAIKU, target=target,
+                             writers=writers, kill_at=kill_at, stop=STOP, checkpoint=checkpoint)
+  killed = subprocess.run([sys.executable, '-c', script], cwd=PACKAGE)
+  assert killed.returncode == 1
+
+  processor = make_processor()
+  words, synonym_lists = processor.get_replaceable_words()
+  with open_sink(target, writers=writers, existing='append') as sink:
+    count = processor.generate_range(sink, words, synonym_lists, 0, STOP, checkpoint)
+
+  with open(checkpoint) as f:
+    manifest = json.load(f)
+  assert manifest['complete'] and manifest['next'] == STOP
+  assert count == manifest['count'] == STOP
+  records = read_records(target)
+  assert len(records) == STOP
+  assert sorted(records) == expected
+
+
+def test_rerun_of_a_complete_job_leaves_the_archive_unchanged(tmp_path, expected):
+  target = str(tmp_path / 'out.zip')
+  checkpoint = str(tmp_path / 'checkpoint.json')
+  processor = make_processor()
+  words, synonym_lists = processor.get_replaceable_words()
+  for existing in ('refuse', 'append'):
+    with open_sink(target, existing=existing) as sink:
+      processor.generate_range(sink, words, synonym_lists, 0, STOP, checkpoint)
+  assert sorted(read_records(target)) == expected
+
+
+@pytest.mark.parametrize('name', ['OUT.JSONL.GZ', 'out.Tar.Gz', 'OUT.TGZ'])
+def test_compressed_suffixes_are_matched_in_any_case(tmp_path, name):
+  target = str(tmp_path / name)
+  with open_sink(target) as sink:
+    for number in range(1, 4):
+      sink.write(number, f"haiku {number}")
+  with open(target, 'rb') as f:
+    assert f.read(2) == b'\x1f\x8b'  # gzip magic
+  assert sorted(read_records(target)) == [(haiku_name(n), f"haiku {n}") for n in range(1, 4)]
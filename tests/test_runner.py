@@ -0,0 +1,40 @@
+import os
+
+from runner import find_jobs
+
+
+def write(path, text="an old pond\na frog jumps in\nsplash"):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'w') as f:
+    f.write(text)
+
+
+def test_output_folder_inside_the_input_is_not_searched(tmp_path):
+  corpus = str(tmp_path / 'corpus')
+  write(os.path.join(corpus, 'a.txt'))
+  write(os.path.join(corpus, 'spring', 'b.txt'))
+  output = os.path.join(corpus, 'out')
+  # Results of an earlier run, and a nested folder of them
+  write(os.path.join(output, 'spring', 'b.txt'))
+  write(os.path.join(output, 'out', 'a.txt'))
+  os.utime(os.path.join(output, 'spring', 'b.txt'), (0, 0))
+
+  jobs, skipped = find_jobs(corpus, output)
+  assert jobs == [(os.path.join(corpus, 'a.txt'), os.path.join(output, 'a.txt')),
+                  (os.path.join(corpus, 'spring', 'b.txt'), os.path.join(output, 'spring', 'b.txt'))]
+  assert skipped == 0
+  # The same folder given another way is still recognised
+  jobs, _ = find_jobs(corpus, os.path.join(corpus, 'spring', '..', 'out'))
+  assert len(jobs) == 2
+
+
+def test_up_to_date_outputs_are_skipped(tmp_path):
+  corpus, output = str(tmp_path / 'corpus'), str(tmp_path / 'out')
+  write(os.path.join(corpus, 'a.txt'))
+  write(os.path.join(corpus, 'b.txt'))
+  write(os.path.join(output, 'a.txt'))
+  jobs, skipped = find_jobs(corpus, output)
+  assert [source for source, _ in jobs] == [os.path.join(corpus, 'b.txt')]
+  assert skipped == 1
+  jobs, skipped = find_jobs(corpus, output, newer_than=os.stat(os.path.join(output, 'a.txt')).st_mtime + 10)
+  assert (len(jobs), skipped) == (2, 0)
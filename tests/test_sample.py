@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku
+from helpers.thesaurus import Thesaurus
+from processors.antonymizer import Antonymizer
+from processors.synonymizer import Synonymizer
+from processors.zenizer import Zenizer
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+ANTONYMS = os.path.join(PACKAGE, 'data', 'ant001.txt')
+TOTAL = 384
+
+
+def load(path):
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(path)
+  return thesaurus
+
+
+@pytest.fixture
+def synonymizer():
+  return Synonymizer(Haiku.from_file(HAIKU), load(THESAURUS))
+
+
+def test_unique_samples_are_distinct_and_stop_at_the_total(synonymizer):
+  variants = list(synonymizer.sample(1000, seed=5))
+  assert len(variants) == len(set(variants)) == TOTAL
+  assert list(synonymizer.sample(10, seed=5)) == list(synonymizer.sample(10, seed=5))
+
+
+def test_samples_with_repeats_come_from_the_same_variants(synonymizer):
+  every = set(synonymizer.sample(TOTAL, seed=1))
+  variants = list(synonymizer.sample(1000, seed=2, unique=False))
+  assert len(variants) == 1000
+  assert set(variants) <= every
+
+
+@pytest.mark.parametrize('unique, count', [(True, 1), (False, 3)])
+def test_haiku_without_replaceable_words_is_sampled_unchanged(unique, count):
+  haiku = Haiku("nothing to see", "in this little poem", "move along")
+  expected = "Nothing to see\nIn this little poem\nMove along"
+  processors = [Synonymizer(haiku, load(THESAURUS)),
+                Antonymizer(haiku, load(THESAURUS), load(ANTONYMS))]
+  for processor in processors:
+    assert list(processor.sample(3, seed=1, unique=unique)) == [expected] * count
+
+
+def test_deterministic_processor_samples_its_one_variant():
+  zenizer = Zenizer(Haiku.from_file(HAIKU), load(THESAURUS))
+  expected = str(zenizer.apply(zenizer.haiku))
+  assert list(zenizer.sample(3, seed=1)) == [expected]
+  assert list(zenizer.sample(3, seed=1, unique=False)) == [expected] * 3
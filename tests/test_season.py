@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from helpers.haiku import Haiku
+from processors.seasonDetector import PHRASE_END, SeasonDetector, build_keyword_index
+
+WORDS = {
+  'spring': {'flowers': ['cherry', 'cherry blossom'], 'animals': ['frog']},
+  'autumn': {'animals': ['goose', 'wild goose', 'wild goose chase'], 'food': ['chestnut']},
+  'winter': {'weather': ['snow', 'first snow']},
+}
+
+
+class SmallDetector(SeasonDetector):
+  SEASON_WORDS = WORDS
+  WORD_INDEX, PHRASE_TRIE = build_keyword_index(WORDS)
+  SEASONS = tuple(WORDS)
+  TERMS = tuple(sorted({term for categories in WORDS.values()
+                        for season_list in categories.values() for term in season_list}))
+  TERM_IDS = {term: i for i, term in enumerate(TERMS)}
+
+
+def keywords(*lines):
+  detector = SmallDetector(Haiku(*lines))
+  detector.detect_season()
+  return [term for term, _, _ in detector.keywords]
+
+
+def test_index_splits_words_from_phrases():
+  words, phrases = build_keyword_index(WORDS)
+  assert words['goose'] == (('autumn', 'animals'),)
+  assert 'wild goose' not in words
+  assert phrases['wild']['goose'][PHRASE_END] == ('wild goose', (('autumn', 'animals'),))
+  assert phrases['wild']['goose']['chase'][PHRASE_END][0] == 'wild goose chase'
+  assert PHRASE_END not in phrases['wild']
+
+
+@pytest.mark.parametrize('lines, expected', [
+  (("a wild goose flies",), ['wild goose']),
+  (("the wild goose chase ends",), ['wild goose chase']),
+  (("wild goose, wild goose chase",), ['wild goose', 'wild goose chase']),
+  # A phrase cut short falls back to its words
+  (("wild geese and a goose",), ['goose']),
+  (("first frost", "then first snow"), ['first snow']),
+  # Phrases do not run across lines
+  (("the first", "snow falls"), ['snow']),
+  (("Cherry blossom! Cherry...",), ['cherry blossom', 'cherry']),
+])
+def test_longest_phrase_wins(lines, expected):
+  assert keywords(*lines) == expected
+
+
+def old_detect(lines):
+  """SeasonDetector before the index: every word checked against every list"""
+  counts = {season: 0 for season in SeasonDetector.SEASON_WORDS}
+  for line in lines:
+    for word in line.lower().split():
+      clean_word = word.strip('.,!?;:')
+      for season, categories in SeasonDetector.SEASON_WORDS.items():
+        for season_list in categories.values():
+          if clean_word in season_list:
+            counts[season] += 1
+  return max(counts.items(), key=lambda x: x[1])[0] if sum(counts.values()) else None
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_single_words_are_detected_as_before(seed):
+  rng = random.Random(seed)
+  terms = [term for term in SeasonDetector.TERMS if ' ' not in term]
+  filler = ['the', 'a', 'quiet', 'pond', 'over', 'light']
+  haikus = [Haiku(*(' '.join(rng.choice(terms + filler * 3) for _ in range(4)) + '.'
+                    for _ in range(3)))
+            for _ in range(200)]
+  found = SeasonDetector.classify_corpus(haikus)
+  for haiku, season in zip(haikus, found.seasons):
+    detector = SeasonDetector(haiku)
+    assert detector.detect_season() == old_detect(haiku.lines) == season
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from helpers.sorted_list import SortedList
+
+
+def by_tens(x):
+  return x // 10
+
+
+def reference(items, key):
+  """What a SortedList of items should hold: a stable sort"""
+  return sorted(items, key=key)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('key', [None, by_tens])
+def test_add_update_and_merge_keep_a_stable_order(seed, key):
+  rng = random.Random(seed)
+  first = [rng.randrange(100) for _ in range(60)]
+  second = [rng.randrange(100) for _ in range(40)]
+  sort_key = key or (lambda x: x)
+
+  added = SortedList(key=key)
+  for item in first:
+    added.add(item)
+  assert list(added) == reference(first, sort_key)
+  assert list(SortedList(first, key=key)) == reference(first, sort_key)
+
+  # Same key: linear merge; any other iterable: update
+  for other in (SortedList(second, key=key), second, iter(second)):
+    merged = SortedList(first, key=key)
+    merged.merge(other)
+    assert list(merged) == reference(first + second, sort_key)
+    assert len(merged) == 100
+
+
+def test_merge_with_a_different_key_sorts_by_its_own_key():
+  words = SortedList(['pond', 'a', 'frog'], key=len)
+  words.merge(SortedList(['splash', 'in', 'old'], key=str.lower))
+  assert list(words) == ['a', 'in', 'old', 'pond', 'frog', 'splash']
+
+
+def test_remove_takes_the_first_equal_item_among_equal_keys():
+  words = SortedList(['moon', 'frog', 'pond', 'frog', 'sun'], key=len)
+  words.remove('frog')
+  assert list(words) == ['sun', 'moon', 'pond', 'frog']
+  assert 'frog' in words and 'lake' not in words
+  with pytest.raises(ValueError):
+    words.remove('lake')
+  words.remove('frog')
+  assert 'frog' not in words
+
+
+def test_irange_bounds():
+  numbers = SortedList([5, 1, 3, 3, 9, 7])
+  assert list(numbers.irange()) == [1, 3, 3, 5, 7, 9]
+  assert list(numbers.irange(3, 7)) == [3, 3, 5, 7]
+  assert list(numbers.irange(3, 7, inclusive=(False, False))) == [5]
+  assert list(numbers.irange(hi=3, inclusive=(True, False))) == [1]
+  assert list(numbers.irange(lo=8)) == [9]
+  assert list(numbers.irange(10, 20)) == []
+  assert numbers.nsmallest(2) == [1, 3] and numbers.nlargest(2) == [9, 7]
+  assert numbers.nlargest(0) == [] and numbers.nsmallest(-1) == []
@@ -0,0 +1,69 @@
+import os
+from collections import Counter
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku
+from helpers.permutations import iter_choices
+from helpers.syllables import SyllableCounter, count_syllables
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor, HAIKU_FORM
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+
+
+class ListSink:
+  def __init__(self):
+    self.records = []
+
+  def write(self, number, text):
+    self.records.append((number, text))
+
+
+def make_processor():
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(THESAURUS)
+  return BatchProcessor(Haiku.from_file(HAIKU), thesaurus)
+
+
+def every_variant(processor):
+  """(number, text, syllables per line) of the whole product"""
+  counter = SyllableCounter()
+  words, synonym_lists = processor.get_replaceable_words()
+  for index, choice in enumerate(iter_choices([len(synonyms) for synonyms in synonym_lists])):
+    combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+    text = processor.haiku.render(dict(zip(words, combo)))
+    yield index + 1, text, tuple(counter.count(line) for line in text.split('\n'))
+
+
+@pytest.mark.parametrize('word, syllables', [
+  ('cat', 1), ('stone', 1), ('candle', 2), ('tree', 1), ('walked', 1), ('painted', 2),
+  ('ocean', 2), ('brilliance', 2), ('well-lit', 2), ('', 0), ('Glitters!', 2),
+])
+def test_spelling_estimate_of_known_words(word, syllables):
+  assert count_syllables(word) == syllables
+
+
+def test_pronunciation_dictionary_comes_before_the_estimate(tmp_path):
+  dictionary = tmp_path / 'cmudict.txt'
+  dictionary.write_text(";;; comment\nFIRE  F AY1 ER0\nFIRE(2)  F AY1 R\nOCEAN  OW1 SH AH0 N\n")
+  counter = SyllableCounter(str(dictionary))
+  assert counter.count("fire, ocean") == 4
+  assert counter.count("deep blue sea") == 3
+  assert (counter.dictionary_hits, counter.estimates) == (2, 3)
+
+
+def test_constrained_generation_yields_the_brute_force_subset():
+  processor = make_processor()
+  variants = list(every_variant(processor))
+  forms = Counter(form for _, _, form in variants)
+  words, synonym_lists = processor.get_replaceable_words()
+  # The commonest form, a rare one, one no variant has and the haiku form
+  for form in [forms.most_common()[0][0], forms.most_common()[-1][0], (1, 1, 1), HAIKU_FORM]:
+    sink = ListSink()
+    count = processor.generate_constrained(sink, words, synonym_lists, form)
+    expected = [(number, text) for number, text, lines in variants if lines == form]
+    assert sink.records == expected
+    assert count == len(expected) == forms[form]
@@ -0,0 +1,149 @@
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.compiled_thesaurus import (CompiledThesaurus, compile_thesaurus, open_thesaurus,
+                                        CACHE_SUFFIX)
+from helpers.compact_thesaurus import CompactThesaurus
+from helpers.lazy_thesaurus import LazyThesaurus, INDEX_SUFFIX
+from helpers.thesaurus import RANK_MEASURES, TIE_BREAKS, Thesaurus
+
+SOURCE = os.path.join(PACKAGE, 'data', 'syn001.txt')
+ANTONYMS = os.path.join(PACKAGE, 'data', 'ant001.txt')
+WORD = 'autumn'
+
+
+@pytest.fixture
+def source(tmp_path):
+  path = str(tmp_path / 'syn.txt')
+  shutil.copy(SOURCE, path)
+  return path
+
+
+def _open_entries(path):
+  thesaurus = open_thesaurus(path)
+  try:
+    return type(thesaurus).__name__, thesaurus.get_entries(WORD)
+  finally:
+    thesaurus.close()
+
+
+@pytest.mark.parametrize('damage', ['empty', 'truncated', 'bad magic'])
+def test_damaged_cache_is_compiled_again(source, damage):
+  expected = _open_entries(source)
+  cache = source + CACHE_SUFFIX
+  with open(cache, 'r+b') as f:
+    if damage == 'empty':
+      f.truncate(0)
+    elif damage == 'truncated':
+      f.truncate(os.path.getsize(cache) // 2)
+    else:
+      f.write(b'XXXX')
+  assert expected == ('CompiledThesaurus', ['fall', 'equinox', 'october', 'november', 'december'])
+  assert _open_entries(source) == expected
+
+
+def test_truncated_cache_is_rejected(source):
+  cache = compile_thesaurus(source)
+  with open(cache, 'r+b') as f:
+    f.truncate(os.path.getsize(cache) - 1)
+  with pytest.raises(ValueError):
+    CompiledThesaurus(cache)
+
+
+def test_processes_compiling_at_once_leave_a_whole_cache(source):
+  with ProcessPoolExecutor(8) as pool:
+    results = list(pool.map(_open_entries, [source] * 16))
+  assert len(set(map(repr, results))) == 1
+  assert results[0][0] == 'CompiledThesaurus'
+  assert [name for name in os.listdir(os.path.dirname(source)) if name.endswith('.tmp')] == []
+
+
+def test_truncated_line_index_is_rebuilt(source):
+  whole = LazyThesaurus(source)
+  expected = {word: whole.get_entries(word) for word in whole}
+  whole.close()
+  index = source + INDEX_SUFFIX
+  size = os.path.getsize(index)
+  with open(index, 'r+b') as f:
+    f.truncate(size - 8)
+  lazy = LazyThesaurus(source)
+  try:
+    assert os.path.getsize(index) == size
+    assert {word: lazy.get_entries(word) for word in lazy} == expected
+  finally:
+    lazy.close()
+
+
+def write_messy_thesaurus(path, seed):
+  """A thesaurus with repeated headwords, mixed case (ASCII and not) and
+  uneven spacing"""
+  rng = random.Random(seed)
+  words = [f"w{i}" if i % 3 else f"\u00e9t\u00e9{i}" for i in range(60)]
+  with open(path, 'w') as f:
+    for _ in range(90):
+      head = rng.choice(words)
+      synonyms = [rng.choice(words) * rng.randint(1, 3) for _ in range(rng.randint(1, 5))]
+      synonyms = [word.upper() if rng.random() < 0.2 else word for word in synonyms]
+      f.write(f"{head.title() if rng.random() < 0.2 else head} :{' , '.join(synonyms)}\n")
+      if rng.random() < 0.1:
+        f.write("a line without a separator\n")
+
+
+def load(kind, path):
+  if kind == 'compiled':
+    return CompiledThesaurus(compile_thesaurus(path))
+  if kind == 'lazy':
+    # A small LRU, so entries are evicted and parsed again
+    return LazyThesaurus(path, cache_size=4)
+  thesaurus = Thesaurus() if kind == 'dict' else CompactThesaurus()
+  thesaurus.load_from_file(path)
+  return thesaurus
+
+
+@pytest.fixture(params=['data', 'messy'])
+def sources(request, tmp_path):
+  """(synonym file, antonym file) copied into tmp_path, so caches land there"""
+  synonyms, antonyms = str(tmp_path / 'syn.txt'), str(tmp_path / 'ant.txt')
+  if request.param == 'data':
+    shutil.copy(SOURCE, synonyms)
+    shutil.copy(ANTONYMS, antonyms)
+  else:
+    write_messy_thesaurus(synonyms, 1)
+    write_messy_thesaurus(antonyms, 2)
+  return synonyms, antonyms
+
+
+@pytest.mark.parametrize('kind', ['compiled', 'lazy', 'compact'])
+def test_lookups_agree_with_thesaurus(sources, kind):
+  synonyms, antonyms = sources
+  expected, antonym_thesaurus = load('dict', synonyms), load('dict', antonyms)
+  thesaurus = load(kind, synonyms)
+  words = set(expected) | {word for head in expected for word in expected.get_entries(head)}
+  words |= set(antonym_thesaurus) | {'missing'}
+  words |= {word.upper() for word in sorted(words)[:10]}
+  try:
+    assert sorted(thesaurus) == sorted(expected)
+    for word in words:
+      assert thesaurus.get_entries(word) == expected.get_entries(word)
+      assert (word in thesaurus) == (word in expected)
+      for measure in RANK_MEASURES:
+        for tie_break in TIE_BREAKS:
+          assert (thesaurus.ranked(word, measure, tie_break)
+                  == expected.ranked(word, measure, tie_break))
+          assert (thesaurus.shortest(word, measure, tie_break)
+                  == expected.shortest(word, measure, tie_break))
+          assert (thesaurus.longest(word, measure, tie_break)
+                  == expected.longest(word, measure, tie_break))
+    for max_depth in (1, 2):
+      index = thesaurus.antonym_index(antonym_thesaurus, max_depth)
+      expected_index = expected.antonym_index(antonym_thesaurus, max_depth)
+      assert {word: index.get(word) for word in words} == \
+             {word: expected_index.get(word) for word in words}
+  finally:
+    if hasattr(thesaurus, 'close'):
+      thesaurus.close()
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from conftest import PACKAGE
+from helpers.haiku import Haiku
+from helpers.permutations import iter_choices
+from helpers.syllables import SyllableCounter
+from helpers.thesaurus import Thesaurus
+from processors.batchProcessor import BatchProcessor
+from processors.scores import create_score
+
+HAIKU = os.path.join(PACKAGE, 'data', 'haiku002.txt')
+THESAURUS = os.path.join(PACKAGE, 'data', 'syn002.txt')
+
+
+def make_processor(thesaurus_file=THESAURUS, dedup=None):
+  thesaurus = Thesaurus()
+  thesaurus.load_from_file(thesaurus_file)
+  return BatchProcessor(Haiku.from_file(HAIKU), thesaurus, dedup=dedup)
+
+
+def text_value(name, text):
+  """Score of a haiku worked out from its text alone"""
+  if name == 'shortest':
+    return -len(text)
+  if name == 'longest':
+    return len(text)
+  counter = SyllableCounter()
+  return -sum(abs(counter.count(line) - target)
+              for line, target in zip(text.split('\n'), (5, 7, 5)))
+
+
+def brute_force(processor, score, name, k, dedup=False):
+  """Every permutation scored and sorted, best first, ties in product order"""
+  words, synonym_lists = processor.get_replaceable_words()
+  base, costs = score.costs(processor, words, synonym_lists)
+  scored = []
+  for index, choice in enumerate(iter_choices([len(synonyms) for synonyms in synonym_lists])):
+    combo = [synonyms[i] for synonyms, i in zip(synonym_lists, choice)]
+    text = processor.haiku.render(dict(zip(words, combo)))
+    if name == 'season':
+      # Keyword weights come from the words, not the text; add them up
+      # in the same order as the search so the floats are identical
+      totals = tuple(base)
+      for depth, digit in enumerate(choice):
+        totals = tuple(a + b for a, b in zip(totals, costs[depth][digit]))
+      value = score.value(totals)
+    else:
+      value = text_value(name, text)
+    scored.append((-value, index + 1, text))
+  scored.sort()
+  best = []
+  seen = set()
+  for negative, number, text in scored:
+    if dedup and text in seen:
+      continue
+    seen.add(text)
+    best.append((number, -negative, text))
+  return best[:k]
+
+
+@pytest.mark.parametrize('name', ['shortest', 'longest', 'syllables', 'season'])
+@pytest.mark.parametrize('k', [1, 7, 384, 500])
+def test_top_k_agrees_with_brute_force(name, k):
+  processor = make_processor()
+  words, synonym_lists = processor.get_replaceable_words()
+  score = create_score(name)
+  found = [tuple(variant) for variant in processor.top_k(words, synonym_lists, k, score)]
+  assert found == brute_force(processor, score, name, k)
+
+
+@pytest.mark.parametrize('name', ['shortest', 'syllables'])
+def test_top_k_skips_duplicates_like_brute_force(tmp_path, name):
+  # "Exclusively glitters": 'only just' + 'sparkles' reads the same as
+  # 'only' + 'just sparkles', so those haikus come in pairs
+  thesaurus_file = str(tmp_path / 'syn.txt')
+  with open(THESAURUS) as source, open(thesaurus_file, 'w') as f:
+    f.write(source.read().replace('exclusively: ', 'exclusively: only just, ')
+            .replace('glitters: ', 'glitters: just sparkles, '))
+  processor = make_processor(thesaurus_file, dedup='exact')
+  words, synonym_lists = processor.get_replaceable_words()
+  score = create_score(name)
+  found = [tuple(variant) for variant in processor.top_k(words, synonym_lists, 300, score)]
+  assert found == brute_force(processor, score, name, 300, dedup=True)
+  assert processor.duplicates > 0